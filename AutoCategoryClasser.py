@@ -2,9 +2,10 @@ import sqlite3
 import pandas as pd
 import streamlit as st
 import re
+import os
 
 # --- Configuration ---
-DB_PATH = "/home/ea/JellyFin.db"
+DB_PATH = os.environ.get("JELLYFIN_DB_PATH", "/home/ea/JellyFin.db")
 
 def get_data():
     conn = sqlite3.connect(DB_PATH)
@@ -53,57 +54,62 @@ def process_correlations(df):
     return final.sort_values(by='Count', ascending=False)
 
 # --- Streamlit UI ---
-st.set_page_config(page_title="SB Pattern Analyzer", layout="wide")
 
-st.title("🔍 SB Pattern & Category Correlation")
-st.markdown("""
+def run_ui():
+    st.set_page_config(page_title="SB Pattern Analyzer", layout="wide")
+
+    st.title("🔍 SB Pattern & Category Correlation")
+    st.markdown("""
 This analysis treats continuous non-numeric text as a single entity and incorporates 
 **AmtIn/AmtOut** logic to differentiate between inflows and outflows.
 """)
 
-try:
-    raw_data = get_data()
-    processed_df = process_correlations(raw_data)
+    try:
+        raw_data = get_data()
+        processed_df = process_correlations(raw_data)
+
+        # --- Metrics ---
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Total Transactions", len(raw_data))
+        m2.metric("Unique Text Patterns", processed_df['Pattern'].nunique())
+        m3.metric("Avg Confidence", f"{processed_df['Confidence (%)'].mean():.1f}%")
 
-    # --- Metrics ---
-    m1, m2, m3 = st.columns(3)
-    m1.metric("Total Transactions", len(raw_data))
-    m2.metric("Unique Text Patterns", processed_df['Pattern'].nunique())
-    m3.metric("Avg Confidence", f"{processed_df['Confidence (%)'].mean():.1f}%")
+        # --- Filters ---
+        st.divider()
+        col_a, col_b = st.columns([2, 1])
+        with col_a:
+            search = st.text_input("Search Patterns (e.g., 'INTEREST')", "")
+        with col_b:
+            tx_filter = st.multiselect("Filter Type", ["Inflow", "Outflow"], default=["Inflow", "Outflow"])
 
-    # --- Filters ---
-    st.divider()
-    col_a, col_b = st.columns([2, 1])
-    with col_a:
-        search = st.text_input("Search Patterns (e.g., 'INTEREST')", "")
-    with col_b:
-        tx_filter = st.multiselect("Filter Type", ["Inflow", "Outflow"], default=["Inflow", "Outflow"])
+        # Apply Filters
+        display_df = processed_df[processed_df['TxType'].isin(tx_filter)]
+        if search:
+            display_df = display_df[display_df['Pattern'].str.contains(search.upper())]
 
-    # Apply Filters
-    display_df = processed_df[processed_df['TxType'].isin(tx_filter)]
-    if search:
-        display_df = display_df[display_df['Pattern'].str.contains(search.upper())]
+        # --- Main Table ---
+        st.subheader("Correlation Findings")
+        st.dataframe(
+            display_df[['Pattern', 'TxType', 'CategoryName', 'Count', 'Confidence (%)']], 
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Pattern": "Normalized SBName",
+                "TxType": "Type",
+                "CategoryName": "Assigned Category",
+                "Count": "Occurrences",
+                "Confidence (%)": st.column_config.ProgressColumn(
+                    "Confidence",
+                    format="%f%%",
+                    min_value=0,
+                    max_value=100,
+                ),
+            }
+        )
 
-    # --- Main Table ---
-    st.subheader("Correlation Findings")
-    st.dataframe(
-        display_df[['Pattern', 'TxType', 'CategoryName', 'Count', 'Confidence (%)']], 
-        use_container_width=True,
-        hide_index=True,
-        column_config={
-            "Pattern": "Normalized SBName",
-            "TxType": "Type",
-            "CategoryName": "Assigned Category",
-            "Count": "Occurrences",
-            "Confidence (%)": st.column_config.ProgressColumn(
-                "Confidence",
-                format="%f%%",
-                min_value=0,
-                max_value=100,
-            ),
-        }
-    )
+    except Exception as e:
+        st.error(f"Database Error: {e}")
+        st.info(f"Check if '{DB_PATH}' exists and contains 'SBName', 'AmtIn', and 'AmtOut' columns.")
 
-except Exception as e:
-    st.error(f"Database Error: {e}")
-    st.info("Check if '/home/ea/JellyFin.db' exists and contains 'SBName', 'AmtIn', and 'AmtOut' columns.")
\ No newline at end of file
+if __name__ == "__main__":
+    run_ui()
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
+import re
 import sqlite3
+import hashlib
 import argparse
 import sys
 import os
@@ -7,6 +9,180 @@ import os
 # This script works around the issue that Sqlite forbids alteration to Pk cols. The script auto backsup the specified table, creates a new empty one, copies over the data and then drops the original table. At the cmd prompt use it like this:
 # first ensure you chmod +x the script, then run it like this:
 # ./FixPkAutoIncrement.py /home/ea/TTMbak/JellyFin/JellyFin.db MF
+# For tables with millions of rows add --chunked: the copy then runs in primary-key order, one
+# committed chunk at a time with progress output, and rerunning the same command after an
+# interruption resumes from the last committed chunk.
+
+# --- Configuration ---
+DEFAULT_CHUNK_SIZE = 50000
+# Rows read per page when checksumming both tables; fixed so verification never depends on --chunk-size
+VERIFY_PAGE_SIZE = 50000
+# Per-table progress of --chunked runs; a row exists only while a copy is unfinished
+CHECKPOINT_TABLE = "FixPkCheckpoint"
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def get_table_definition(cursor, table_name):
+    """
+    Returns (columns_sql, select_columns, pk_column_name, autoincrement) for the rebuilt table:
+    the primary key becomes INTEGER PRIMARY KEY, keeping AUTOINCREMENT, foreign keys and UNIQUE
+    constraints. columns_sql is None when the table does not exist. Raises ValueError for
+    CHECK constraints and COLLATE clauses, which the pragmas cannot describe.
+    """
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    columns = cursor.fetchall()
+    if not columns:
+        return None, [], None, False
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+    table_sql = cursor.fetchone()[0] or ""
+    autoincrement = bool(re.search(r"\bAUTOINCREMENT\b", table_sql, re.I))
+    # Rebuilding from the pragmas would silently drop these; string literals cannot hide them
+    unsupported = [c for c in ("CHECK", "COLLATE")
+                   if re.search(rf"\b{c}\b", re.sub(r"'(?:[^']|'')*'", "''", table_sql), re.I)]
+    if unsupported:
+        raise ValueError(f"Table '{table_name}' has {' and '.join(unsupported)} clauses that would be lost; "
+                         f"rebuild it by hand")
+
+    new_columns_defs = []
+    select_columns = []
+    pk_column_name = None
+
+    for cid, name, col_type, notnull, dflt_value, pk in columns:
+        select_columns.append(name)
+        if pk == 1:
+            new_columns_defs.append(f'"{name}" INTEGER PRIMARY KEY' + (" AUTOINCREMENT" if autoincrement else ""))
+            pk_column_name = name
+        else:
+            notnull_str = " NOT NULL" if notnull else ""
+            dflt_str = f" DEFAULT {dflt_value}" if dflt_value is not None else ""
+            new_columns_defs.append(f'"{name}" {col_type}{notnull_str}{dflt_str}')
+
+    # Foreign keys are not part of table_info; carry them over as table constraints
+    cursor.execute(f"PRAGMA foreign_key_list({table_name})")
+    foreign_keys = {}
+    for fk_id, seq, ref_table, from_col, to_col, on_update, on_delete, match in cursor.fetchall():
+        foreign_keys.setdefault(fk_id, (ref_table, [], [], on_update, on_delete))
+        foreign_keys[fk_id][1].append(f'"{from_col}"')
+        if to_col is not None:
+            foreign_keys[fk_id][2].append(f'"{to_col}"')
+    for ref_table, from_cols, to_cols, on_update, on_delete in foreign_keys.values():
+        to_sql = f" ({', '.join(to_cols)})" if to_cols else ""
+        new_columns_defs.append(f'FOREIGN KEY ({", ".join(from_cols)}) REFERENCES "{ref_table}"{to_sql}'
+                                f' ON UPDATE {on_update} ON DELETE {on_delete}')
+
+    # UNIQUE constraints live in sqlite_autoindex_* indexes (no sql), so re-emit them as table constraints
+    cursor.execute(f"PRAGMA index_list({table_name})")
+    for index in cursor.fetchall():
+        index_name, origin = index[1], index[3]
+        if origin == 'u':
+            cursor.execute(f'PRAGMA index_info("{index_name}")')
+            unique_cols = [f'"{name}"' for seqno, cid, name in sorted(cursor.fetchall())]
+            new_columns_defs.append(f"UNIQUE ({', '.join(unique_cols)})")
+    return ", ".join(new_columns_defs), select_columns, pk_column_name, autoincrement
+
+
+def get_schema_objects(cursor, table_name):
+    """CREATE statements of the table's explicit indexes and triggers, which DROP TABLE removes with it."""
+    cursor.execute("""
+        SELECT sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+        ORDER BY type, name
+    """, (table_name,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def get_sequence(cursor, table_name):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='sqlite_sequence'")
+    if not cursor.fetchone():
+        return None
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table_name,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def swap_tables(cursor, table_name, schema_objects, sequence):
+    """
+    Replaces table_name with table_name_new and recreates its indexes and triggers; an
+    AUTOINCREMENT counter never moves backwards. Runs inside the caller's transaction.
+    """
+    cursor.execute(f"DROP TABLE {table_name};")
+    # Views over the table are only valid again once the rename is done, so skip their checks
+    cursor.execute("PRAGMA legacy_alter_table = ON;")
+    cursor.execute(f"ALTER TABLE {table_name}_new RENAME TO {table_name};")
+    cursor.execute("PRAGMA legacy_alter_table = OFF;")
+    for sql in schema_objects:
+        cursor.execute(sql)
+    if sequence is not None:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence, table_name))
+
+
+def check_foreign_keys(cursor):
+    """Prints foreign key violations to stderr; returns True when there are none."""
+    cursor.execute("PRAGMA foreign_key_check;")
+    violations = cursor.fetchall()
+    if violations:
+        print("Error: Foreign key integrity check failed! Rolling back changes.", file=sys.stderr)
+        for v in violations:
+            print(f"Violation: Table '{v[0]}' rowid {v[1]} references missing/invalid key in '{v[2]}'", file=sys.stderr)
+    return not violations
+
+
+def table_checksum(cursor, table_name, select_sql, pk_column_name, page_size=VERIFY_PAGE_SIZE):
+    """(row count, SHA-256 of every row in primary-key order), read one chunk at a time."""
+    digest = hashlib.sha256()
+    count = 0
+    last_key = None
+    while True:
+        if last_key is None:
+            cursor.execute(f"SELECT {pk_column_name}, {select_sql} FROM {table_name} ORDER BY {pk_column_name} LIMIT ?", (page_size,))
+        else:
+            cursor.execute(f"SELECT {pk_column_name}, {select_sql} FROM {table_name} WHERE {pk_column_name} > ? ORDER BY {pk_column_name} LIMIT ?",
+                           (last_key, page_size))
+        rows = cursor.fetchall()
+        if not rows:
+            return count, digest.hexdigest()
+        for row in rows:
+            digest.update(repr(row).encode())
+        count += len(rows)
+        last_key = rows[-1][0]
+
+
+def has_integer_pk(cursor, table_name):
+    """True when the table's primary key is a single INTEGER PRIMARY KEY column (an alias of the rowid)."""
+    cursor.execute(f"PRAGMA table_info({table_name})")
+    pk_types = [col_type.upper() for cid, name, col_type, notnull, dflt_value, pk in cursor.fetchall() if pk]
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+    row = cursor.fetchone()
+    without_rowid = bool(row and re.search(r"\bWITHOUT\s+ROWID\b", row[0] or "", re.I))
+    return pk_types == ["INTEGER"] and not without_rowid
+
+
+def rebuild_table(cursor, table_name):
+    """
+    Rebuilds table_name with its primary key as INTEGER PRIMARY KEY in one statement copy. Runs
+    inside the caller's transaction, which must have foreign key enforcement off; the caller
+    checks foreign keys and commits. Returns the primary key column name.
+    """
+    columns_sql, select_columns, pk_column_name, _ = get_table_definition(cursor, table_name)
+    if columns_sql is None:
+        raise ValueError(f"Table '{table_name}' does not exist")
+    if not pk_column_name:
+        raise ValueError(f"No primary key found in table '{table_name}'. Skipping")
+
+    select_sql = ", ".join(select_columns)
+    schema_objects = get_schema_objects(cursor, table_name)
+    sequence = get_sequence(cursor, table_name)
+
+    cursor.execute(f"CREATE TABLE {table_name}_new ({columns_sql});")
+    cursor.execute(f"INSERT INTO {table_name}_new ({select_sql}) SELECT {select_sql} FROM {table_name};")
+    swap_tables(cursor, table_name, schema_objects, sequence)
+    return pk_column_name
 
 
 def convert_pk_to_integer_safe(db_path, table_name):
@@ -17,73 +193,171 @@ def convert_pk_to_integer_safe(db_path, table_name):
 
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
-    
+
     try:
         # 1. Turn OFF foreign key enforcement for this connection
         cursor.execute("PRAGMA foreign_keys = OFF;")
-        
-        # Fetch current table structure
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = cursor.fetchall()
-        
-        if not columns:
-            print(f"Error: Table '{table_name}' does not exist in '{db_path}'.", file=sys.stderr)
+
+        # 2. Rebuild the table inside a transaction
+        cursor.execute("BEGIN TRANSACTION;")
+        pk_column_name = rebuild_table(cursor, table_name)
+
+        # 3. Safety Check: Verify foreign key integrity before committing
+        if not check_foreign_keys(cursor):
+            conn.rollback()
             sys.exit(1)
 
-        new_columns_defs = []
-        select_columns = []
-        pk_column_name = None
+        conn.commit()
+        print(f"Success: Migrated table '{table_name}'. Primary key '{pk_column_name}' is now INTEGER PRIMARY KEY.")
+
+    except ValueError as e:
+        conn.rollback()
+        print(f"Error: {e}.", file=sys.stderr)
+        sys.exit(1)
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Migration failed due to SQL error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        # 4. Always restore foreign key settings
+        cursor.execute("PRAGMA foreign_keys = ON;")
+        conn.close()
+
 
-        for cid, name, col_type, notnull, dflt_value, pk in columns:
-            select_columns.append(name)
-            if pk == 1:
-                new_columns_defs.append(f'"{name}" INTEGER PRIMARY KEY')
-                pk_column_name = name
-            else:
-                notnull_str = " NOT NULL" if notnull else ""
-                dflt_str = f" DEFAULT {dflt_value}" if dflt_value is not None else ""
-                new_columns_defs.append(f'"{name}" {col_type}{notnull_str}{dflt_str}')
+def convert_pk_to_integer_chunked(db_path, table_name, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Same migration as convert_pk_to_integer_safe, for large tables. Rows are copied in
+    primary-key order, chunk_size per committed transaction, so the write lock is released
+    between chunks; the last copied key is committed with each chunk in CHECKPOINT_TABLE and a
+    rerun resumes after it. Before the swap, row counts and checksums of both tables must match.
+    """
+    if not os.path.exists(db_path):
+        print(f"Error: Database file '{db_path}' not found.", file=sys.stderr)
+        sys.exit(1)
+    if chunk_size < 1:
+        print(f"Error: chunk size must be at least 1, got {chunk_size}.", file=sys.stderr)
+        sys.exit(1)
+
+    # Autocommit mode: every transaction below is explicit
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    cursor = conn.cursor()
 
+    try:
+        cursor.execute("PRAGMA foreign_keys = OFF;")
+
+        try:
+            columns_sql, select_columns, pk_column_name, _ = get_table_definition(cursor, table_name)
+        except ValueError as e:
+            print(f"Error: {e}.", file=sys.stderr)
+            sys.exit(1)
+        if columns_sql is None:
+            print(f"Error: Table '{table_name}' does not exist in '{db_path}'.", file=sys.stderr)
+            sys.exit(1)
         if not pk_column_name:
             print(f"Error: No primary key found in table '{table_name}'. Skipping.", file=sys.stderr)
             sys.exit(1)
-
-        columns_sql = ", ".join(new_columns_defs)
         select_sql = ", ".join(select_columns)
-        
-        # 2. Migration Statements
-        create_temp_sql = f"CREATE TABLE {table_name}_new ({columns_sql});"
-        copy_data_sql = f"INSERT INTO {table_name}_new ({select_sql}) SELECT {select_sql} FROM {table_name};"
-        drop_old_sql = f"DROP TABLE {table_name};"
-        rename_new_sql = f"ALTER TABLE {table_name}_new RENAME TO {table_name};"
-
-        # 3. Execute inside a transaction
-        cursor.execute("BEGIN TRANSACTION;")
-        cursor.execute(create_temp_sql)
-        cursor.execute(copy_data_sql)
-        cursor.execute(drop_old_sql)
-        cursor.execute(rename_new_sql)
-        
-        # 4. Safety Check: Verify foreign key integrity before committing
-        cursor.execute("PRAGMA foreign_key_check;")
-        violations = cursor.fetchall()
-        
-        if violations:
-            print("Error: Foreign key integrity check failed! Rolling back changes.", file=sys.stderr)
-            for v in violations:
-                print(f"Violation: Table '{v[0]}' rowid {v[1]} references missing/invalid key in '{v[2]}'", file=sys.stderr)
-            conn.rollback()
+
+        # Chunks are paged and verified in key order, which only matches the new table's order
+        # when every stored key is already an integer (not e.g. TEXT '10' sorting before '9')
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE typeof({pk_column_name}) != 'integer'")
+        non_integer = cursor.fetchone()[0]
+        if non_integer:
+            # A copy left by an earlier --chunked attempt cannot be finished either; discard it
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (CHECKPOINT_TABLE,))
+            if cursor.fetchone() and cursor.execute(f"SELECT 1 FROM {CHECKPOINT_TABLE} WHERE TableName = ?", (table_name,)).fetchone():
+                cursor.execute("BEGIN;")
+                cursor.execute(f"DROP TABLE IF EXISTS {table_name}_new")
+                cursor.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE TableName = ?", (table_name,))
+                cursor.execute(f"SELECT COUNT(*) FROM {CHECKPOINT_TABLE}")
+                if cursor.fetchone()[0] == 0:
+                    cursor.execute(f"DROP TABLE {CHECKPOINT_TABLE}")
+                cursor.execute("COMMIT;")
+            print(f"Error: {non_integer:,} rows of '{table_name}' have a {pk_column_name} value not stored as an integer "
+                  f"(TEXT, REAL or NULL), which --chunked cannot copy in key order. Run without --chunked.", file=sys.stderr)
             sys.exit(1)
 
-        conn.commit()
-        print(f"Success: Migrated table '{table_name}'. Primary key '{pk_column_name}' is now INTEGER PRIMARY KEY.")
+        # 1. Start a new copy, or pick up the checkpoint of an interrupted one
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (TableName TEXT PRIMARY KEY, LastKey INTEGER, RowsCopied INTEGER NOT NULL)")
+        cursor.execute(f"SELECT LastKey, RowsCopied FROM {CHECKPOINT_TABLE} WHERE TableName = ?", (table_name,))
+        checkpoint = cursor.fetchone()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (f"{table_name}_new",))
+        new_exists = cursor.fetchone() is not None
+
+        if checkpoint and new_exists:
+            last_key, copied = checkpoint
+            print(f"Resuming '{table_name}' after {pk_column_name} {last_key} ({copied:,} rows already copied).")
+        elif new_exists:
+            print(f"Error: '{table_name}_new' exists but has no checkpoint; drop it and rerun.", file=sys.stderr)
+            sys.exit(1)
+        else:
+            last_key, copied = None, 0
+            cursor.execute("BEGIN;")
+            cursor.execute(f"CREATE TABLE {table_name}_new ({columns_sql});")
+            cursor.execute(f"INSERT OR REPLACE INTO {CHECKPOINT_TABLE} (TableName, LastKey, RowsCopied) VALUES (?, NULL, 0)", (table_name,))
+            cursor.execute("COMMIT;")
+
+        # 2. Copy one primary-key-ordered chunk per transaction, committing the checkpoint with it
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+        total = cursor.fetchone()[0]
+        while True:
+            cursor.execute("BEGIN;")
+            key_filter = "" if last_key is None else f"WHERE {pk_column_name} > ?"
+            params = (chunk_size,) if last_key is None else (last_key, chunk_size)
+            cursor.execute(f"""
+                INSERT INTO {table_name}_new ({select_sql})
+                SELECT {select_sql} FROM {table_name} {key_filter} ORDER BY {pk_column_name} LIMIT ?
+            """, params)
+            inserted = cursor.rowcount
+            if inserted <= 0:
+                cursor.execute("ROLLBACK;")
+                break
+            cursor.execute(f"SELECT MAX({pk_column_name}) FROM {table_name}_new")
+            last_key = cursor.fetchone()[0]
+            copied += inserted
+            cursor.execute(f"UPDATE {CHECKPOINT_TABLE} SET LastKey = ?, RowsCopied = ? WHERE TableName = ?", (last_key, copied, table_name))
+            cursor.execute("COMMIT;")
+            print(f"\r{table_name}: {copied:,}/{total:,} rows copied ({copied / max(total, 1):.1%})", end="", flush=True)
+        print()
 
+        # 3. Verify, then swap the tables and restore indexes, triggers and the AUTOINCREMENT counter
+        cursor.execute("BEGIN IMMEDIATE;")
+        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+        total = cursor.fetchone()[0]
+        old_count, old_sum = table_checksum(cursor, table_name, select_sql, pk_column_name)
+        new_count, new_sum = table_checksum(cursor, f"{table_name}_new", select_sql, pk_column_name)
+        # The plain COUNT(*) guards against a checksum walk that read fewer rows than exist
+        if old_count != total or (old_count, old_sum) != (new_count, new_sum):
+            cursor.execute("ROLLBACK;")
+            print(f"Error: '{table_name}' has {total:,} rows, '{table_name}_new' has {new_count:,}"
+                  f"{'' if total != new_count else ' but their contents differ'}. "
+                  f"Rows changed during the copy; drop '{table_name}_new' and the "
+                  f"{CHECKPOINT_TABLE} row to start over.", file=sys.stderr)
+            sys.exit(1)
+        schema_objects = get_schema_objects(cursor, table_name)
+        swap_tables(cursor, table_name, schema_objects, get_sequence(cursor, table_name))
+        cursor.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE TableName = ?", (table_name,))
+        cursor.execute(f"SELECT COUNT(*) FROM {CHECKPOINT_TABLE}")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"DROP TABLE {CHECKPOINT_TABLE}")
+        if not check_foreign_keys(cursor):
+            cursor.execute("ROLLBACK;")
+            sys.exit(1)
+        cursor.execute("COMMIT;")
+        print(f"Success: Migrated table '{table_name}' ({new_count:,} rows verified, {len(schema_objects)} indexes/triggers restored). "
+              f"Primary key '{pk_column_name}' is now INTEGER PRIMARY KEY.")
+
+    except KeyboardInterrupt:
+        if conn.in_transaction:
+            conn.rollback()
+        print(f"\nInterrupted: rerun the same command to resume '{table_name}'.", file=sys.stderr)
+        sys.exit(1)
     except sqlite3.Error as e:
-        conn.rollback()
-        print(f"Migration failed due to SQL error: {e}", file=sys.stderr)
+        if conn.in_transaction:
+            conn.rollback()
+        print(f"\nMigration failed due to SQL error: {e}. Rerun the same command to resume.", file=sys.stderr)
         sys.exit(1)
     finally:
-        # 5. Always restore foreign key settings
         cursor.execute("PRAGMA foreign_keys = ON;")
         conn.close()
 
@@ -91,6 +365,12 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Safely migrate an SQLite column type to INTEGER PRIMARY KEY NOT NULL.")
     parser.add_argument("db_path", help="Path to the SQLite database file (e.g., app.db)")
     parser.add_argument("table_name", help="Name of the table to modify")
-    
+    parser.add_argument("--chunked", action="store_true",
+                        help="Copy in primary-key-ordered chunks with progress output and resume after an interruption")
+    parser.add_argument("--chunk-size", type=positive_int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk with --chunked")
+
     args = parser.parse_args()
-    convert_pk_to_integer_safe(args.db_path, args.table_name)
+    if args.chunked:
+        convert_pk_to_integer_chunked(args.db_path, args.table_name, args.chunk_size)
+    else:
+        convert_pk_to_integer_safe(args.db_path, args.table_name)
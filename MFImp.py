@@ -7,9 +7,13 @@ import streamlit as st
 with st.spinner("Processing data..."):
     import pandas as pd
     import plotly.graph_objects as go
-    import re
     import sqlite3
+    import os
     from datetime import datetime
+    from mf_parser import parse_portfolio
+    import db_manager as db
+    from mf_returns import get_returns, invalidate_returns, PORTFOLIO_ID
+    from mf_import import get_active_holdings, match_holdings, quarterly_rows
     
 
 
@@ -40,83 +44,11 @@ if not raw_text.strip():
     st.stop()
 
 with st.spinner("Processing portfolio data..."):
-    # Remove commas globally
-    raw_text = raw_text.replace(",", "")
-
-
-    # --------------------------------------------------
-    # STEP 1: READ RAW CSV (single column expected)
-    # --------------------------------------------------
-    
-    # For each list value from splitlines, check if after triming there is any value. If not empty, them trim and add to list. This will remove empty lines and trim spaces.
-    raw_values = [line.strip() for line in raw_text.splitlines() if line.strip()]
-    
-    records = []
-    current_record = []
-
-    for line in raw_values:
-
-        if line.startswith("INF"):
-            if current_record:
-                records.append(current_record)
-            current_record = []
-
-            parts = line.split()
-            current_record.append(parts[0])  # ISIN
-
-            if len(parts) > 1:
-                current_record.append(parts[1])  # UCC
-
-        else:
-            current_record.append(line)
-
-    if current_record:
-        records.append(current_record)
-
-    # --------------------------------------------------
-    # CLEANING FUNCTION (same logic as Excel script)
-    # --------------------------------------------------
-
-    def fix_record(record):
-        # Rule 1: Column 4 (index 3) must be numeric
-        if len(record) >= 4 and re.search(r"[A-Za-z]", record[3]):
-            record[2] = record[2] + " " + record[3]
-            record.pop(3)
-
-        # Rule 2: AvgCost (index 5) must not be 1 or 2 digits
-        if len(record) >= 6 and re.fullmatch(r"\d{1,2}", record[5]):
-            record[4] = record[4] + record[5]
-            record.pop(5)
-
-        # Pad to 11 columns
-        record = record[:11]
-        while len(record) < 11:
-            record.append("")
-
-        return record
-
-    cleaned_records = [fix_record(r) for r in records]
-
-    columns = [
-        "ISIN", "UCC", "Name", "Folio", "Units",
-        "AvgCost", "TotCost", "Nav", "Value", "PL", "XIRR"
-    ]
-
-    df = pd.DataFrame(cleaned_records, columns=columns)
-
     # --------------------------------------------------
-    # NUMERIC CLEANUP
+    # PARSE (single pass: commas stripped per line, wrapped fields joined, numbers typed)
     # --------------------------------------------------
 
-    numeric_cols = ["Units", "AvgCost", "TotCost", "Nav", "Value", "PL", "XIRR"]
-
-    for col in numeric_cols:
-        df[col] = (
-            df[col]
-            .astype(str)
-            .str.replace(",", "", regex=False)
-        )
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df, parse_diagnostics = parse_portfolio(raw_text)
 
 
     # --------------------------------------------------
@@ -126,6 +58,10 @@ with st.spinner("Processing portfolio data..."):
     st.subheader("Parsed Portfolio Data")
     st.dataframe(df, use_container_width=True)
 
+    if not parse_diagnostics.empty:
+        with st.expander(f"Parse diagnostics ({parse_diagnostics['RecordNo'].nunique()} records adjusted)"):
+            st.dataframe(parse_diagnostics, use_container_width=True, hide_index=True)
+
 
     # --------------------------------------------------
     # PORTFOLIO SUMMARY
@@ -186,7 +122,7 @@ with st.spinner("Processing portfolio data..."):
 st.divider()
 st.subheader("Quarterly Selection & Import")
 
-DB_PATH = "/home/ea/TTMbak/JellyFin/JellyFin.db"
+DB_PATH = os.environ.get("JELLYFIN_DB_PATH", "/home/ea/TTMbak/JellyFin/JellyFin.db")
 
 
 conn = sqlite3.connect(DB_PATH)
@@ -197,15 +133,20 @@ cursor = conn.cursor()
 # A. TOP 3 MONTH/YEAR FROM MFQuarterly
 # --------------------------------------------------
 
-top_query = """
-SELECT TMonth, TYear
-FROM MFQuarterly
-GROUP BY TMonth, TYear
-ORDER BY TYear DESC, TMonth DESC
-LIMIT 3
-"""
+# Unique (MFTransId, TYear, TMonth) key for the upsert, plus the period index this listing reads;
+# the partial index on active MFTrans holdings serves the per-owner matching below
+if db.create_mf_quarterly_indexes(conn) | db.create_active_holdings_index(conn):
+    conn.commit()
+if not db.has_mf_quarterly_unique_index(conn):
+    duplicates_df = db.get_mf_quarterly_duplicates(conn)
+    st.warning(
+        f"MFQuarterly stores {len(duplicates_df)} holding periods more than once, so imports are disabled. "
+        "Run migrate.py, which backs up the database first, to keep the latest row of each."
+    )
+    st.dataframe(duplicates_df, use_container_width=True, hide_index=True)
+    st.stop()
 
-top_df = pd.read_sql_query(top_query, conn)
+top_df = db.get_latest_mf_periods(conn, 3)
 
 st.markdown("### Latest 3 Imported Periods")
 st.dataframe(top_df, use_container_width=True)
@@ -263,82 +204,45 @@ with col3:
         st.info("Owners found but OwnerId is missing.")
         st.stop()
 
-with col4:
-    st.write("Ready to go!")
-    import_clicked = st.button("Import to MFQuarterly")
 # --------------------------------------------------
-# D. IMPORT BUTTON
+# Match parsed holdings with the owner's active MFTrans records (ClosedDate IS NULL) on ISIN/Folio
 # --------------------------------------------------
 
-if import_clicked:
-
-    # --------------------------------------------------
-    # Get Active MFTrans records (ClosedDate IS NULL)
-    # --------------------------------------------------
-
-    # Use OwnerId if available, otherwise fall back to Owner name column
-    if selected_owner_id is not None:
-        mftrans_query = """
-        SELECT MFTransId, ISIN, Folio
-        FROM MFTrans
-        WHERE ClosedDate IS NULL
-        AND OwnerId = ?
-        """
-        mftrans_df = pd.read_sql_query(mftrans_query, conn, params=(selected_owner_id,))
-    else:
-        st.info("Owners found but OwnerId is missing.")
-        st.stop()
+holdings = get_active_holdings(conn, selected_owner_id)
+matched, raw_unmapped, mf_unmapped = match_holdings(df, holdings)
+records_to_insert = quarterly_rows(matched, year, month)
 
+# --------------------------------------------------
+# Pre-import diff against what is already stored for this period
+# --------------------------------------------------
 
-    # --------------------------------------------------
-    # Merge Raw Data (df) with MFTrans
-    # --------------------------------------------------
+diff_df = db.diff_mf_quarterly(conn, records_to_insert)
+status_counts = diff_df["Status"].value_counts()
 
-    merged = df.merge(
-        mftrans_df,
-        on=["ISIN", "Folio"],
-        how="left",
-        indicator=True
+with col4:
+    st.write(
+        f"{status_counts.get('New', 0)} new, {status_counts.get('Changed', 0)} changed, "
+        f"{status_counts.get('Unchanged', 0)} unchanged"
     )
+    import_clicked = st.button("Import to MFQuarterly")
 
-    # Records that matched
-    matched = merged[merged["_merge"] == "both"].copy()
-
-    # Records in Raw but NOT in MFTrans
-    raw_unmapped = merged[merged["_merge"] == "left_only"].copy()
-
-    # --------------------------------------------------
-    # Prepare Insert Data
-    # --------------------------------------------------
-
-    insert_df = matched.copy()
-
-    insert_df["TMonth"] = month
-    insert_df["TYear"] = year
-
-    insert_cols = [
-        "MFTransId",
-        "TMonth",
-        "TYear",
-        "Units",
-        "TotCost",
-        "Nav",
-        "Value",
-        "XIRR"
-    ]
-
-    records_to_insert = insert_df[insert_cols].values.tolist()
+changed_df = diff_df[diff_df["Status"] == "Changed"]
+if not changed_df.empty:
+    with st.expander(f"Holdings already imported for {month}/{year} with different values"):
+        st.dataframe(changed_df, use_container_width=True, hide_index=True)
 
-    insert_sql = """
-    INSERT INTO MFQuarterly
-    (MFTransId, TMonth, TYear, Units, TotCost, Nav, Value, XIRR)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """
+# --------------------------------------------------
+# D. IMPORT BUTTON
+# --------------------------------------------------
 
-    cursor.executemany(insert_sql, records_to_insert)
+if import_clicked:
+    # Re-importing a period updates it in place; unchanged rows are left alone
+    written = db.upsert_mf_quarterly(conn, records_to_insert)
+    if written:
+        invalidate_returns(conn, selected_owner_id, year, month)
     conn.commit()
 
-    st.success(f"{len(records_to_insert)} records imported successfully.")
+    st.success(f"{written} records imported successfully ({len(records_to_insert) - written} unchanged).")
 
     # --------------------------------------------------
     # E. UNMAPPED TABLES
@@ -352,18 +256,40 @@ if import_clicked:
     st.dataframe(raw_unmapped[["ISIN", "Folio", "Name"]], use_container_width=True)
 
     # MFTrans → Raw unmapped
-    raw_keys = df[["ISIN", "Folio"]].drop_duplicates()
+    st.markdown("### MFTrans Records (ClosedDate IS NULL) NOT Found in Raw Data")
+    st.dataframe(mf_unmapped[["ISIN", "Folio", "MFTransId"]], use_container_width=True)
 
-    mf_unmapped = mftrans_df.merge(
-        raw_keys,
-        on=["ISIN", "Folio"],
-        how="left",
-        indicator=True
-    )
+# --------------------------------------------------
+# F. RETURNS FROM STORED HISTORY (cached per owner and period in MFReturns)
+# --------------------------------------------------
 
-    mf_unmapped = mf_unmapped[mf_unmapped["_merge"] == "left_only"]
+returns_df = get_returns(conn, selected_owner_id, year, month)
+# Only a rebuild of the returns cache writes anything
+if conn.in_transaction:
+    conn.commit()
 
-    st.markdown("### MFTrans Records (ClosedDate IS NULL) NOT Found in Raw Data")
-    st.dataframe(mf_unmapped[["ISIN", "Folio", "MFTransId"]], use_container_width=True)
+st.divider()
+st.subheader(f"Returns for {selected_owner_name} as of {month}/{year}")
+if returns_df.empty:
+    st.info("No MFQuarterly history stored for this owner and period yet.")
+else:
+    portfolio = returns_df[returns_df["MFTransId"] == PORTFOLIO_ID].iloc[0]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Cost", f"{portfolio['TotCost']:,.2f}")
+    col2.metric("Total Value", f"{portfolio['Value']:,.2f}")
+    col3.metric("Portfolio XIRR", "n/a" if pd.isna(portfolio["XIRR"]) else f"{portfolio['XIRR']:.2f}%")
+
+    fund_returns = returns_df[returns_df["MFTransId"] != PORTFOLIO_ID]
+    holding_keys = {mf_id: key for key, mf_id in holdings.items()}
+    fund_returns = fund_returns.assign(
+        ISIN=fund_returns["MFTransId"].map(lambda i: holding_keys.get(i, (None, None))[0]),
+        Folio=fund_returns["MFTransId"].map(lambda i: holding_keys.get(i, (None, None))[1]),
+    )
+    with st.expander("Per-fund XIRR"):
+        st.dataframe(
+            fund_returns[["MFTransId", "ISIN", "Folio", "TotCost", "Value", "XIRR"]],
+            use_container_width=True,
+            hide_index=True
+        )
 
 conn.close()
@@ -1,25 +1,41 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
+import index_store
+import seasonality
+
+DEFAULT_INDEX = "NIFTY 50"
 
 @st.cache_data
-def load_nifty_data(csv_file):
-    df = pd.read_csv(csv_file)
-    df.columns = df.columns.str.strip()
-    
-    df['Date'] = pd.to_datetime(df['Date'], format='%d-%b-%Y')
-    df.set_index('Date', inplace=True)
-    df.sort_index(inplace=True)
-    
-    return df[['Close']]
+def load_nifty_data(index_name, store_version):
+    # store_version only keys the cache: it changes whenever an index file is rewritten
+    df = index_store.load_index_history([index_name])
+    return df.set_index('Date')[['Close']]
+
+@st.cache_data
+def load_seasonality(index_names, store_version):
+    return seasonality.seasonality(index_store.load_index_history(list(index_names)))
 
 def main():
     st.title("NSE Nifty 50 Weekly Average Closing Prices (Past 3 Years)")
     
+    # Uploads are parsed once and merged into the local index store; analysis reads the store
+    index_name = st.text_input("Index name", DEFAULT_INDEX).strip()
     uploaded_file = st.file_uploader("Upload your Nifty 50 CSV file", type="csv")
     
-    if uploaded_file is not None:
-        df = load_nifty_data(uploaded_file)
+    if uploaded_file is not None and index_name and st.session_state.get("ingested_upload") != (uploaded_file.file_id, index_name):
+        try:
+            added, total = index_store.ingest_index_csv(uploaded_file, index_name)
+        except (ValueError, KeyError) as e:
+            st.error(f"Could not read the CSV file: {e}")
+            st.stop()
+        st.session_state["ingested_upload"] = (uploaded_file.file_id, index_name)
+        st.success(f"✅ Stored {added} new trading days for {index_name} ({total} in total)")
+    
+    indices = index_store.list_indices()
+    if indices:
+        index_name = st.selectbox("Stored index", indices, index=indices.index(index_name) if index_name in indices else 0)
+        df = load_nifty_data(index_name, index_store.get_store_version())
         
         if df.empty:
             st.error("No data loaded.")
@@ -31,9 +47,8 @@ def main():
         
         st.success(f"✅ Loaded {len(df_past_3y)} trading days")
         
-        # FIXED: Simple and robust weekday mapping
-        df_past_3y['weekday'] = df_past_3y.index.weekday
-        weekly_avg = df_past_3y.groupby('weekday')['Close'].mean().round(2)
+        # Grouped by the index's weekday directly, so the filtered slice is never modified
+        weekly_avg = df_past_3y['Close'].groupby(df_past_3y.index.weekday).mean().round(2)
         
         # Create new Series with day names - NO INDEX ASSIGNMENT
         day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
@@ -57,6 +72,20 @@ def main():
         
         with st.expander("📊 Data preview"):
             st.dataframe(df_past_3y.reset_index()[['Date', 'Close']].head(20))
+        
+        # Return seasonality for any stored indices and every lookback window at once
+        st.subheader("Return Seasonality")
+        compare = st.multiselect("Indices", indices, default=[index_name])
+        kind = st.radio("Calendar bucket", list(seasonality.BUCKET_LABELS), horizontal=True)
+        stat = st.radio("Statistic", ['Mean', 'Median', 'HitRate', 'TStat'], horizontal=True)
+        if compare:
+            stats = load_seasonality(tuple(compare), index_store.get_store_version())
+            stats = stats[stats['Kind'] == kind]
+            table = stats.pivot_table(index=['Bucket', 'Label'], columns=['Index', 'Window'], values=stat, sort=False)
+            table = table.sort_index(level='Bucket').droplevel('Bucket')
+            st.dataframe(table.reindex(columns=list(seasonality.WINDOWS), level='Window'), use_container_width=True)
+            st.caption("Mean and Median are returns in percent; HitRate is the percent of positive returns. "
+                       "Weekday and week-of-month use daily returns, months use month-end to month-end returns.")
 
 if __name__ == "__main__":
     main()
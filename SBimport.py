@@ -2,13 +2,14 @@ import streamlit as st
 import pandas as pd
 from io import BytesIO
 import sqlite3
-from datetime import datetime
+import os
 from sb_classifier import get_proposed_category, update_sb_meta
+from db_manager import refresh_daily_balance, normalize_date
 
 # TODO: make compatible with ICICI. Till then, just copy from the icici excel into an HDFC stmt and ensure the dates are in yyyy-mm-dd format 
 
 
-DB_PATH = "/home/ea/TTMbak/JellyFin/JellyFin.db"
+DB_PATH = os.environ.get("JELLYFIN_DB_PATH", "/home/ea/TTMbak/JellyFin/JellyFin.db")
 st.set_page_config(layout="wide")
 
 # Initialize session state variables
@@ -23,13 +24,63 @@ if "last_import_date" not in st.session_state:
 
 # Function to covert Sqlite date string from '%d/%m/%y' to '%Y-%m-%d' 
 def convert_date_format(date_str):
-    try:
-        # Try parsing as '%d/%m/%y'
-        dt = datetime.strptime(date_str, '%d/%m/%y')
-        return dt.strftime('%Y-%m-%d')
-    except ValueError:
-        # If parsing fails, return the original string
-        return date_str
+    # Statement dates are '%d/%m/%y'; returns ISO 'YYYY-MM-DD', or None if the value is not a date
+    return normalize_date(date_str)
+
+def import_statement_rows(conn, bank_id, xls_data, last_import_date):
+    """
+    Inserts statement rows (Date, Narration, ..., Withdrawal, Deposit columns) dated after
+    last_import_date into SB for bank_id and extends the daily balance series.
+    Stops at the first blank or '*' row. Runs inside the caller's transaction; the caller commits.
+    Returns (imported_count, skipped_dates) where skipped_dates lists unrecognised date cells.
+    """
+    cursor = conn.cursor()
+    imported_count = 0
+    skipped_dates = []
+    first_imported_date = None
+    for i in range(len(xls_data)):
+        # Stop at blank row
+        if pd.isnull(xls_data.iloc[i, 0]):
+            break
+        
+        # Stop at another "*" row
+        cell_value = xls_data.iloc[i, 0]
+        if isinstance(cell_value, str) and all(c == '*' for c in cell_value if c is not None):
+            break
+        
+        # Only import if date is after last_import_date
+        row_date = xls_data.iloc[i].iloc[0]  # First column is the Date column
+        if not pd.isnull(row_date):
+            # Convert row_date to date string for comparison
+            row_date_str = convert_date_format(row_date)
+            if row_date_str is None:
+                skipped_dates.append(str(row_date))
+                continue
+            
+            # Only import if this date is after the last import date
+            if last_import_date is None or row_date_str > last_import_date:
+                # Get values by column position since they're accessed by name in the header row
+                narration = xls_data.iloc[i].iloc[1] if len(xls_data.columns) > 2 else None
+                withdrawal_amt = xls_data.iloc[i].iloc[4] if len(xls_data.columns) > 4 else None
+                deposit_amt = xls_data.iloc[i].iloc[5] if len(xls_data.columns) > 3 else None
+                
+                query_insert_sb = """INSERT INTO SB (BankId, DateT, SBName, AmtIn, AmtOut) 
+                                     VALUES (?, ?, ?, ?, ?)"""
+                cursor.execute(query_insert_sb, (
+                    bank_id,
+                    row_date_str,
+                    str(narration) if not pd.isnull(narration) else None,
+                    deposit_amt if not pd.isnull(deposit_amt) else None,
+                    withdrawal_amt if not pd.isnull(withdrawal_amt) else None
+                ))
+                imported_count += 1
+                if first_imported_date is None or row_date_str < first_imported_date:
+                    first_imported_date = row_date_str
+    
+    # Extend the persisted daily balance series from the first imported day
+    if imported_count > 0:
+        refresh_daily_balance(conn, bank_id, first_imported_date)
+    return imported_count, skipped_dates
 
 # Connect to SQLite database
 conn = sqlite3.connect(DB_PATH)
@@ -85,43 +136,11 @@ if uploaded_file is not None and not st.session_state.import_completed:
                 last_import_date = cursor.fetchone()[0]
                 
                 # Step 7b/7c: Import data into the SB table
-                imported_count = 0
-                for i in range(len(xls_data)):
-                    # Stop at blank row
-                    if pd.isnull(xls_data.iloc[i, 0]):
-                        break
-                    
-                    # Stop at another "*" row
-                    cell_value = xls_data.iloc[i, 0]
-                    if isinstance(cell_value, str) and all(c == '*' for c in cell_value if c is not None):
-                        break
-                    
-                    # Only import if date is after last_import_date
-                    row_date = xls_data.iloc[i].iloc[0]  # First column is the Date column
-                    if not pd.isnull(row_date):
-                        # Convert row_date to date string for comparison
-                        row_date_str = convert_date_format(row_date)
-                        
-                        # Only import if this date is after the last import date
-                        if last_import_date is None or row_date_str > last_import_date:
-                            # Get values by column position since they're accessed by name in the header row
-                            narration = xls_data.iloc[i].iloc[1] if len(xls_data.columns) > 2 else None
-                            withdrawal_amt = xls_data.iloc[i].iloc[4] if len(xls_data.columns) > 4 else None
-                            deposit_amt = xls_data.iloc[i].iloc[5] if len(xls_data.columns) > 3 else None
-                            
-                            query_insert_sb = """INSERT INTO SB (BankId, DateT, SBName, AmtIn, AmtOut) 
-                                                 VALUES (?, ?, ?, ?, ?)"""
-                            cursor.execute(query_insert_sb, (
-                                selected_bank_id,
-                                row_date_str,
-                                str(narration) if not pd.isnull(narration) else None,
-                                deposit_amt if not pd.isnull(deposit_amt) else None,
-                                withdrawal_amt if not pd.isnull(withdrawal_amt) else None
-                            ))
-                            imported_count += 1
-                
+                imported_count, skipped_dates = import_statement_rows(conn, selected_bank_id, xls_data, last_import_date)
                 conn.commit()
                 st.success(f"Successfully imported {imported_count} records")
+                if skipped_dates:
+                    st.warning(f"Skipped {len(skipped_dates)} rows with unrecognised dates: {', '.join(skipped_dates[:5])}")
                 
                 # Store in session state for display
                 st.session_state.imported_data = imported_count
@@ -0,0 +1,66 @@
+import warnings
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# --- Configuration ---
+# Number of prior outflows per category the typical amount is taken from
+WINDOW = 30
+MIN_HISTORY = 5
+# Modified z-score above which an outflow is flagged (Iglewicz & Hoaglin)
+SCORE_THRESHOLD = 3.5
+# 0.6745 scales the MAD so the score is comparable to a standard z-score
+MAD_SCALE = 0.6745
+
+OUTLIER_COLUMNS = ['DateT', 'CategoryName', 'SBName', 'AmtOut', 'TypicalAmount', 'Score', 'Comment']
+
+def rolling_median_mad(values, window, min_history):
+    """
+    Median and MAD (median absolute deviation from that median) of the `window` values before
+    each position, NaN where fewer than min_history precede it. Every prior window is one row
+    of a NaN-padded sliding view, so both come from two vectorized nanmedians.
+    """
+    padded = np.concatenate([np.full(window, np.nan), np.asarray(values, dtype=float)])
+    windows = sliding_window_view(padded, window)[:len(values)]
+    enough = (~np.isnan(windows)).sum(axis=1) >= min_history
+    median = np.full(len(values), np.nan)
+    mad = np.full(len(values), np.nan)
+    if enough.any():
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            median[enough] = np.nanmedian(windows[enough], axis=1)
+            mad[enough] = np.nanmedian(np.abs(windows[enough] - median[enough, None]), axis=1)
+    return median, mad
+
+def score_outflows(df, window=WINDOW, min_history=MIN_HISTORY):
+    """
+    Scores every outflow against the median and MAD of the previous `window` outflows in the
+    same category; outflows without a category form one bucket of their own. Each row is
+    compared only with earlier rows, so a single large payment does not hide itself. Returns
+    the frame sorted by date with TypicalAmount and Score columns added; rows without
+    min_history earlier outflows get a NaN score.
+    """
+    out = df[df['AmtOut'] > 0].sort_values('DateT', kind='mergesort')
+    if out.empty:
+        return out.assign(TypicalAmount=pd.Series(dtype=float), Score=pd.Series(dtype=float))
+
+    amounts = out['AmtOut'].to_numpy(dtype=float)
+    median = np.full(len(out), np.nan)
+    mad = np.full(len(out), np.nan)
+    # NULL categories get a code of their own instead of being dropped
+    category, _ = pd.factorize(out['CategoryName'], use_na_sentinel=False)
+    for rows in pd.Series(category).groupby(category, sort=False).indices.values():
+        median[rows], mad[rows] = rolling_median_mad(amounts[rows], window, min_history)
+    # Categories with near-identical amounts have a MAD of ~0; floor it at 1% of the median
+    mad = np.maximum(mad, median * 0.01)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = np.where(mad > 0, MAD_SCALE * (amounts - median) / mad, np.nan)
+    return out.assign(TypicalAmount=median, Score=score)
+
+def top_outliers(df, top_n=25, threshold=SCORE_THRESHOLD, window=WINDOW, min_history=MIN_HISTORY):
+    """Returns up to top_n outflows scoring above threshold, highest score first."""
+    scored = score_outflows(df, window, min_history)
+    if scored.empty:
+        return pd.DataFrame(columns=OUTLIER_COLUMNS)
+    flagged = scored[scored['Score'] > threshold].nlargest(top_n, 'Score')
+    return flagged[OUTLIER_COLUMNS].reset_index(drop=True)
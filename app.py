@@ -4,6 +4,9 @@ import plotly.express as px
 import plotly.graph_objects as go
 import altair as alt
 import db_manager as db
+import perf
+from recurrence import detect_recurring
+from anomaly import top_outliers, SCORE_THRESHOLD
 from datetime import datetime, timedelta
 import numpy as np
 import os
@@ -199,6 +202,15 @@ COLOR_INVEST = '#3b82f6'   # Blue
 COLOR_ACCENT = '#8b5cf6'   # Purple
 COLOR_CARD_BG = 'rgba(15, 23, 42, 0.3)'
 
+# Upper bound on points sent to Plotly for long time-series charts
+CHART_MAX_POINTS = int(os.environ.get("JELLYFIN_CHART_MAX_POINTS", 1500))
+# Load the ledger from the Parquet snapshot next to the database instead of SQLite
+LEDGER_SNAPSHOT = os.environ.get("JELLYFIN_LEDGER_SNAPSHOT", "0") == "1"
+# Rows shown in the Wealth Coach recurring-payments and outlier tables
+RECURRING_DISPLAY_LIMIT = 50
+OUTLIER_DISPLAY_LIMIT = 25
+CHART_RESOLUTIONS = {"Daily": "D", "Weekly": "W"}
+
 def format_inr(amount, include_symbol=True):
     if amount is None or pd.isna(amount):
         return "₹0.00" if include_symbol else "0.00"
@@ -277,6 +289,40 @@ def build_altair_bar_chart(df, x_col, y_col, title, color, y_title='Amount (Lakh
     text = base.mark_text(dy=-10, color='#ffffff', size=12).encode(text='Label:N')
     return alt.layer(base, text).configure_view(stroke='transparent').configure_title(color='#e2e8f0')
 
+def resample_closing(dates, values, freq="D"):
+    """
+    Collapses a per-transaction running series to one closing value per day/week.
+    Periods without transactions carry the previous close forward.
+    """
+    series = pd.Series(np.asarray(values, dtype=float), index=pd.DatetimeIndex(dates))
+    series = series[series.index.notna()]
+    if series.empty:
+        return series
+    return series.resample(freq).last().ffill()
+
+def downsample_minmax(series, max_points=CHART_MAX_POINTS):
+    """
+    Peak-preserving downsampler: splits the series into max_points // 2 equal buckets and
+    keeps the min and max sample of each (plus both endpoints), in original order.
+    """
+    n = len(series)
+    if n <= max_points or max_points < 4:
+        return series
+    n_buckets = max_points // 2
+    bucket = np.arange(n) * n_buckets // n
+    order = np.lexsort((series.to_numpy(), bucket))
+    sorted_buckets = bucket[order]
+    bucket_ids = np.arange(n_buckets)
+    first = np.searchsorted(sorted_buckets, bucket_ids, side='left')
+    last = np.searchsorted(sorted_buckets, bucket_ids, side='right') - 1
+    keep = np.unique(np.concatenate([order[first], order[last], [0, n - 1]]))
+    return series.iloc[keep]
+
+def build_series_frame(dates, values, value_col, freq="D", max_points=CHART_MAX_POINTS):
+    """Resample + downsample a running series into a (DateT, value_col) frame of bounded size."""
+    series = downsample_minmax(resample_closing(dates, values, freq), max_points)
+    return pd.DataFrame({'DateT': series.index, value_col: series.to_numpy()})
+
 # Helper function to style Plotly charts
 def style_chart(fig):
     fig.update_layout(
@@ -294,6 +340,363 @@ def style_chart(fig):
     )
     return fig
 
+# Chart rendering, timed as "chart" spans: st.*_chart is where figures are serialized for the browser
+def altair_chart(chart, name, **kwargs):
+    with perf.span("chart", name):
+        return st.altair_chart(chart, **kwargs)
+
+def plotly_chart(fig, name, **kwargs):
+    with perf.span("chart", name):
+        return st.plotly_chart(fig, **kwargs)
+
+# Investment Categorization Heuristic
+def is_investment_row(row):
+    cat_name = str(row['CategoryName']).lower() if pd.notna(row['CategoryName']) else ""
+    budget_name = str(row['BudgetName']).lower() if pd.notna(row['BudgetName']) else ""
+    keywords = ['invest', 'stock', 'mutual fund', 'mf', 'crypto', 'savings', 'equity', 'gold', 'fd', 'ppf', 'epf', 'sip']
+    return any(k in cat_name or k in budget_name for k in keywords)
+
+def flag_investments(df):
+    """Evaluates is_investment_row once per distinct (CategoryName, BudgetName) pair and maps it back to every row."""
+    if df.empty:
+        return pd.Series(False, index=df.index)
+    budget_codes = df['BudgetName'].cat.codes.to_numpy().astype(np.int64)
+    pair_codes = df['CategoryName'].cat.codes.to_numpy().astype(np.int64) * (len(df['BudgetName'].cat.categories) + 1) + budget_codes + 1
+    inverse, _ = pd.factorize(pair_codes)
+    _, first_rows = np.unique(inverse, return_index=True)
+    flags = df.iloc[first_rows].apply(is_investment_row, axis=1).to_numpy(dtype=bool)
+    return pd.Series(flags[inverse], index=df.index)
+
+# Budget class of each row, derived once from Category.BudgetName
+BUDGET_CLASSES = ['Unbudgeted', 'Earn', 'Invest', 'Spend']
+UNBUDGETED, EARN, INVEST, SPEND = range(len(BUDGET_CLASSES))
+
+def classify_budget(budget_names):
+    """
+    Maps BudgetName to a categorical budget class: blank/NULL -> Unbudgeted, exactly "Earn" or
+    "Invest", and any other budget (including " Invest ") -> Spend. Only the distinct names
+    are compared.
+    """
+    codes, uniques = pd.factorize(budget_names)
+    names = pd.Index(uniques.astype(str))
+    class_of_unique = np.select([names.str.strip() == '', names == 'Earn', names == 'Invest'], [UNBUDGETED, EARN, INVEST], default=SPEND)
+    class_codes = np.append(class_of_unique, UNBUDGETED)[codes]
+    return pd.Categorical.from_codes(class_codes, categories=BUDGET_CLASSES)
+
+def month_labels(year_month):
+    """'YYYY-MM' labels for integer YYYYMM keys, formatted once per distinct month ('NaT' when missing)."""
+    codes, uniques = pd.factorize(year_month)
+    labels = np.array([f"{int(m) // 100:04d}-{int(m) % 100:02d}" for m in uniques] + ['NaT'], dtype=object)
+    return pd.Series(labels[codes], index=year_month.index)
+
+def sum_by_budget(df, amount_col):
+    """Totals positive amount_col values per BudgetName, reporting blank/NULL budgets as Uncategorized."""
+    rows = df[df[amount_col] > 0]
+    labels = rows['BudgetName'].astype(object).where(rows['BudgetClass'] != 'Unbudgeted', "Uncategorized")
+    return rows[amount_col].groupby(labels.rename('BudgetName')).sum().reset_index()
+
+def compute_budget_vs_actual(df_source, df_budgets):
+    """
+    Joins per-category outflow totals against the budget frame in one vectorized pass.
+    Returns one row per category with AmtOut, Budget, Remaining and Percentage columns.
+    """
+    spent = df_source.groupby('CategoryId')['AmtOutPaise'].sum() / 100
+    df_cmp = df_budgets.copy()
+    df_cmp['AmtOut'] = df_cmp['CategoryId'].map(spent).fillna(0.0)
+    df_cmp['Remaining'] = df_cmp['Budget'] - df_cmp['AmtOut']
+    df_cmp['Percentage'] = (df_cmp['AmtOut'] / df_cmp['Budget'] * 100).replace([np.inf, -np.inf], np.nan).fillna(0.0).round(1)
+    df_cmp['IsOver'] = df_cmp['AmtOut'] > df_cmp['Budget']
+    return df_cmp.reset_index(drop=True)
+
+# --- Cached data preparation ---
+# Every loader is keyed on data_version (changes on any DB write) and, where it applies,
+# on the sidebar filters tuple (date_range, banks, categories). Each tab calls only its
+# own prepare_* function, so a rerun does no work for tabs that are not on screen.
+#
+# Row-level frames and the per-tab rollups live in a process-wide shared store
+# (st.cache_resource): every session gets the same objects, without the per-call unpickled
+# copy st.cache_data makes, so N browser sessions hold one ledger in memory instead of N.
+# Callers must treat these results as read-only (derive with assign/copy, never set columns
+# in place); their numeric columns are plain NumPy arrays readable via to_numpy() without
+# copying. Small lookups and scalar results stay on st.cache_data.
+SHARED_STORE_MAX_ENTRIES = int(os.environ.get("JELLYFIN_SHARED_STORE_MAX_ENTRIES", 32))
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+@perf.timed("prepare")
+def load_transactions(data_version):
+    df = db.get_all_transactions(use_snapshot=LEDGER_SNAPSHOT)
+    df['BudgetClass'] = classify_budget(df['BudgetName'])
+    df['IsInvestment'] = flag_investments(df)
+    df['Month'] = month_labels(df['YearMonth'])
+    return df
+
+@st.cache_data(show_spinner=False)
+@perf.timed("prepare")
+def load_categories(data_version):
+    return db.get_categories()
+
+@st.cache_data(show_spinner=False)
+@perf.timed("prepare")
+def load_banks(data_version):
+    return db.get_banks()
+
+@st.cache_data(show_spinner=False)
+@perf.timed("prepare")
+def load_budgets(data_version, as_of_month=None):
+    return db.get_budgets(as_of_month)
+
+@st.cache_resource(show_spinner=False, max_entries=SHARED_STORE_MAX_ENTRIES)
+@perf.timed("prepare")
+def load_daily_balances(data_version, bank_id=db.OVERALL_BANK_ID):
+    return db.get_daily_balances(bank_id)
+
+@st.cache_data(show_spinner=False)
+@perf.timed("prepare")
+def load_date_bounds(data_version):
+    """Returns (row_count, min_date, max_date) of the full ledger for the sidebar date picker."""
+    df = load_transactions(data_version)
+    if df.empty or not df['DateT'].notna().any():
+        return len(df), None, None
+    return len(df), df['DateT'].min().to_pydatetime(), df['DateT'].max().to_pydatetime()
+
+@st.cache_resource(show_spinner=False, max_entries=SHARED_STORE_MAX_ENTRIES)
+@perf.timed("prepare")
+def load_filtered_transactions(data_version, filters):
+    date_range, banks, categories = filters
+    df = load_transactions(data_version)
+    if df.empty:
+        return df
+
+    # Amounts, budget class and investment flag are already prepared by load_transactions
+    mask = pd.Series(True, index=df.index)
+    if date_range:
+        mask &= (df['DateT'] >= date_range[0]) & (df['DateT'] <= date_range[1])
+    if banks:
+        mask &= df['BankName'].isin(banks)
+    if categories:
+        mask &= df['CategoryName'].isin(categories)
+    return df if mask.all() else df[mask]
+
+@st.cache_data(show_spinner=False)
+@perf.timed("prepare")
+def compute_kpis(data_version, filters):
+    df_filtered = load_filtered_transactions(data_version, filters)
+    kpis = dict.fromkeys(['total_inflow', 'total_earned', 'total_outflow', 'total_spent', 'total_invested',
+                          'total_spending', 'net_savings', 'savings_rate'], 0.0)
+    if df_filtered.empty:
+        return kpis
+
+    # One pass: per-budget-class totals of AmtIn and AmtOut, summed in integer paise
+    # (whole-number float64 sums are exact below 2**53 paise) and converted to rupees once
+    class_codes = df_filtered['BudgetClass'].cat.codes.to_numpy()
+    in_by_class = np.bincount(class_codes, weights=df_filtered['AmtInPaise'].to_numpy(), minlength=len(BUDGET_CLASSES))
+    out_by_class = np.bincount(class_codes, weights=df_filtered['AmtOutPaise'].to_numpy(), minlength=len(BUDGET_CLASSES))
+    kpis['total_inflow'] = in_by_class.sum() / 100
+    kpis['total_earned'] = in_by_class[EARN] / 100
+    kpis['total_outflow'] = out_by_class.sum() / 100
+    kpis['total_spent'] = (out_by_class[EARN] + out_by_class[SPEND]) / 100
+    kpis['total_invested'] = out_by_class[INVEST] / 100
+    # Pure Spending (outflow minus investments)
+    kpis['total_spending'] = kpis['total_outflow']
+    kpis['net_savings'] = kpis['total_earned'] - kpis['total_spent']
+    kpis['savings_rate'] = (kpis['net_savings'] / kpis['total_earned'] * 100) if kpis['total_earned'] > 0 else 0.0
+    return kpis
+
+@st.cache_data(show_spinner=False)
+@perf.timed("prepare")
+def load_budget_vs_actual(data_version, filters, as_of_month, spend_only=False):
+    """
+    Budget vs actual over every filtered row (the Overview tracker and Coach alerts), or with
+    spend_only over the Spending tab's Earn/Spend outflows (its Budget vs. Actual table).
+    """
+    df_filtered = load_filtered_transactions(data_version, filters)
+    df_budgets = load_budgets(data_version, as_of_month)
+    if df_filtered.empty or df_budgets.empty:
+        return pd.DataFrame()
+    df_source = prepare_spending(data_version, filters)['spend'] if spend_only else df_filtered
+    return compute_budget_vs_actual(df_source, df_budgets)
+
+@st.cache_data(show_spinner=False)
+@perf.timed("prepare")
+def load_bank_balances(data_version, opening_date, closing_date):
+    df_bal = load_banks(data_version)
+    df_bal['Opening'] = [db.get_closing_balance(b_id, opening_date) for b_id in df_bal['BankId']]
+    df_bal['Closing'] = [db.get_closing_balance(b_id, closing_date) for b_id in df_bal['BankId']]
+    return df_bal
+
+@st.cache_resource(show_spinner=False, max_entries=SHARED_STORE_MAX_ENTRIES)
+@perf.timed("prepare")
+def prepare_overview(data_version, filters):
+    df_filtered = load_filtered_transactions(data_version, filters)
+    prep = {}
+    if df_filtered.empty:
+        return prep
+
+    # Budget-wise inflow & outflow
+    prep['budget_in'] = sum_by_budget(df_filtered, 'AmtIn')
+    prep['budget_out'] = sum_by_budget(df_filtered, 'AmtOut')
+
+    # Month-wise net outflows (only records where AmtOut > 0)
+    df_netout = df_filtered[df_filtered['AmtOut'] > 0]
+    df_netout = df_netout.assign(NetOut=df_netout['AmtOut'] - df_netout['AmtIn'])
+    df_budget_month = (
+        df_netout
+        .groupby(['BudgetName', 'Month', 'CategoryId', 'CategoryName'], observed=True)
+        .agg({'NetOut': 'sum'})
+        .reset_index()
+    )
+    prep['netout'] = df_netout
+    prep['budget_month'] = df_budget_month[df_budget_month['BudgetName'].notna()]
+
+    # Monthly inflow vs outflow trend
+    df_trend = df_filtered[df_filtered['DateT'].notna()]
+    df_monthly = df_trend.groupby('Month')[['AmtIn', 'AmtOut']].sum().reset_index()
+    prep['monthly'] = df_monthly.rename(columns={'AmtIn': 'Inflow', 'AmtOut': 'Outflow'})
+
+    # Top spending categories
+    df_top_cats = df_filtered[(df_filtered['AmtOut'] > 0) & df_filtered['BudgetClass'].isin(['Earn', 'Spend'])]
+    prep['top_cats'] = df_top_cats.groupby('CategoryName', observed=True)['AmtOut'].sum().reset_index().sort_values(by='AmtOut', ascending=False).head(5)
+    return prep
+
+def get_yoy_base(data_version, filters, amount_col):
+    """Full-history rows with a positive amount_col, honouring only the bank and category filters."""
+    _, banks, categories = filters
+    df = load_transactions(data_version)
+    mask = df[amount_col] > 0
+    if banks:
+        mask &= df['BankName'].isin(banks)
+    if categories:
+        mask &= df['CategoryName'].isin(categories)
+    df = df[mask]
+    return df.assign(Year=df['Month'].str[:4])
+
+@st.cache_resource(show_spinner=False, max_entries=SHARED_STORE_MAX_ENTRIES)
+@perf.timed("prepare")
+def prepare_income(data_version, filters):
+    df_filtered = load_filtered_transactions(data_version, filters)
+    prep = {'earn': pd.DataFrame()}
+    if df_filtered.empty:
+        return prep
+
+    # Filter only records where BudgetName is 'Earn'
+    inc_df = df_filtered[(df_filtered['AmtIn'] > 0) & (df_filtered['BudgetClass'] == 'Earn')]
+    prep['earn'] = inc_df
+    # Group by CategoryName (Source Names derived from Category Table)
+    prep['by_cat'] = inc_df.groupby('CategoryName', observed=True)['AmtIn'].sum().reset_index()
+    df_yoy_base = get_yoy_base(data_version, filters, 'AmtIn')
+    prep['yoy_base'] = df_yoy_base[df_yoy_base['BudgetClass'] == 'Earn']
+    return prep
+
+@st.cache_resource(show_spinner=False, max_entries=SHARED_STORE_MAX_ENTRIES)
+@perf.timed("prepare")
+def prepare_spending(data_version, filters):
+    df_filtered = load_filtered_transactions(data_version, filters)
+    prep = {'spend': pd.DataFrame()}
+    if df_filtered.empty:
+        return prep
+
+    # Filter only records whose Category's BudgetName is not null and not "Invest"
+    spend_df = df_filtered[(df_filtered['AmtOut'] > 0) & df_filtered['BudgetClass'].isin(['Earn', 'Spend'])]
+    prep['spend'] = spend_df
+    # Group by CategoryName (Expenses)
+    prep['by_cat'] = spend_df.groupby('CategoryName', observed=True)['AmtOut'].sum().reset_index()
+    df_yoy_base = get_yoy_base(data_version, filters, 'AmtOut')
+    prep['yoy_base'] = df_yoy_base[df_yoy_base['BudgetClass'].isin(['Earn', 'Spend'])]
+    return prep
+
+@st.cache_resource(show_spinner=False, max_entries=SHARED_STORE_MAX_ENTRIES)
+@perf.timed("prepare")
+def prepare_spending_drill(data_version, filters):
+    """Spending pre-grouped by (BudgetName, CategoryName, Month); every drill-down level slices this."""
+    spend_df = prepare_spending(data_version, filters)['spend']
+    if spend_df.empty:
+        return pd.DataFrame(columns=['BudgetName', 'CategoryName', 'Month', 'AmtOut'])
+    return spend_df.groupby(['BudgetName', 'CategoryName', 'Month'], observed=True)['AmtOut'].sum().reset_index()
+
+@st.cache_data(show_spinner=False)
+@perf.timed("prepare")
+def load_drill_records(data_version, filters, budget_name, category_name, month):
+    spend_df = prepare_spending(data_version, filters)['spend']
+    return spend_df[
+        (spend_df['BudgetName'] == budget_name) &
+        (spend_df['CategoryName'] == category_name) &
+        (spend_df['Month'] == month)
+    ]
+
+@st.cache_resource(show_spinner=False, max_entries=SHARED_STORE_MAX_ENTRIES)
+@perf.timed("prepare")
+def prepare_investments(data_version, filters, freq="D"):
+    df_filtered = load_filtered_transactions(data_version, filters)
+    prep = {}
+    if not df_filtered.empty:
+        df_inv = df_filtered[df_filtered['IsInvestment'] & (df_filtered['AmtOut'] > 0)]
+        prep['allocation'] = df_inv.groupby('CategoryName', observed=True)['AmtOut'].sum().reset_index()
+
+    # Cumulative series use the complete database for full historical scope
+    df_trans = load_transactions(data_version)
+    if not df_trans.empty:
+        df_full_sorted = df_trans[['DateT', 'AmtOut', 'IsInvestment']].sort_values('DateT')
+        amt_out = df_full_sorted['AmtOut']
+        # Forward fill cumulative sum to account for days without transactions
+        cumulative_inv = amt_out[df_full_sorted['IsInvestment']].cumsum().reindex(df_full_sorted.index).ffill().fillna(0.0)
+        # Charts get one closing value per period, capped at CHART_MAX_POINTS, regardless of history length
+        prep['cumulative'] = build_series_frame(df_full_sorted['DateT'], cumulative_inv, 'CumulativeInvestments', freq)
+
+    # Net worth is served from the persisted daily balance series (maintained at write time)
+    df_balance = load_daily_balances(data_version)
+    if not df_balance.empty:
+        prep['net_worth'] = build_series_frame(df_balance['DateT'], df_balance['Balance'], 'CumulativeNetBalance', freq)
+    return prep
+
+@st.cache_data(show_spinner=False)
+@perf.timed("prepare")
+def load_mf_owners(data_version):
+    return db.get_mf_owners()
+
+@st.cache_resource(show_spinner=False, max_entries=SHARED_STORE_MAX_ENTRIES)
+@perf.timed("prepare")
+def prepare_mf_history(data_version, owner_id):
+    """Owner's fund values per quarter-end as a wide frame (one column per fund, 0 where not held)."""
+    history = db.get_mf_history(owner_id)
+    if not len(history['periods']):
+        return None
+    periods = history['periods']
+    month_ends = pd.to_datetime(pd.DataFrame({'year': periods // 12, 'month': periods % 12 + 1, 'day': 1})) + pd.offsets.MonthEnd(0)
+    labels = [f"{isin} ({fund})" for isin, fund in zip(history['isin'], history['funds'])]
+    return pd.DataFrame(np.nan_to_num(history['Value']), index=pd.DatetimeIndex(month_ends, name='Period'), columns=labels)
+
+@st.cache_resource(show_spinner=False, max_entries=SHARED_STORE_MAX_ENTRIES)
+@perf.timed("prepare")
+def prepare_coach(data_version, filters):
+    df_filtered = load_filtered_transactions(data_version, filters)
+    prep = {}
+    if df_filtered.empty:
+        return prep
+
+    df_out_non_zero = df_filtered[df_filtered['AmtOut'] > 0]
+    prep['has_outflows'] = not df_out_non_zero.empty
+    if prep['has_outflows']:
+        # Score each outflow against the rolling median/MAD of its own category
+        prep['outliers'] = top_outliers(df_out_non_zero, top_n=OUTLIER_DISPLAY_LIMIT)
+        # Group by normalized merchant and amount band, then check payment periodicity
+        prep['recurring'] = detect_recurring(df_out_non_zero)
+    return prep
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+@perf.timed("prepare")
+def load_transaction_labels(data_version):
+    """Selectbox label -> SBId map for the ledger edit/delete forms."""
+    df = load_transactions(data_version)
+    dates = df['DateT'].dt.strftime('%Y-%m-%d').fillna('')
+    labels = (
+        "ID: " + df['SBId'].astype(str) + " | " + dates + " | " + df['CategoryName'].astype(str) + " | " +
+        df['SBName'].astype(str) + " | In: " + df['AmtIn'].map(format_inr) + " Out: " + df['AmtOut'].map(format_inr)
+    )
+    return dict(zip(labels, df['SBId']))
+
+# Instrumentation (JELLYFIN_PERF=1): spans from here on belong to this rerun
+perf.begin_run()
+
 # Check DB Setup Status
 db_status = db.check_db_setup()
 
@@ -310,37 +713,14 @@ else:
         db.get_connection()
         st.rerun()
 
-# Dynamic Budgets Storage inside Session State (persists during Streamlit session)
-if "budgets" not in st.session_state:
-    st.session_state.budgets = {}
-
 # Load Data
-df_trans = db.get_all_transactions()
-df_cats = db.get_categories()
-df_banks = db.get_banks()
-
-# If session state budgets are empty, initialize them with default category values or BudgetName parsing
-if df_cats is not None and not df_cats.empty:
-    for _, cat in df_cats.iterrows():
-        cat_id = int(cat['CategoryId'])
-        cat_name = cat['CategoryName']
-        budget_str = cat['BudgetName']
-        
-        # Try to initialize from BudgetName if we can parse a number, else default to 500
-        if cat_id not in st.session_state.budgets:
-            default_val = 500.0
-            if budget_str:
-                try:
-                    # Clean budget name and extract numbers (e.g. "Rent 2000" -> 2000)
-                    numbers = ''.join(c for c in budget_str if c.isdigit() or c == '.')
-                    if numbers:
-                        default_val = float(numbers)
-                except:
-                    pass
-            st.session_state.budgets[cat_id] = default_val
+data_version = db.get_data_version()
+df_cats = load_categories(data_version)
+df_banks = load_banks(data_version)
+trans_count, min_trans_date, max_trans_date = load_date_bounds(data_version)
 
 # Empty Database Handling
-if df_trans.empty:
+if trans_count == 0:
     st.warning("📊 No transaction records found in the database. Please add some transactions in the 'Transaction Ledger & Editor' tab to view your dashboard charts!")
     
 # Primary Filters in Sidebar
@@ -353,9 +733,9 @@ default_end = current_date
 
 min_date = datetime(2000, 1, 1)
 max_date = current_date + timedelta(days=365)
-if not df_trans.empty and df_trans['DateT'].notna().any():
-    min_date = df_trans['DateT'].min().to_pydatetime()
-    max_date = df_trans['DateT'].max().to_pydatetime()
+if min_trans_date is not None:
+    min_date = min_trans_date
+    max_date = max_trans_date
 
 # Ensure default values are within bounds
 min_limit = min(min_date, default_start)
@@ -380,95 +760,409 @@ if df_cats is not None and not df_cats.empty:
     cat_options = df_cats['CategoryName'].tolist()
 selected_categories = st.sidebar.multiselect("Filter Category", options=cat_options, default=[])
 
-# Apply filters to Dataframe
-df_filtered = df_trans.copy()
+# Filters are passed to the cached loaders as one hashable key
 start_date = pd.to_datetime(default_start.date())
 end_date = pd.to_datetime(default_end.date())
+date_range = None
+if isinstance(selected_dates, (tuple, list)) and len(selected_dates) == 2:
+    start_date = pd.to_datetime(selected_dates[0])
+    end_date = pd.to_datetime(selected_dates[1]) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    date_range = (start_date, end_date)
+filters = (date_range, tuple(selected_banks), tuple(selected_categories))
+
+# --- Spending drill-down fragments ---
+# The drill-down charts run as st.fragment so a click re-executes only the fragment, not the
+# whole script. Each level reads from the small cached frame built by prepare_spending_drill.
+
+@st.fragment
+def render_monthly_spending_trend(data_version, filters, selected_spending_cat):
+    """Monthly outflow bars with a month -> category drill; clicks rerun only this fragment."""
+    st.markdown("### 📉 Monthly Spending Outflow Trend")
+    df_spend_trend = prepare_spending_drill(data_version, filters)
+    if selected_spending_cat:
+        df_spend_trend = df_spend_trend[df_spend_trend['CategoryName'] == selected_spending_cat]
+
+    if st.session_state.sb_monthly_drill_month is None:
+        # Level 0 — Monthly total bar chart
+        df_spend_monthly = (
+            df_spend_trend.groupby('Month')['AmtOut']
+            .sum().reset_index()
+            .sort_values('Month')
+        )
+        if not df_spend_monthly.empty:
+            df_spend_monthly['AmountLakhs'] = df_spend_monthly['AmtOut'].apply(rupees_to_lakhs)
+            df_spend_monthly['Label'] = df_spend_monthly['AmtOut'].apply(format_amount_lakh)
+
+            fig_monthly_bar = go.Figure()
+            fig_monthly_bar.add_trace(go.Bar(
+                x=df_spend_monthly['Month'],
+                y=df_spend_monthly['AmountLakhs'],
+                marker_color=COLOR_OUTFLOW,
+                text=df_spend_monthly['Label'],
+                textposition='outside',
+                customdata=df_spend_monthly[['AmtOut']].values,
+                hovertemplate='<b>%{x}</b><br>₹%{customdata[0]:,.2f}<extra></extra>'
+            ))
+            fig_monthly_bar.update_layout(
+                title='Monthly Outflow — Click a bar to see categories',
+                xaxis_title='Month',
+                yaxis_title='Amount (Lakhs)',
+                height=360
+            )
+            style_chart(fig_monthly_bar)
 
-if not df_filtered.empty:
-    # Date Filtering
-    if isinstance(selected_dates, (tuple, list)) and len(selected_dates) == 2:
-        start_date = pd.to_datetime(selected_dates[0])
-        end_date = pd.to_datetime(selected_dates[1]) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
-        df_filtered = df_filtered[(df_filtered['DateT'] >= start_date) & (df_filtered['DateT'] <= end_date)]
-    
-    # Bank Filtering
-    if selected_banks:
-        df_filtered = df_filtered[df_filtered['BankName'].isin(selected_banks)]
-        
-    # Category Filtering
-    if selected_categories:
-        df_filtered = df_filtered[df_filtered['CategoryName'].isin(selected_categories)]
-
-# --- DATA PRE-CALCULATIONS FOR DASHBOARD METRICS ---
-if not df_filtered.empty:
-    # Fill NaN values in inflow/outflow
-    df_filtered['AmtIn'] = df_filtered['AmtIn'].fillna(0.0).astype(float)
-    df_filtered['AmtOut'] = df_filtered['AmtOut'].fillna(0.0).astype(float)
-    
-    total_inflow = df_filtered['AmtIn'].sum()
-    # More robust and readable version
-    total_earned = df_filtered.loc[
-        (df_filtered['BudgetName'].notna()) & 
-        (df_filtered['BudgetName'].str.strip() != "") & 
-        (df_filtered['BudgetName'] == "Earn")
-    ]['AmtIn'].astype(float).sum()
-    total_outflow = df_filtered['AmtOut'].sum()
-    total_spent = df_filtered.loc[
-        (df_filtered['BudgetName'].notna()) & 
-        (df_filtered['BudgetName'].str.strip() != "") & 
-        (df_filtered['BudgetName'] != "Invest")
-    ]['AmtOut'].astype(float).sum()
-
-    # Investment Categorization Heuristic
-    def is_investment_row(row):
-        cat_name = str(row['CategoryName']).lower() if pd.notna(row['CategoryName']) else ""
-        budget_name = str(row['BudgetName']).lower() if pd.notna(row['BudgetName']) else ""
-        keywords = ['invest', 'stock', 'mutual fund', 'mf', 'crypto', 'savings', 'equity', 'gold', 'fd', 'ppf', 'epf', 'sip']
-        return any(k in cat_name or k in budget_name for k in keywords)
-
-    df_filtered['IsInvestment'] = df_filtered.apply(is_investment_row, axis=1)
-    
+            monthly_event = plotly_chart(
+                fig_monthly_bar, "fig_monthly_bar",
+                use_container_width=True,
+                on_select="rerun",
+                key="monthly_trend_bar"
+            )
 
+            if monthly_event and hasattr(monthly_event, "selection") and monthly_event.selection:
+                m_pts = monthly_event.selection.points
+                if m_pts:
+                    clicked_mth = m_pts[0].get("x")
+                    if clicked_mth:
+                        st.session_state.sb_monthly_drill_month = str(clicked_mth)[:7]  # Ensure it's in YYYY-MM format
+                        st.rerun(scope="fragment")
+        else:
+            st.info("No timeline trend data available for this selection.")
 
-    total_invested = df_filtered.loc[
-        (df_filtered['BudgetName'].notna()) & 
-        (df_filtered['BudgetName'].str.strip() != "") & 
-        (df_filtered['BudgetName'] == "Invest")
-    ]['AmtOut'].astype(float).sum()
+    else:
+        # Level 1 — Category breakdown for the drilled month
+        drill_mth = st.session_state.sb_monthly_drill_month
+        if st.button("← Back to Monthly", key="back_monthly_trend"):
+            st.session_state.sb_monthly_drill_month = None
+            st.rerun(scope="fragment")
+        st.caption(f"Showing categories in **{drill_mth}**")
+
+        df_month_cats_grp = (
+            df_spend_trend[df_spend_trend['Month'] == drill_mth]
+            .groupby('CategoryName', observed=True)['AmtOut']
+            .sum().reset_index()
+            .sort_values('AmtOut', ascending=False)
+        )
+
+        if not df_month_cats_grp.empty:
+            df_month_cats_grp['AmountLakhs'] = df_month_cats_grp['AmtOut'].apply(rupees_to_lakhs)
+            df_month_cats_grp['Label'] = df_month_cats_grp['AmtOut'].apply(format_amount_lakh)
+
+            fig_month_cat = go.Figure()
+            fig_month_cat.add_trace(go.Bar(
+                x=df_month_cats_grp['CategoryName'],
+                y=df_month_cats_grp['AmountLakhs'],
+                marker=dict(
+                    color=df_month_cats_grp['AmountLakhs'],
+                    colorscale='Oranges',
+                    showscale=False
+                ),
+                text=df_month_cats_grp['Label'],
+                textposition='outside',
+                customdata=df_month_cats_grp[['AmtOut']].values,
+                hovertemplate='<b>%{x}</b><br>₹%{customdata[0]:,.2f}<extra></extra>'
+            ))
+            fig_month_cat.update_layout(
+                title=f'Category Breakdown — {drill_mth}',
+                xaxis_title='Category',
+                yaxis_title='Amount (Lakhs)',
+                height=360
+            )
+            style_chart(fig_month_cat)
+            plotly_chart(fig_month_cat, "fig_month_cat", use_container_width=True, key="monthly_cat_bar")
+        else:
+            st.info(f"No spending data for {drill_mth}.")
+
+
+@st.fragment
+def render_spending_drilldown(data_version, filters):
+    """Budget -> category -> month -> records drill-down; clicks rerun only this fragment."""
+    st.markdown("### 📊 Spending Drill-Down")
+    df_drill = prepare_spending_drill(data_version, filters)
+
+    if st.session_state.sb_drill_budget is None:
+        # ---- Level 0: BudgetName bars ----
+        df_by_budget = (
+            df_drill.groupby('BudgetName', observed=True)['AmtOut']
+            .sum().reset_index()
+            .sort_values('AmtOut', ascending=False)
+        )
+        df_by_budget['AmountLakhs'] = df_by_budget['AmtOut'].apply(rupees_to_lakhs)
+        df_by_budget['Label'] = df_by_budget['AmtOut'].apply(format_amount_lakh)
+
+        fig_budget_bars = go.Figure()
+        fig_budget_bars.add_trace(go.Bar(
+            x=df_by_budget['BudgetName'],
+            y=df_by_budget['AmountLakhs'],
+            marker=dict(
+                color=df_by_budget['AmountLakhs'],
+                colorscale='Reds',
+                showscale=False
+            ),
+            text=df_by_budget['Label'],
+            textposition='outside',
+            customdata=df_by_budget[['AmtOut']].values,
+            hovertemplate='<b>%{x}</b><br>Total Spending: ₹%{customdata[0]:,.2f}<extra></extra>'
+        ))
+        fig_budget_bars.update_layout(
+            title='Spending by Budget Group — Click a bar to drill into categories',
+            xaxis_title='Budget Group',
+            yaxis_title='Amount (Lakhs)',
+            height=420
+        )
+        style_chart(fig_budget_bars)
+
+        budget_event = plotly_chart(
+            fig_budget_bars, "fig_budget_bars",
+            use_container_width=True,
+            on_select="rerun",
+            key="budget_drill_bar"
+        )
+
+        if budget_event and hasattr(budget_event, "selection") and budget_event.selection:
+            b_pts = budget_event.selection.points
+            if b_pts:
+                clicked_budget = b_pts[0].get("x")
+                if clicked_budget:
+                    st.session_state.sb_drill_budget = str(clicked_budget)
+                    st.session_state.sb_drill_cat = None
+                    st.session_state.sb_drill_month = None
+                    st.rerun(scope="fragment")
+
+    elif st.session_state.sb_drill_cat is None:
+        # ---- Level 1: Category bars within the selected Budget ----
+        drill_budget = st.session_state.sb_drill_budget
+        nav_col, info_col = st.columns([1, 6])
+        with nav_col:
+            if st.button("← Budgets", key="back_to_budgets"):
+                st.session_state.sb_drill_budget = None
+                st.rerun(scope="fragment")
+        with info_col:
+            st.caption(f"Budget: **{drill_budget}** — Click a category bar to see its monthly trend")
+
+        df_by_cat = (
+            df_drill[df_drill['BudgetName'] == drill_budget]
+            .groupby('CategoryName', observed=True)['AmtOut']
+            .sum().reset_index()
+            .sort_values('AmtOut', ascending=False)
+        )
+        df_by_cat['AmountLakhs'] = df_by_cat['AmtOut'].apply(rupees_to_lakhs)
+        df_by_cat['Label'] = df_by_cat['AmtOut'].apply(format_amount_lakh)
+
+        fig_cat_bars = go.Figure()
+        fig_cat_bars.add_trace(go.Bar(
+            x=df_by_cat['CategoryName'],
+            y=df_by_cat['AmountLakhs'],
+            marker=dict(
+                color=df_by_cat['AmountLakhs'],
+                colorscale='Oranges',
+                showscale=False
+            ),
+            text=df_by_cat['Label'],
+            textposition='outside',
+            customdata=df_by_cat[['AmtOut']].values,
+            hovertemplate='<b>%{x}</b><br>Total: ₹%{customdata[0]:,.2f}<extra></extra>'
+        ))
+        fig_cat_bars.update_layout(
+            title=f'Categories in "{drill_budget}"',
+            xaxis_title='Category',
+            yaxis_title='Amount (Lakhs)',
+            height=420
+        )
+        style_chart(fig_cat_bars)
+
+        cat_event = plotly_chart(
+            fig_cat_bars, "fig_cat_bars",
+            use_container_width=True,
+            on_select="rerun",
+            key="cat_drill_bar"
+        )
+
+        if cat_event and hasattr(cat_event, "selection") and cat_event.selection:
+            c_pts = cat_event.selection.points
+            if c_pts:
+                clicked_cat = c_pts[0].get("x")
+                if clicked_cat:
+                    st.session_state.sb_drill_cat = str(clicked_cat)
+                    st.session_state.sb_drill_month = None
+                    st.rerun(scope="fragment")
+
+    else:
+        # ---- Level 2: Monthly line chart for the selected Category ----
+        drill_budget = st.session_state.sb_drill_budget
+        drill_cat = st.session_state.sb_drill_cat
+
+        nav_col1, nav_col2, info_col = st.columns([1, 1, 5])
+        with nav_col1:
+            if st.button("← Budgets", key="back_to_budgets2"):
+                st.session_state.sb_drill_budget = None
+                st.session_state.sb_drill_cat = None
+                st.session_state.sb_drill_month = None
+                st.rerun(scope="fragment")
+        with nav_col2:
+            if st.button(f"← {drill_budget}", key="back_to_cats"):
+                st.session_state.sb_drill_cat = None
+                st.session_state.sb_drill_month = None
+                st.rerun(scope="fragment")
+        with info_col:
+            st.caption(f"**{drill_budget}** → **{drill_cat}** — Click a point on the chart to see individual records")
+
+        df_cat_monthly = df_drill[
+            (df_drill['BudgetName'] == drill_budget) &
+            (df_drill['CategoryName'] == drill_cat)
+        ][['Month', 'AmtOut']].sort_values('Month').reset_index(drop=True)
+
+        if not df_cat_monthly.empty:
+            df_cat_monthly['AmountLakhs'] = df_cat_monthly['AmtOut'].apply(rupees_to_lakhs)
+            df_cat_monthly['Label'] = df_cat_monthly['AmtOut'].apply(format_amount_lakh)
+
+            fig_cat_line = go.Figure()
+            fig_cat_line.add_trace(go.Scatter(
+                x=df_cat_monthly['Month'],
+                y=df_cat_monthly['AmountLakhs'],
+                mode='lines+markers+text',
+                line=dict(color=COLOR_OUTFLOW, width=2),
+                marker=dict(size=10, color=COLOR_OUTFLOW, line=dict(color='white', width=2)),
+                text=df_cat_monthly['Label'],
+                textposition='top center',
+                customdata=df_cat_monthly[['AmtOut']].values,
+                hovertemplate='<b>%{x}</b><br>₹%{customdata[0]:,.2f}<extra></extra>',
+                name=drill_cat
+            ))
+            fig_cat_line.update_layout(
+                title=f'Monthly Spending — {drill_cat} (Click a point to view records)',
+                xaxis_title='Month',
+                yaxis_title='Amount (Lakhs)',
+                height=420
+            )
+            style_chart(fig_cat_line)
+
+            line_event = plotly_chart(
+                fig_cat_line, "fig_cat_line",
+                use_container_width=True,
+                on_select="rerun",
+                key="cat_line_chart"
+            )
+
+            if line_event and hasattr(line_event, "selection") and line_event.selection:
+                l_pts = line_event.selection.points
+                if l_pts:
+                    clicked_month_pt = l_pts[0].get("x")
+                    if clicked_month_pt:
+                        st.session_state.sb_drill_month = str(clicked_month_pt)[:7]  # Extract YYYY-MM
+                        # st.rerun()
+                else:
+                    # Optional: If the user clicks empty space, clear the table
+                    st.session_state.sb_drill_month = None
+        else:
+            st.info(f"No monthly data found for {drill_cat}.")
+
+        # ---- Level 3: Editable records table for the clicked line point ----
+        if st.session_state.sb_drill_month:
+            drill_month = st.session_state.sb_drill_month
+            st.markdown(f"#### 📋 Records: **{drill_cat}** in **{drill_month}**")
+            st.caption("Edit the Category column using the dropdown below, then click **Save Changes** to write back to the database.")
+
+            df_point_records = load_drill_records(data_version, filters, drill_budget, drill_cat, drill_month)
+
+            if not df_point_records.empty:
+                df_cats = load_categories(data_version)
+                all_cat_names = sorted(df_cats['CategoryName'].tolist()) if (df_cats is not None and not df_cats.empty) else []
+
+                edit_cols = ['SBId', 'DateT', 'BankName', 'CategoryName', 'SBName', 'AmtOut', 'Comment']
+                df_editable = df_point_records[edit_cols].astype({'BankName': object, 'CategoryName': object})
+                df_editable['DateT'] = df_editable['DateT'].dt.strftime('%Y-%m-%d')
+                df_editable_sorted = df_editable.sort_values('DateT').reset_index(drop=True)
+
+                edited_df = st.data_editor(
+                    df_editable_sorted,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        'SBId': st.column_config.NumberColumn('ID', disabled=True),
+                        'DateT': st.column_config.TextColumn('Date', disabled=True),
+                        'BankName': st.column_config.TextColumn('Bank', disabled=True),
+                        'CategoryName': st.column_config.SelectboxColumn(
+                            'Category',
+                            options=all_cat_names,
+                            required=True
+                        ),
+                        'SBName': st.column_config.TextColumn('Payee / Merchant', disabled=True),
+                        'AmtOut': st.column_config.NumberColumn(
+                            'Amount Out (₹)', disabled=True, format='₹%.2f'
+                        ),
+                        'Comment': st.column_config.TextColumn('Comment', disabled=True),
+                    },
+                    key="spend_edit_table"
+                )
+
+                if st.button("💾 Save Category Changes", key="save_cat_changes"):
+                    changes_made = 0
+                    save_errors = []
+                    for i, orig_row in df_editable_sorted.iterrows():
+                        sb_id = int(orig_row['SBId'])
+                        orig_cat_name = orig_row['CategoryName']
+                        new_cat_name = edited_df.loc[i, 'CategoryName']
+
+                        if new_cat_name != orig_cat_name:
+                            cat_row = df_cats[df_cats['CategoryName'] == new_cat_name]
+                            if not cat_row.empty:
+                                new_cat_id = int(cat_row.iloc[0]['CategoryId'])
+                                full_orig = df_point_records[df_point_records['SBId'] == sb_id]
+                                if not full_orig.empty:
+                                    r = full_orig.iloc[0]
+                                    success = db.update_transaction(
+                                        sb_id,
+                                        int(r['BankId']),
+                                        str(r['SBName'] or ''),
+                                        float(r['AmtIn'] or 0.0),
+                                        float(r['AmtOut'] or 0.0),
+                                        new_cat_id,
+                                        str(r['Comment'] or ''),
+                                        pd.to_datetime(r['DateT']).strftime('%Y-%m-%d')
+                                    )
+                                    if success:
+                                        changes_made += 1
+                                    else:
+                                        save_errors.append(sb_id)
+
+                    if changes_made > 0:
+                        st.success(f"✅ Updated {changes_made} record(s) successfully.")
+                        # Data changed, so the whole app (not just this fragment) must rerun
+                        st.rerun()
+                    elif save_errors:
+                        st.error(f"Failed to update records with IDs: {save_errors}")
+                    else:
+                        st.info("No category changes detected.")
+            else:
+                st.info(f"No records found for {drill_cat} in {drill_month}.")
 
-    # Pure Spending (outflow minus investments)
-    total_spending = total_outflow
-    
-    net_savings = total_earned - total_spent
-    savings_rate = (net_savings / total_earned * 100) if total_earned > 0 else 0.0
-else:
-    total_inflow = 0.0
-    total_outflow = 0.0
-    total_invested = 0.0
-    total_spending = 0.0
-    net_savings = 0.0
-    savings_rate = 0.0
 
 # Layout Tabs
-tab_overview, tab_income, tab_spending, tab_invest, tab_ledger, tab_coach = st.tabs([
+# Rendered as a view selector rather than st.tabs so that only the visible tab runs
+tab_overview, tab_income, tab_spending, tab_invest, tab_ledger, tab_coach = TAB_LABELS = [
     "📊 Overview", 
     "📈 Income & Sources", 
     "💸 Spending & Budget", 
     "🛡️ Investments & Wealth", 
     "📋 Ledger & Editor", 
     "🧠 Wealth Coach"
-])
+]
+active_tab = st.radio("View", TAB_LABELS, horizontal=True, key="active_tab", label_visibility="collapsed")
+# Covers everything the visible tab does, so the panel can show what its children leave unaccounted
+tab_span = perf.start("tab", active_tab)
 
 # ==========================================
 # 📊 TAB 1: OVERVIEW
 # ==========================================
-with tab_overview:
+if active_tab == tab_overview:
     # Dashboard Header
     st.markdown("<h2 style='margin-bottom: 0.5rem;'>⚡ Personal Wealth Hub</h2>", unsafe_allow_html=True)
     st.caption("Gain ultimate clarity over your bank transactions, categorizations, and investment habits.")
     st.markdown("<hr style='margin-top: 0.25rem; margin-bottom: 1.5rem; border-color: rgba(255,255,255,0.05);'>", unsafe_allow_html=True)
     
+    kpis = compute_kpis(data_version, filters)
+    overview = prepare_overview(data_version, filters)
+
     # 1. Metric Cards Row
     col1, col2, col3, col4, col5 = st.columns(5)
     
@@ -476,8 +1170,8 @@ with tab_overview:
         st.markdown(f"""
         <div class="kpi-card kpi-earn">
             <div class="kpi-title">Total Inflow, earnings</div>
-            <div class="kpi-value">{format_inr(total_inflow)}</div>
-            <div class="kpi-value">{format_inr(total_earned)}</div>
+            <div class="kpi-value">{format_inr(kpis['total_inflow'])}</div>
+            <div class="kpi-value">{format_inr(kpis['total_earned'])}</div>
             <div class="kpi-delta delta-up">▲ Inflow</div>
         </div>
         """, unsafe_allow_html=True)
@@ -486,8 +1180,8 @@ with tab_overview:
         st.markdown(f"""
         <div class="kpi-card kpi-spend">
             <div class="kpi-title">Total Outflow, expenses</div>
-            <div class="kpi-value">{format_inr(total_spending)}</div>
-            <div class="kpi-value">{format_inr(total_spent)}</div>
+            <div class="kpi-value">{format_inr(kpis['total_spending'])}</div>
+            <div class="kpi-value">{format_inr(kpis['total_spent'])}</div>
             <div class="kpi-delta delta-down">▼ Operational</div>
         </div>
         """, unsafe_allow_html=True)
@@ -496,28 +1190,28 @@ with tab_overview:
         st.markdown(f"""
         <div class="kpi-card kpi-invest">
             <div class="kpi-title">Total Investing</div>
-            <div class="kpi-value">{format_inr(total_invested)}</div>
+            <div class="kpi-value">{format_inr(kpis['total_invested'])}</div>
             <div class="kpi-delta delta-up" style="color: #60a5fa;">★ Assets</div>
         </div>
         """, unsafe_allow_html=True)
         
     with col4:
-        delta_class = "delta-up" if net_savings >= 0 else "delta-down"
-        delta_symbol = "▲" if net_savings >= 0 else "▼"
+        delta_class = "delta-up" if kpis['net_savings'] >= 0 else "delta-down"
+        delta_symbol = "▲" if kpis['net_savings'] >= 0 else "▼"
         st.markdown(f"""
         <div class="kpi-card kpi-net">
             <div class="kpi-title">Net Savings</div>
-            <div class="kpi-value">{format_inr(net_savings)}</div>
+            <div class="kpi-value">{format_inr(kpis['net_savings'])}</div>
             <div class="kpi-delta {delta_class}">{delta_symbol} Cashflow</div>
         </div>
         """, unsafe_allow_html=True)
         
     with col5:
-        rate_class = "badge-excellent" if savings_rate >= 30 else ("badge-healthy" if savings_rate >= 15 else ("badge-warning" if savings_rate >= 0 else "badge-critical"))
+        rate_class = "badge-excellent" if kpis['savings_rate'] >= 30 else ("badge-healthy" if kpis['savings_rate'] >= 15 else ("badge-warning" if kpis['savings_rate'] >= 0 else "badge-critical"))
         st.markdown(f"""
         <div class="kpi-card kpi-rate">
             <div class="kpi-title">Savings Rate</div>
-            <div class="kpi-value">{savings_rate:.1f}%</div>
+            <div class="kpi-value">{kpis['savings_rate']:.1f}%</div>
             <div class="kpi-delta" style="color: #fbbf24;">⚡ Score</div>
         </div>
         """, unsafe_allow_html=True)
@@ -527,16 +1221,9 @@ with tab_overview:
 
     # --- Budget-wise Inflow & Outflow Bar Charts ---
     st.markdown("### 📊 Budget-wise Inflow & Outflow")
-    if not df_filtered.empty:
-        # Prepare Inflow data
-        df_budget_in = df_filtered[df_filtered['AmtIn'] > 0].copy()
-        df_budget_in['BudgetName'] = df_budget_in['BudgetName'].fillna("Uncategorized").replace("", "Uncategorized")
-        df_budget_in_grouped = df_budget_in.groupby('BudgetName')['AmtIn'].sum().reset_index()
-        
-        # Prepare Outflow data
-        df_budget_out = df_filtered[df_filtered['AmtOut'] > 0].copy()
-        df_budget_out['BudgetName'] = df_budget_out['BudgetName'].fillna("Uncategorized").replace("", "Uncategorized")
-        df_budget_out_grouped = df_budget_out.groupby('BudgetName')['AmtOut'].sum().reset_index()
+    if overview:
+        df_budget_in_grouped = overview['budget_in']
+        df_budget_out_grouped = overview['budget_out']
         
         col_b_in, col_b_out = st.columns(2)
         with col_b_in:
@@ -547,7 +1234,7 @@ with tab_overview:
                 title='Total Inflow by Budget Group',
                 color=COLOR_INFLOW
             )
-            st.altair_chart(chart_in, use_container_width=True)
+            altair_chart(chart_in, "chart_in", use_container_width=True)
 
         with col_b_out:
             chart_out = build_altair_bar_chart(
@@ -557,7 +1244,7 @@ with tab_overview:
                 title='Total Outflow by Budget Group',
                 color=COLOR_OUTFLOW
             )
-            st.altair_chart(chart_out, use_container_width=True)
+            altair_chart(chart_out, "chart_out", use_container_width=True)
     else:
         st.info("No data available for budget-wise cashflow charts.")
 
@@ -565,21 +1252,13 @@ with tab_overview:
 
     # --- Category Budget Summary (Month-wise Net Outflows) ---
     st.markdown("<br>## 📊 Month‑wise Net Outflows per Category (by Budget)", unsafe_allow_html=True)
-    if not df_filtered.empty:
+    if overview:
         # Only consider records where AmtOut > 0
-        df_netout_filtered = df_filtered[df_filtered['AmtOut'] > 0].copy()
+        df_netout_filtered = overview['netout']
         if not df_netout_filtered.empty:
-            df_netout_filtered['NetOut'] = df_netout_filtered['AmtOut'].fillna(0.0) - df_netout_filtered['AmtIn'].fillna(0.0)
-            df_netout_filtered['Month'] = df_netout_filtered['DateT'].dt.to_period('M').astype(str)
-            df_budget_month = (
-                df_netout_filtered
-                .groupby(['BudgetName', 'Month', 'CategoryId', 'CategoryName'])
-                .agg({'NetOut': 'sum'})
-                .reset_index()
-            )
-            df_budget_month = df_budget_month[df_budget_month['BudgetName'].notna()]
+            df_budget_month = overview['budget_month']
             # Show sections per BudgetName
-            for budget, group in df_budget_month.groupby('BudgetName'): 
+            for budget, group in df_budget_month.groupby('BudgetName', observed=True): 
                 with st.expander(f"**Budget: {budget}**"):
                     pivot = group.pivot(index='CategoryName', columns='Month', values='NetOut').fillna(0.0)
                     st.dataframe(pivot.style.format('{:,.2f}'), hide_index=False)
@@ -614,19 +1293,20 @@ with tab_overview:
         st.markdown("### 🏦 Savings Account Balances")
         # Calculate Running Balance for each Bank
         # Bank Balance = Running Total (Inflow) - Running Total (Outflow) for that BankId.
-        if df_trans is not None and not df_trans.empty:
-            df_full_clean = df_trans.copy()
-            df_full_clean['AmtIn'] = df_full_clean['AmtIn'].fillna(0.0).astype(float)
-            df_full_clean['AmtOut'] = df_full_clean['AmtOut'].fillna(0.0).astype(float)
+        if trans_count > 0:
+            # Use opening balance (before selected date range) and closing balance (end of selected date range)
+            df_balances = load_bank_balances(
+                data_version,
+                (start_date - pd.Timedelta(days=1)).strftime('%Y-%m-%d'),
+                end_date.strftime('%Y-%m-%d')
+            )
             
             st.markdown('<div class="bank-container">', unsafe_allow_html=True)
-            for _, b in df_banks.iterrows():
-                b_id = b['BankId']
+            for _, b in df_balances.iterrows():
                 b_name = b['BankName']
                 b_acc = b['AccNo']
-                # Use opening balance (before selected date range) and closing balance (end of selected date range)
-                opening_bal = db.get_closing_balance(b_id, (start_date - pd.Timedelta(days=1)).strftime('%Y-%m-%d'))
-                closing_bal = db.get_closing_balance(b_id, end_date.strftime('%Y-%m-%d'))
+                opening_bal = b['Opening']
+                closing_bal = b['Closing']
                 st.markdown(f"""
                 <div class="bank-card">
                     <div class="bank-details">
@@ -649,16 +1329,9 @@ with tab_overview:
             
     with viz_col2:
         st.markdown("### 📊 Inflow vs Outflow Cashflow Trend")
-        if not df_filtered.empty and df_filtered['DateT'].notna().any():
+        if overview and not overview['monthly'].empty:
             # Resample by Month
-            df_trend = df_filtered.copy()
-            df_trend['Month'] = df_trend['DateT'].dt.to_period('M').astype(str)
-            df_monthly = df_trend.groupby('Month')[['AmtIn', 'AmtOut']].sum().reset_index()
-            df_monthly.rename(columns={'AmtIn': 'Inflow', 'AmtOut': 'Outflow'}, inplace=True)
-            
-            df_monthly['InflowLabel'] = df_monthly['Inflow'].apply(format_amount_lakh)
-            df_monthly['OutflowLabel'] = df_monthly['Outflow'].apply(format_amount_lakh)
-            df_monthly['Month'] = df_monthly['Month'].astype(str)
+            df_monthly = overview['monthly']
 
             trend_df = df_monthly.melt(
                 id_vars=['Month'],
@@ -668,10 +1341,6 @@ with tab_overview:
             )
             trend_df['AmountLakhs'] = trend_df['Amount'].apply(rupees_to_lakhs)
             trend_df['Label'] = trend_df['Amount'].apply(format_amount_lakh)
-            """trend_df['Label'] = trend_df.apply(
-                lambda row: row['InflowLabel'] if row['Type'] == 'Inflow' else row['OutflowLabel'],
-                axis=1
-            )"""
 
             bar = alt.Chart(trend_df).mark_bar().encode(
                 x=alt.X('Month:N', axis=alt.Axis(labelColor='#e2e8f0', titleColor='#94a3b8', title='Month')),
@@ -686,21 +1355,15 @@ with tab_overview:
             ).properties(title='Monthly Cashflow Breakdown', height=360)
 
             labels = bar.mark_text(dy=-10, color='#ffffff', size=12).encode(text='Label:N')
-            st.altair_chart(alt.layer(bar, labels).configure_view(stroke='transparent').configure_title(color='#e2e8f0'), use_container_width=True)
+            altair_chart(alt.layer(bar, labels).configure_view(stroke='transparent').configure_title(color='#e2e8f0'), "monthly_cashflow", use_container_width=True)
         else:
             st.info("Insufficient timeline data to display cashflow trend.")
 
     # 3. Quick Spend Categories
     st.markdown("### 🏷️ Top Spending Categories")
-    if not df_filtered.empty:
-        df_top_cats_filtered = df_filtered[
-            (df_filtered['AmtOut'] > 0) &
-            (df_filtered['BudgetName'].notna()) &
-            (df_filtered['BudgetName'].str.strip() != "") &
-            (df_filtered['BudgetName'] != "Invest")
-        ]
-        if not df_top_cats_filtered.empty:
-            df_top_cats = df_top_cats_filtered.groupby('CategoryName')['AmtOut'].sum().reset_index().sort_values(by='AmtOut', ascending=False).head(5)
+    if overview:
+        df_top_cats = overview['top_cats']
+        if not df_top_cats.empty:
             top_spend_chart = build_altair_bar_chart(
                 df_top_cats,
                 x_col='CategoryName',
@@ -709,7 +1372,7 @@ with tab_overview:
                 color='#f43f5e',
                 y_title='Amount (Lakhs)'
             )
-            st.altair_chart(top_spend_chart, use_container_width=True)
+            altair_chart(top_spend_chart, "top_spend_chart", use_container_width=True)
         else:
             st.info("No spending data available for Top Spending Categories (excluding Investment and Uncategorized).")
     else:
@@ -719,20 +1382,11 @@ with tab_overview:
     st.markdown("<br>", unsafe_allow_html=True)
     st.markdown("### 🎯 Monthly Budget Threshold Tracker")
     
-    if not df_filtered.empty and df_cats is not None and not df_cats.empty:
-        # Sum spending by category in the selected timeframe
-        df_spent_by_cat = df_filtered.groupby('CategoryId')[['AmtOut']].sum().reset_index()
-        
-        # Merge with all categories
-        df_budget_progress = pd.merge(df_cats, df_spent_by_cat, on='CategoryId', how='left').fillna(0.0)
-        
-        # Calculate budget limits
-        df_budget_progress['Budget'] = df_budget_progress['CategoryId'].map(st.session_state.budgets).fillna(500.0)
-        df_budget_progress['Percentage'] = (df_budget_progress['AmtOut'] / df_budget_progress['Budget'] * 100).round(1)
-        
+    df_budget_cmp = load_budget_vs_actual(data_version, filters, end_date.strftime('%Y-%m'))
+    if not df_budget_cmp.empty:
         # Grid of budgets
         budget_cols = st.columns(4)
-        for idx, row in df_budget_progress.iterrows():
+        for idx, row in df_budget_cmp.iterrows():
             col_slot = budget_cols[idx % 4]
             with col_slot:
                 pct = row['Percentage']
@@ -764,19 +1418,16 @@ with tab_overview:
 
 # ==========================================
 # 📈 TAB 2: INCOME ANALYSIS
-with tab_income:
+if active_tab == tab_income:
     st.markdown("## 📈 Income & Earning Analysis")
     st.caption("Trace your primary cash flow sources and analyze growth in earnings over time.")
     st.markdown("<hr style='margin-top: 0.25rem; margin-bottom: 1.5rem; border-color: rgba(255,255,255,0.05);'>", unsafe_allow_html=True)
     
-    # Filter only records where BudgetName is 'Earn'
-    earn_records = df_filtered[(df_filtered['AmtIn'] > 0) & (df_filtered['BudgetName'] == "Earn")]
+    income = prepare_income(data_version, filters)
+    inc_df = income['earn']
     
-    if not earn_records.empty:
-        inc_df = earn_records.copy()
-        
-        # Group by CategoryName (Source Names derived from Category Table)
-        df_inc_cat = inc_df.groupby('CategoryName')['AmtIn'].sum().reset_index()
+    if not inc_df.empty:
+        df_inc_cat = income['by_cat']
         
         inc_col1, inc_col2 = st.columns([1, 1])
         
@@ -793,7 +1444,7 @@ with tab_income:
             style_chart(fig_inc_donut)
             
             # Interactive Donut Chart Selection
-            event = st.plotly_chart(fig_inc_donut, use_container_width=True, on_select="rerun", key="earnings_donut_chart")
+            event = plotly_chart(fig_inc_donut, "fig_inc_donut", use_container_width=True, on_select="rerun", key="earnings_donut_chart")
             
         selected_earning_cat = None
         if event and hasattr(event, "selection") and event.selection:
@@ -811,11 +1462,10 @@ with tab_income:
             
         with inc_col2:
             st.markdown("### 📈 Monthly Earnings Inflow Trend")
-            df_inc_trend = inc_df.copy()
+            df_inc_trend = inc_df
             if selected_earning_cat:
                 df_inc_trend = df_inc_trend[df_inc_trend['CategoryName'] == selected_earning_cat]
                 
-            df_inc_trend['Month'] = df_inc_trend['DateT'].dt.to_period('M').astype(str)
             df_inc_monthly = df_inc_trend.groupby('Month')['AmtIn'].sum().reset_index()
             
             if not df_inc_monthly.empty:
@@ -827,7 +1477,7 @@ with tab_income:
                     labels={'AmtIn': 'Total Earnings (₹)'}
                 )
                 style_chart(fig_inc_trend)
-                st.plotly_chart(fig_inc_trend, use_container_width=True)
+                plotly_chart(fig_inc_trend, "fig_inc_trend", use_container_width=True)
             else:
                 st.info("No timeline trend data available for this selection.")
             
@@ -849,24 +1499,14 @@ with tab_income:
         
         # YoY Earnings Section
         st.markdown("<br>### 📅 Year on Year (YoY) Earnings", unsafe_allow_html=True)
-        df_yoy_base = df_trans[df_trans['AmtIn'] > 0].copy()
-        df_yoy_base['BudgetName'] = df_yoy_base['BudgetName'].fillna("")
-        df_yoy_base = df_yoy_base[df_yoy_base['BudgetName'].str.strip() == "Earn"]
-        
-        # Apply sidebar bank filters
-        if selected_banks:
-            df_yoy_base = df_yoy_base[df_yoy_base['BankName'].isin(selected_banks)]
-            
-        # Apply sidebar category filters
-        if selected_categories:
-            df_yoy_base = df_yoy_base[df_yoy_base['CategoryName'].isin(selected_categories)]
+        # Sidebar bank/category filters are already applied; date range is intentionally ignored
+        df_yoy_base = income['yoy_base']
             
         # Apply selected donut slice filter
         if selected_earning_cat:
             df_yoy_base = df_yoy_base[df_yoy_base['CategoryName'] == selected_earning_cat]
             
         if not df_yoy_base.empty:
-            df_yoy_base['Year'] = df_yoy_base['DateT'].dt.year.astype(str)
             df_yoy = df_yoy_base.groupby('Year')['AmtIn'].sum().reset_index()
             df_yoy.rename(columns={'AmtIn': 'Earnings'}, inplace=True)
             df_yoy = df_yoy.sort_values('Year')
@@ -879,7 +1519,7 @@ with tab_income:
                 color=COLOR_INFLOW,
                 y_title='Amount (Lakhs)'
             )
-            st.altair_chart(yoy_chart, use_container_width=True)
+            altair_chart(yoy_chart, "yoy_chart", use_container_width=True)
         else:
             st.info("No historical earnings data available for YoY analysis.")
     else:
@@ -888,7 +1528,7 @@ with tab_income:
 # ==========================================
 # 💸 TAB 3: SPENDING ANALYSIS & BUDGETS
 # ==========================================
-with tab_spending:
+if active_tab == tab_spending:
     st.markdown("## 💸 Spending, Outflow & Budget Analysis")
     st.caption("Discover where your capital flows. Compare category spending directly against budget limits.")
     st.markdown("<hr style='margin-top: 0.25rem; margin-bottom: 1.5rem; border-color: rgba(255,255,255,0.05);'>", unsafe_allow_html=True)
@@ -898,19 +1538,11 @@ with tab_spending:
         if _skey not in st.session_state:
             st.session_state[_skey] = None
 
-    # Filter only records whose Category's BudgetName is not null and not "Invest"
-    spend_records = df_filtered[
-        (df_filtered['AmtOut'] > 0) &
-        (df_filtered['BudgetName'].notna()) &
-        (df_filtered['BudgetName'].str.strip() != "") &
-        (df_filtered['BudgetName'] != "Invest")
-    ]
-
-    if not spend_records.empty:
-        spend_df = spend_records.copy()
+    spending = prepare_spending(data_version, filters)
+    spend_df = spending['spend']
 
-        # Group by CategoryName (Expenses)
-        df_spend_cat = spend_df.groupby('CategoryName')['AmtOut'].sum().reset_index()
+    if not spend_df.empty:
+        df_spend_cat = spending['by_cat']
 
         spend_col1, spend_col2 = st.columns([1, 1])
 
@@ -927,8 +1559,8 @@ with tab_spending:
             style_chart(fig_spend_donut)
 
             # Interactive Donut Selection
-            donut_event = st.plotly_chart(
-                fig_spend_donut, use_container_width=True,
+            donut_event = plotly_chart(
+                fig_spend_donut, "fig_spend_donut", use_container_width=True,
                 on_select="rerun", key="spending_donut_chart"
             )
 
@@ -950,391 +1582,23 @@ with tab_spending:
         # INTERACTIVE MONTHLY SPENDING OUTFLOW TREND (2-level drill-down)
         # ================================================================
         with spend_col2:
-            st.markdown("### 📉 Monthly Spending Outflow Trend")
-            df_spend_trend = spend_df.copy()
-            if selected_spending_cat:
-                df_spend_trend = df_spend_trend[df_spend_trend['CategoryName'] == selected_spending_cat]
-            df_spend_trend['Month'] = df_spend_trend['DateT'].dt.to_period('M').astype(str)
-
-            if st.session_state.sb_monthly_drill_month is None:
-                # Level 0 — Monthly total bar chart
-                df_spend_monthly = (
-                    df_spend_trend.groupby('Month')['AmtOut']
-                    .sum().reset_index()
-                    .sort_values('Month')
-                )
-                if not df_spend_monthly.empty:
-                    df_spend_monthly['AmountLakhs'] = df_spend_monthly['AmtOut'].apply(rupees_to_lakhs)
-                    df_spend_monthly['Label'] = df_spend_monthly['AmtOut'].apply(format_amount_lakh)
-
-                    fig_monthly_bar = go.Figure()
-                    fig_monthly_bar.add_trace(go.Bar(
-                        x=df_spend_monthly['Month'],
-                        y=df_spend_monthly['AmountLakhs'],
-                        marker_color=COLOR_OUTFLOW,
-                        text=df_spend_monthly['Label'],
-                        textposition='outside',
-                        customdata=df_spend_monthly[['AmtOut']].values,
-                        hovertemplate='<b>%{x}</b><br>₹%{customdata[0]:,.2f}<extra></extra>'
-                    ))
-                    fig_monthly_bar.update_layout(
-                        title='Monthly Outflow — Click a bar to see categories',
-                        xaxis_title='Month',
-                        yaxis_title='Amount (Lakhs)',
-                        height=360
-                    )
-                    style_chart(fig_monthly_bar)
-
-                    monthly_event = st.plotly_chart(
-                        fig_monthly_bar,
-                        use_container_width=True,
-                        on_select="rerun",
-                        key="monthly_trend_bar"
-                    )
-
-                    if monthly_event and hasattr(monthly_event, "selection") and monthly_event.selection:
-                        m_pts = monthly_event.selection.points
-                        if m_pts:
-                            clicked_mth = m_pts[0].get("x")
-                            if clicked_mth:
-                                st.session_state.sb_monthly_drill_month = str(clicked_mth)[:7]  # Ensure it's in YYYY-MM format
-                                st.rerun()
-                else:
-                    st.info("No timeline trend data available for this selection.")
-
-            else:
-                # Level 1 — Category breakdown for the drilled month
-                drill_mth = st.session_state.sb_monthly_drill_month
-                if st.button("← Back to Monthly", key="back_monthly_trend"):
-                    st.session_state.sb_monthly_drill_month = None
-                    st.rerun()
-                st.caption(f"Showing categories in **{drill_mth}**")
-
-                df_month_cats_grp = (
-                    df_spend_trend[df_spend_trend['Month'] == drill_mth]
-                    .groupby('CategoryName')['AmtOut']
-                    .sum().reset_index()
-                    .sort_values('AmtOut', ascending=False)
-                )
-
-                if not df_month_cats_grp.empty:
-                    df_month_cats_grp['AmountLakhs'] = df_month_cats_grp['AmtOut'].apply(rupees_to_lakhs)
-                    df_month_cats_grp['Label'] = df_month_cats_grp['AmtOut'].apply(format_amount_lakh)
-
-                    fig_month_cat = go.Figure()
-                    fig_month_cat.add_trace(go.Bar(
-                        x=df_month_cats_grp['CategoryName'],
-                        y=df_month_cats_grp['AmountLakhs'],
-                        marker=dict(
-                            color=df_month_cats_grp['AmountLakhs'],
-                            colorscale='Oranges',
-                            showscale=False
-                        ),
-                        text=df_month_cats_grp['Label'],
-                        textposition='outside',
-                        customdata=df_month_cats_grp[['AmtOut']].values,
-                        hovertemplate='<b>%{x}</b><br>₹%{customdata[0]:,.2f}<extra></extra>'
-                    ))
-                    fig_month_cat.update_layout(
-                        title=f'Category Breakdown — {drill_mth}',
-                        xaxis_title='Category',
-                        yaxis_title='Amount (Lakhs)',
-                        height=360
-                    )
-                    style_chart(fig_month_cat)
-                    st.plotly_chart(fig_month_cat, use_container_width=True, key="monthly_cat_bar")
-                else:
-                    st.info(f"No spending data for {drill_mth}.")
+            render_monthly_spending_trend(data_version, filters, selected_spending_cat)
 
         # ================================================================
         # INTERACTIVE SPENDING DRILL-DOWN (replaces flat Spending Ledger)
         # ================================================================
-        st.markdown("### 📊 Spending Drill-Down")
-
-        if st.session_state.sb_drill_budget is None:
-            # ---- Level 0: BudgetName bars ----
-            df_by_budget = (
-                spend_df.groupby('BudgetName')['AmtOut']
-                .sum().reset_index()
-                .sort_values('AmtOut', ascending=False)
-            )
-            df_by_budget['AmountLakhs'] = df_by_budget['AmtOut'].apply(rupees_to_lakhs)
-            df_by_budget['Label'] = df_by_budget['AmtOut'].apply(format_amount_lakh)
-
-            fig_budget_bars = go.Figure()
-            fig_budget_bars.add_trace(go.Bar(
-                x=df_by_budget['BudgetName'],
-                y=df_by_budget['AmountLakhs'],
-                marker=dict(
-                    color=df_by_budget['AmountLakhs'],
-                    colorscale='Reds',
-                    showscale=False
-                ),
-                text=df_by_budget['Label'],
-                textposition='outside',
-                customdata=df_by_budget[['AmtOut']].values,
-                hovertemplate='<b>%{x}</b><br>Total Spending: ₹%{customdata[0]:,.2f}<extra></extra>'
-            ))
-            fig_budget_bars.update_layout(
-                title='Spending by Budget Group — Click a bar to drill into categories',
-                xaxis_title='Budget Group',
-                yaxis_title='Amount (Lakhs)',
-                height=420
-            )
-            style_chart(fig_budget_bars)
-
-            budget_event = st.plotly_chart(
-                fig_budget_bars,
-                use_container_width=True,
-                on_select="rerun",
-                key="budget_drill_bar"
-            )
-
-            if budget_event and hasattr(budget_event, "selection") and budget_event.selection:
-                b_pts = budget_event.selection.points
-                if b_pts:
-                    clicked_budget = b_pts[0].get("x")
-                    if clicked_budget:
-                        st.session_state.sb_drill_budget = str(clicked_budget)
-                        st.session_state.sb_drill_cat = None
-                        st.session_state.sb_drill_month = None
-                        st.rerun()
-
-        elif st.session_state.sb_drill_cat is None:
-            # ---- Level 1: Category bars within the selected Budget ----
-            drill_budget = st.session_state.sb_drill_budget
-            nav_col, info_col = st.columns([1, 6])
-            with nav_col:
-                if st.button("← Budgets", key="back_to_budgets"):
-                    st.session_state.sb_drill_budget = None
-                    st.rerun()
-            with info_col:
-                st.caption(f"Budget: **{drill_budget}** — Click a category bar to see its monthly trend")
-
-            df_by_cat = (
-                spend_df[spend_df['BudgetName'] == drill_budget]
-                .groupby('CategoryName')['AmtOut']
-                .sum().reset_index()
-                .sort_values('AmtOut', ascending=False)
-            )
-            df_by_cat['AmountLakhs'] = df_by_cat['AmtOut'].apply(rupees_to_lakhs)
-            df_by_cat['Label'] = df_by_cat['AmtOut'].apply(format_amount_lakh)
-
-            fig_cat_bars = go.Figure()
-            fig_cat_bars.add_trace(go.Bar(
-                x=df_by_cat['CategoryName'],
-                y=df_by_cat['AmountLakhs'],
-                marker=dict(
-                    color=df_by_cat['AmountLakhs'],
-                    colorscale='Oranges',
-                    showscale=False
-                ),
-                text=df_by_cat['Label'],
-                textposition='outside',
-                customdata=df_by_cat[['AmtOut']].values,
-                hovertemplate='<b>%{x}</b><br>Total: ₹%{customdata[0]:,.2f}<extra></extra>'
-            ))
-            fig_cat_bars.update_layout(
-                title=f'Categories in "{drill_budget}"',
-                xaxis_title='Category',
-                yaxis_title='Amount (Lakhs)',
-                height=420
-            )
-            style_chart(fig_cat_bars)
-
-            cat_event = st.plotly_chart(
-                fig_cat_bars,
-                use_container_width=True,
-                on_select="rerun",
-                key="cat_drill_bar"
-            )
-
-            if cat_event and hasattr(cat_event, "selection") and cat_event.selection:
-                c_pts = cat_event.selection.points
-                if c_pts:
-                    clicked_cat = c_pts[0].get("x")
-                    if clicked_cat:
-                        st.session_state.sb_drill_cat = str(clicked_cat)
-                        st.session_state.sb_drill_month = None
-                        st.rerun()
-
-        else:
-            # ---- Level 2: Monthly line chart for the selected Category ----
-            drill_budget = st.session_state.sb_drill_budget
-            drill_cat = st.session_state.sb_drill_cat
-
-            nav_col1, nav_col2, info_col = st.columns([1, 1, 5])
-            with nav_col1:
-                if st.button("← Budgets", key="back_to_budgets2"):
-                    st.session_state.sb_drill_budget = None
-                    st.session_state.sb_drill_cat = None
-                    st.session_state.sb_drill_month = None
-                    st.rerun()
-            with nav_col2:
-                if st.button(f"← {drill_budget}", key="back_to_cats"):
-                    st.session_state.sb_drill_cat = None
-                    st.session_state.sb_drill_month = None
-                    st.rerun()
-            with info_col:
-                st.caption(f"**{drill_budget}** → **{drill_cat}** — Click a point on the chart to see individual records")
-
-            df_cat_filtered = spend_df[
-                (spend_df['BudgetName'] == drill_budget) &
-                (spend_df['CategoryName'] == drill_cat)
-            ].copy()
-            df_cat_filtered['Month'] = df_cat_filtered['DateT'].dt.to_period('M').astype(str)
-            df_cat_monthly = (
-                df_cat_filtered.groupby('Month')['AmtOut']
-                .sum().reset_index()
-                .sort_values('Month')
-            )
-
-            if not df_cat_monthly.empty:
-                df_cat_monthly['AmountLakhs'] = df_cat_monthly['AmtOut'].apply(rupees_to_lakhs)
-                df_cat_monthly['Label'] = df_cat_monthly['AmtOut'].apply(format_amount_lakh)
-
-                fig_cat_line = go.Figure()
-                fig_cat_line.add_trace(go.Scatter(
-                    x=df_cat_monthly['Month'],
-                    y=df_cat_monthly['AmountLakhs'],
-                    mode='lines+markers+text',
-                    line=dict(color=COLOR_OUTFLOW, width=2),
-                    marker=dict(size=10, color=COLOR_OUTFLOW, line=dict(color='white', width=2)),
-                    text=df_cat_monthly['Label'],
-                    textposition='top center',
-                    customdata=df_cat_monthly[['AmtOut']].values,
-                    hovertemplate='<b>%{x}</b><br>₹%{customdata[0]:,.2f}<extra></extra>',
-                    name=drill_cat
-                ))
-                fig_cat_line.update_layout(
-                    title=f'Monthly Spending — {drill_cat} (Click a point to view records)',
-                    xaxis_title='Month',
-                    yaxis_title='Amount (Lakhs)',
-                    height=420
-                )
-                style_chart(fig_cat_line)
-
-                line_event = st.plotly_chart(
-                    fig_cat_line,
-                    use_container_width=True,
-                    on_select="rerun",
-                    key="cat_line_chart"
-                )
-
-                if line_event and hasattr(line_event, "selection") and line_event.selection:
-                    l_pts = line_event.selection.points
-                    if l_pts:
-                        clicked_month_pt = l_pts[0].get("x")
-                        if clicked_month_pt:
-                            st.session_state.sb_drill_month = str(clicked_month_pt)[:7]  # Extract YYYY-MM
-                            # st.rerun()
-                    else:
-                        # Optional: If the user clicks empty space, clear the table
-                        st.session_state.sb_drill_month = None
-            else:
-                st.info(f"No monthly data found for {drill_cat}.")
-
-            # ---- Level 3: Editable records table for the clicked line point ----
-            if st.session_state.sb_drill_month:
-                drill_month = st.session_state.sb_drill_month
-                st.markdown(f"#### 📋 Records: **{drill_cat}** in **{drill_month}**")
-                st.caption("Edit the Category column using the dropdown below, then click **Save Changes** to write back to the database.")
-
-                df_point_records = df_cat_filtered[df_cat_filtered['Month'] == drill_month].copy()
-
-                if not df_point_records.empty:
-                    all_cat_names = sorted(df_cats['CategoryName'].tolist()) if (df_cats is not None and not df_cats.empty) else []
-
-                    edit_cols = ['SBId', 'DateT', 'BankName', 'CategoryName', 'SBName', 'AmtOut', 'Comment']
-                    df_editable = df_point_records[edit_cols].copy()
-                    df_editable['DateT'] = df_editable['DateT'].dt.strftime('%Y-%m-%d')
-                    df_editable_sorted = df_editable.sort_values('DateT').reset_index(drop=True)
-
-                    edited_df = st.data_editor(
-                        df_editable_sorted,
-                        use_container_width=True,
-                        hide_index=True,
-                        column_config={
-                            'SBId': st.column_config.NumberColumn('ID', disabled=True),
-                            'DateT': st.column_config.TextColumn('Date', disabled=True),
-                            'BankName': st.column_config.TextColumn('Bank', disabled=True),
-                            'CategoryName': st.column_config.SelectboxColumn(
-                                'Category',
-                                options=all_cat_names,
-                                required=True
-                            ),
-                            'SBName': st.column_config.TextColumn('Payee / Merchant', disabled=True),
-                            'AmtOut': st.column_config.NumberColumn(
-                                'Amount Out (₹)', disabled=True, format='₹%.2f'
-                            ),
-                            'Comment': st.column_config.TextColumn('Comment', disabled=True),
-                        },
-                        key="spend_edit_table"
-                    )
-
-                    if st.button("💾 Save Category Changes", key="save_cat_changes"):
-                        changes_made = 0
-                        save_errors = []
-                        for i, orig_row in df_editable_sorted.iterrows():
-                            sb_id = int(orig_row['SBId'])
-                            orig_cat_name = orig_row['CategoryName']
-                            new_cat_name = edited_df.loc[i, 'CategoryName']
-
-                            if new_cat_name != orig_cat_name:
-                                cat_row = df_cats[df_cats['CategoryName'] == new_cat_name]
-                                if not cat_row.empty:
-                                    new_cat_id = int(cat_row.iloc[0]['CategoryId'])
-                                    full_orig = df_point_records[df_point_records['SBId'] == sb_id]
-                                    if not full_orig.empty:
-                                        r = full_orig.iloc[0]
-                                        success = db.update_transaction(
-                                            sb_id,
-                                            int(r['BankId']),
-                                            str(r['SBName'] or ''),
-                                            float(r['AmtIn'] or 0.0),
-                                            float(r['AmtOut'] or 0.0),
-                                            new_cat_id,
-                                            str(r['Comment'] or ''),
-                                            pd.to_datetime(r['DateT']).strftime('%Y-%m-%d')
-                                        )
-                                        if success:
-                                            changes_made += 1
-                                        else:
-                                            save_errors.append(sb_id)
-
-                        if changes_made > 0:
-                            st.success(f"✅ Updated {changes_made} record(s) successfully.")
-                            st.rerun()
-                        elif save_errors:
-                            st.error(f"Failed to update records with IDs: {save_errors}")
-                        else:
-                            st.info("No category changes detected.")
-                else:
-                    st.info(f"No records found for {drill_cat} in {drill_month}.")
+        render_spending_drilldown(data_version, filters)
 
         # YoY Spending Section
         st.markdown("<br>### 📅 Year on Year (YoY) Spending", unsafe_allow_html=True)
-        df_yoy_spend_base = df_trans[df_trans['AmtOut'] > 0].copy()
-        df_yoy_spend_base['BudgetName'] = df_yoy_spend_base['BudgetName'].fillna("")
-        df_yoy_spend_base = df_yoy_spend_base[
-            (df_yoy_spend_base['BudgetName'].str.strip() != "") &
-            (df_yoy_spend_base['BudgetName'] != "Invest")
-        ]
-
-        # Apply sidebar bank filters
-        if selected_banks:
-            df_yoy_spend_base = df_yoy_spend_base[df_yoy_spend_base['BankName'].isin(selected_banks)]
-
-        # Apply sidebar category filters
-        if selected_categories:
-            df_yoy_spend_base = df_yoy_spend_base[df_yoy_spend_base['CategoryName'].isin(selected_categories)]
+        # Sidebar bank/category filters are already applied; date range is intentionally ignored
+        df_yoy_spend_base = spending['yoy_base']
 
         # Apply selected donut slice filter
         if selected_spending_cat:
             df_yoy_spend_base = df_yoy_spend_base[df_yoy_spend_base['CategoryName'] == selected_spending_cat]
 
         if not df_yoy_spend_base.empty:
-            df_yoy_spend_base['Year'] = df_yoy_spend_base['DateT'].dt.year.astype(str)
             df_yoy_spend = df_yoy_spend_base.groupby('Year')['AmtOut'].sum().reset_index()
             df_yoy_spend.rename(columns={'AmtOut': 'Spending'}, inplace=True)
             df_yoy_spend = df_yoy_spend.sort_values('Year')
@@ -1347,7 +1611,7 @@ with tab_spending:
                 color=COLOR_OUTFLOW,
                 y_title='Amount (Lakhs)'
             )
-            st.altair_chart(yoy_spend_chart, use_container_width=True)
+            altair_chart(yoy_spend_chart, "yoy_spend_chart", use_container_width=True)
         else:
             st.info("No historical spending data available for YoY analysis.")
 
@@ -1355,48 +1619,57 @@ with tab_spending:
         st.markdown("## 🎯 Budget Configuration & Breakdown")
 
         # Interactive budget config section and breakdown table at the bottom
+        df_budget_cmp = load_budget_vs_actual(data_version, filters, end_date.strftime('%Y-%m'), spend_only=True)
         cols_config1, cols_config2 = st.columns([1, 1])
 
         with cols_config1:
             st.markdown("### 🛠️ Interactive Category Budget Configuration")
             st.write("Configure maximum monthly spend parameters. Progress bars adjust automatically.")
 
-            if df_cats is not None and not df_cats.empty:
-                cols_b1, cols_b2 = st.columns(2)
-                for i, row in df_cats.iterrows():
-                    c_id = int(row['CategoryId'])
-                    c_name = row['CategoryName']
-
-                    target_col = cols_b1 if i % 2 == 0 else cols_b2
-                    with target_col:
-                        st.session_state.budgets[c_id] = st.number_input(
-                            f"Monthly Budget: {c_name}",
-                            min_value=0.0,
-                            max_value=100000.0,
-                            value=float(st.session_state.budgets.get(c_id, 500.0)),
-                            step=50.0,
-                            key=f"input_bud_{c_id}"
-                        )
+            if not df_budget_cmp.empty:
+                with st.form("budget_config_form"):
+                    df_budget_edit = st.data_editor(
+                        df_budget_cmp[['CategoryId', 'CategoryName', 'Budget']],
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={
+                            'CategoryId': None,
+                            'CategoryName': st.column_config.TextColumn('Category', disabled=True),
+                            'Budget': st.column_config.NumberColumn(
+                                'Monthly Budget (₹)', min_value=0.0, max_value=100000.0, step=50.0, format='₹%.2f'
+                            ),
+                        },
+                        key="budget_config_table"
+                    )
+                    budget_month = st.text_input("Effective from month (YYYY-MM, blank applies to all months)", "")
+                    if st.form_submit_button("💾 Save Budgets"):
+                        budget_month = budget_month.strip() or None
+                        if budget_month and pd.isna(pd.to_datetime(budget_month, format='%Y-%m', errors='coerce')):
+                            st.error("Effective month must be in YYYY-MM format.")
+                        else:
+                            # A dated budget is written for every category so the month is a complete snapshot
+                            changed = df_budget_edit if budget_month else df_budget_edit[df_budget_edit['Budget'] != df_budget_cmp['Budget']]
+                            if changed.empty:
+                                st.info("No budget changes detected.")
+                            elif db.set_budgets(zip(changed['CategoryId'], changed['Budget'].fillna(0.0)), budget_month):
+                                st.success(f"✅ Saved {len(changed)} budget(s).")
+                                st.rerun()
+                            else:
+                                st.error("Failed to save budgets.")
             else:
                 st.info("No categories registered yet.")
 
         with cols_config2:
             st.markdown("### 📊 Budget vs. Actual Breakdown")
-            if df_cats is not None and not df_cats.empty:
-                df_spent_by_cat = spend_df.groupby('CategoryId')[['AmtOut']].sum().reset_index()
-                df_b_table = pd.merge(df_cats, df_spent_by_cat, on='CategoryId', how='left').fillna(0.0)
-                df_b_table['BudgetLimit'] = df_b_table['CategoryId'].map(st.session_state.budgets).fillna(500.0)
-                df_b_table['Status'] = df_b_table['BudgetLimit'] - df_b_table['AmtOut']
-                df_b_table['Progress %'] = ((df_b_table['AmtOut'] / df_b_table['BudgetLimit']) * 100).round(1)
-
-                df_b_display = df_b_table[['CategoryName', 'BudgetName', 'AmtOut', 'BudgetLimit', 'Status', 'Progress %']]
-                df_b_display.rename(columns={
+            if not df_budget_cmp.empty:
+                df_b_display = df_budget_cmp[['CategoryName', 'BudgetName', 'AmtOut', 'Budget', 'Remaining', 'Percentage']].rename(columns={
                     'CategoryName': 'Category',
                     'BudgetName': 'Budget Group',
                     'AmtOut': 'Spent Actual',
-                    'BudgetLimit': 'Budget Limit',
-                    'Status': 'Remaining Balance'
-                }, inplace=True)
+                    'Budget': 'Budget Limit',
+                    'Remaining': 'Remaining Balance',
+                    'Percentage': 'Progress %'
+                })
 
                 def style_budget_rows(val):
                     color = '#f87171' if val > 100 else '#34d399'
@@ -1419,18 +1692,20 @@ with tab_spending:
 # ==========================================
 # 🛡️ TAB 4: INVESTMENTS & WEALTH
 # ==========================================
-with tab_invest:
+if active_tab == tab_invest:
     st.markdown("## 🛡️ Asset Allocation & Wealth Accumulation")
     st.caption("Track capital allocation to assets and watch your net worth accumulate over multiple years.")
     st.markdown("<hr style='margin-top: 0.25rem; margin-bottom: 1.5rem; border-color: rgba(255,255,255,0.05);'>", unsafe_allow_html=True)
     
+    kpis = compute_kpis(data_version, filters)
+    chart_resolution = st.radio("Chart resolution", list(CHART_RESOLUTIONS), horizontal=True, key="invest_chart_resolution")
+    investments = prepare_investments(data_version, filters, CHART_RESOLUTIONS[chart_resolution])
     inv_col1, inv_col2 = st.columns([1, 1])
     
     with inv_col1:
         st.markdown("### 🍩 Asset / Investment Allocation")
-        if not df_filtered.empty and total_invested > 0:
-            df_inv = df_filtered[df_filtered['IsInvestment'] & (df_filtered['AmtOut'] > 0)]
-            df_inv_cat = df_inv.groupby('CategoryName')['AmtOut'].sum().reset_index()
+        if 'allocation' in investments and kpis['total_invested'] > 0:
+            df_inv_cat = investments['allocation']
             
             fig_inv_donut = px.pie(
                 df_inv_cat, 
@@ -1441,55 +1716,61 @@ with tab_invest:
             )
             fig_inv_donut.update_traces(textposition='inside', textinfo='percent+label')
             style_chart(fig_inv_donut)
-            st.plotly_chart(fig_inv_donut, use_container_width=True)
+            plotly_chart(fig_inv_donut, "fig_inv_donut", use_container_width=True)
         else:
             st.info("No active investments detected in filtered data. Note: Investment categories are detected automatically by looking for terms like 'Invest', 'Stock', 'Crypto', 'SIP' etc. in Category or Budget Names.")
             
     with inv_col2:
         st.markdown("### 📈 Cumulative Invested Capital Growth")
-        if not df_trans.empty:
+        if 'cumulative' in investments:
             # We calculate this using the complete database for full historical scope
-            df_full_sorted = df_trans.copy().sort_values('DateT')
-            df_full_sorted['AmtOut'] = df_full_sorted['AmtOut'].fillna(0.0).astype(float)
-            df_full_sorted['IsInvestment'] = df_full_sorted.apply(is_investment_row, axis=1)
-            
-            df_full_sorted['CumulativeInvestments'] = df_full_sorted[df_full_sorted['IsInvestment']]['AmtOut'].cumsum()
-            # Forward fill cumulative sum to account for days without transactions
-            df_full_sorted['CumulativeInvestments'] = df_full_sorted['CumulativeInvestments'].ffill().fillna(0.0)
-            
             fig_cum_inv = px.line(
-                df_full_sorted,
+                investments['cumulative'],
                 x='DateT',
                 y='CumulativeInvestments',
                 color_discrete_sequence=[COLOR_INVEST],
                 labels={'CumulativeInvestments': 'Total Capital Invested (₹)'}
             )
             style_chart(fig_cum_inv)
-            st.plotly_chart(fig_cum_inv, use_container_width=True)
+            plotly_chart(fig_cum_inv, "fig_cum_inv", use_container_width=True)
             
     # Wealth Growth Accumulation Trend (Net balance of all bank accounts over time)
     st.markdown("<br>### 🪙 Running Net Worth (Cumulative Net Inflow Growth)", unsafe_allow_html=True)
-    if not df_trans.empty:
-        df_net_worth = df_trans.copy().sort_values('DateT')
-        df_net_worth['AmtIn'] = df_net_worth['AmtIn'].fillna(0.0).astype(float)
-        df_net_worth['AmtOut'] = df_net_worth['AmtOut'].fillna(0.0).astype(float)
-        df_net_worth['NetChange'] = df_net_worth['AmtIn'] - df_net_worth['AmtOut']
-        df_net_worth['CumulativeNetBalance'] = df_net_worth['NetChange'].cumsum()
-        
+    if 'net_worth' in investments:
         fig_net_worth = px.area(
-            df_net_worth,
+            investments['net_worth'],
             x='DateT',
             y='CumulativeNetBalance',
             color_discrete_sequence=[COLOR_ACCENT],
             labels={'CumulativeNetBalance': 'Total Net Account Balances (₹)'}
         )
         style_chart(fig_net_worth)
-        st.plotly_chart(fig_net_worth, use_container_width=True)
+        plotly_chart(fig_net_worth, "fig_net_worth", use_container_width=True)
+
+    # Mutual fund holdings over time, from the imported MFQuarterly snapshots
+    if {'MFQuarterly', 'MFTrans', 'Owner'} <= set(db_status['tables']):
+        st.markdown("<br>### 📚 Mutual Fund Portfolio Over Time", unsafe_allow_html=True)
+        df_mf_owners = load_mf_owners(data_version)
+        if df_mf_owners.empty:
+            st.info("No mutual fund holdings found.")
+        else:
+            mf_owner_name = st.selectbox("Owner", df_mf_owners['OwnerName'].tolist(), key="mf_history_owner")
+            mf_owner_id = int(df_mf_owners.loc[df_mf_owners['OwnerName'] == mf_owner_name, 'OwnerId'].iloc[0])
+            df_mf_value = prepare_mf_history(data_version, mf_owner_id)
+            if df_mf_value is None:
+                st.info(f"No quarterly snapshots imported for {mf_owner_name} yet.")
+            else:
+                fig_mf_value = px.area(
+                    df_mf_value,
+                    labels={'value': 'Value (₹)', 'variable': 'Fund'}
+                )
+                style_chart(fig_mf_value)
+                plotly_chart(fig_mf_value, "fig_mf_value", use_container_width=True)
 
 # ==========================================
 # 📋 TAB 5: TRANSACTION LEDGER & EDITOR
 # ==========================================
-with tab_ledger:
+if active_tab == tab_ledger:
     st.markdown("## 📋 Transaction Ledger & Database Management")
     st.caption("Browse all raw data records and use write-back forms to modify banks, categories, and transactions.")
     st.markdown("<hr style='margin-top: 0.25rem; margin-bottom: 1.5rem; border-color: rgba(255,255,255,0.05);'>", unsafe_allow_html=True)
@@ -1498,7 +1779,7 @@ with tab_ledger:
     st.markdown("### 🔍 Search & Filter Ledger Table")
     search_query = st.text_input("Search transactions by comment, category, or merchant description", "")
     
-    df_ledger_display = df_filtered.copy()
+    df_ledger_display = load_filtered_transactions(data_version, filters)
     if not df_ledger_display.empty:
         if search_query:
             df_ledger_display = df_ledger_display[
@@ -1507,13 +1788,12 @@ with tab_ledger:
                 df_ledger_display['CategoryName'].astype(str).str.contains(search_query, case=False)
             ]
         
-        # Prepare for nice looking table
-        df_ledger_display['DateT'] = df_ledger_display['DateT'].dt.strftime('%Y-%m-%d')
-        df_ledger_display = df_ledger_display.fillna("")
-        
+        # Prepare for nice looking table (only the displayed columns, blanks via na_rep)
         ledger_cols = ['SBId', 'DateT', 'BankName', 'CategoryName', 'SBName', 'AmtIn', 'AmtOut', 'Comment']
+        df_ledger_display = df_ledger_display[ledger_cols]
+        df_ledger_display = df_ledger_display.assign(DateT=df_ledger_display['DateT'].dt.strftime('%Y-%m-%d'))
         st.dataframe(
-            df_ledger_display[ledger_cols].style.format({
+            df_ledger_display.style.format(na_rep="", formatter={
                 'AmtIn': lambda x: format_inr(x) if isinstance(x, (int, float)) and x > 0 else "-",
                 'AmtOut': lambda x: format_inr(x) if isinstance(x, (int, float)) and x > 0 else "-"
             }),
@@ -1568,18 +1848,16 @@ with tab_ledger:
                         st.rerun()
                         
         elif action_opt == "Edit Existing Transaction":
-            if df_trans.empty:
+            if trans_count == 0:
                 st.info("No transactions to edit.")
             else:
                 # Select transaction to edit
                 # Display transactions list
-                trans_map = {}
-                for idx, row in df_trans.iterrows():
-                    val = f"ID: {row['SBId']} | {row['DateT'].strftime('%Y-%m-%d') if pd.notna(row['DateT']) else ''} | {row['CategoryName']} | {row['SBName']} | In: {format_inr(row['AmtIn'])} Out: {format_inr(row['AmtOut'])}"
-                    trans_map[val] = row['SBId']
+                trans_map = load_transaction_labels(data_version)
                     
                 selected_edit_str = st.selectbox("Select Transaction to Modify", list(trans_map.keys()))
                 edit_id = trans_map[selected_edit_str]
+                df_trans = load_transactions(data_version)
                 row_to_edit = df_trans[df_trans['SBId'] == edit_id].iloc[0]
                 
                 with st.form("edit_transaction_form"):
@@ -1614,13 +1892,10 @@ with tab_ledger:
                             st.error("Error updating transaction in SQLite.")
                             
         elif action_opt == "Delete Transaction":
-            if df_trans.empty:
+            if trans_count == 0:
                 st.info("No transactions to delete.")
             else:
-                trans_map = {}
-                for idx, row in df_trans.iterrows():
-                    val = f"ID: {row['SBId']} | {row['DateT'].strftime('%Y-%m-%d') if pd.notna(row['DateT']) else ''} | {row['CategoryName']} | {row['SBName']} | In: {format_inr(row['AmtIn'])} Out: {format_inr(row['AmtOut'])}"
-                    trans_map[val] = row['SBId']
+                trans_map = load_transaction_labels(data_version)
                     
                 selected_del_str = st.selectbox("Select Transaction to Permanent Delete", list(trans_map.keys()))
                 del_id = trans_map[selected_del_str]
@@ -1735,12 +2010,16 @@ with tab_ledger:
 # ==========================================
 # 🧠 TAB 6: WEALTH COACH (HEALTH CHECKER)
 # ==========================================
-with tab_coach:
+if active_tab == tab_coach:
     st.markdown("## 🧠 Intelligent Financial Health Coach")
     st.caption("Rule-based behavioral heuristics running across your transaction history to flag outliers, recurring expenses, and progress metrics.")
     st.markdown("<hr style='margin-top: 0.25rem; margin-bottom: 1.5rem; border-color: rgba(255,255,255,0.05);'>", unsafe_allow_html=True)
     
-    if not df_filtered.empty:
+    kpis = compute_kpis(data_version, filters)
+    coach = prepare_coach(data_version, filters)
+    savings_rate = kpis['savings_rate']
+    
+    if coach:
         # Heuristic Analysis
         coach_col1, coach_col2 = st.columns([1, 1])
         
@@ -1767,41 +2046,40 @@ with tab_coach:
             # Budget overruns summary
             st.markdown("<br>**Overspent Categories Alerts**:", unsafe_allow_html=True)
             overspent_found = False
-            if df_cats is not None and not df_cats.empty:
-                df_spent_by_cat = df_filtered[df_filtered['AmtOut'] > 0].groupby('CategoryId')[['AmtOut']].sum().reset_index()
-                df_o = pd.merge(df_cats, df_spent_by_cat, on='CategoryId', how='left').fillna(0.0)
-                df_o['Limit'] = df_o['CategoryId'].map(st.session_state.budgets).fillna(500.0)
-                
-                for _, row in df_o.iterrows():
-                    if row['AmtOut'] > row['Limit']:
-                        overspent_found = True
-                        st.markdown(
-                            f"⚠️ **{row['CategoryName']}** exceeds monthly threshold: "
-                            f"Spent **{format_inr(row['AmtOut'])}** against **{format_inr(row['Limit'])}** limit "
-                            f"(Over by <span style='color:#f87171; font-weight:700;'>{format_inr(row['AmtOut'] - row['Limit'])}</span>)", 
-                            unsafe_allow_html=True
-                        )
+            df_budget_cmp = load_budget_vs_actual(data_version, filters, end_date.strftime('%Y-%m'))
+            if not df_budget_cmp.empty:
+                df_over = df_budget_cmp[df_budget_cmp['IsOver']]
+                overspent_found = not df_over.empty
+                if overspent_found:
+                    st.markdown("<br>".join(
+                        f"⚠️ **{name}** exceeds monthly threshold: "
+                        f"Spent **{format_inr(spent)}** against **{format_inr(limit)}** limit "
+                        f"(Over by <span style='color:#f87171; font-weight:700;'>{format_inr(spent - limit)}</span>)"
+                        for name, spent, limit in zip(df_over['CategoryName'], df_over['AmtOut'], df_over['Budget'])
+                    ), unsafe_allow_html=True)
             if not overspent_found:
                 st.success("All operational spending categories are currently within limits!")
                 
         with coach_col2:
             st.markdown("### 🚨 Large Outflow/Expense Auditing")
-            # Alert on transactions exceeding 5x the average transaction amount
-            df_out_non_zero = df_filtered[df_filtered['AmtOut'] > 0]
-            if not df_out_non_zero.empty:
-                avg_out = df_out_non_zero['AmtOut'].mean()
-                threshold_out = avg_out * 5.0
-                
-                df_outliers = df_out_non_zero[df_out_non_zero['AmtOut'] > threshold_out].sort_values(by='AmtOut', ascending=False)
-                st.write(f"Average outflow size: **{format_inr(avg_out)}**. Flagging transactions exceeding **{format_inr(threshold_out)}** (5x average):")
+            # Alert on outflows far above their category's recent typical amount
+            if coach['has_outflows']:
+                df_outliers = coach['outliers']
+                st.write(f"Flagging outflows scoring above **{SCORE_THRESHOLD}** (robust z-score against the rolling median of the same category):")
                 
                 if not df_outliers.empty:
-                    for _, row in df_outliers.iterrows():
-                        st.markdown(
-                            f"🔴 **{format_inr(row['AmtOut'])}** on **{row['DateT'].strftime('%Y-%m-%d')}** | "
-                            f"{row['CategoryName']} - *{row['SBName']}* | "
-                            f"Comment: *{row['Comment'] or 'None'}*"
-                        )
+                    out_display = df_outliers.copy()
+                    out_display['DateT'] = out_display['DateT'].dt.strftime('%Y-%m-%d')
+                    out_display['Comment'] = out_display['Comment'].fillna('')
+                    st.dataframe(
+                        out_display.style.format({
+                            'AmtOut': lambda x: format_inr(x),
+                            'TypicalAmount': lambda x: format_inr(x),
+                            'Score': '{:.1f}'
+                        }),
+                        use_container_width=True,
+                        hide_index=True
+                    )
                 else:
                     st.success("No anomalous transaction spikes found. Spending values remain statistically uniform.")
             else:
@@ -1810,27 +2088,54 @@ with tab_coach:
         # Recurring Transaction Detection Heuristic
         st.markdown("<br><hr style='border-color: rgba(255,255,255,0.05);'><br>", unsafe_allow_html=True)
         st.markdown("### 🔄 Recurring Subscriptions & Fixed Costs Detector")
-        st.write("Detecting repeating expenses (matching merchant names, category, and amount patterns happening at least twice):")
+        st.write("Detecting repeating expenses (same merchant within a ±5% amount band, paid on a weekly, monthly, quarterly or yearly rhythm):")
         
-        if not df_filtered.empty:
-            df_rec = df_filtered[df_filtered['AmtOut'] > 0].copy()
-            if not df_rec.empty:
-                # Group by description and amount
-                df_rec_grouped = df_rec.groupby(['SBName', 'CategoryId', 'CategoryName', 'AmtOut']).size().reset_index(name='Occurrences')
-                df_rec_matches = df_rec_grouped[df_rec_grouped['Occurrences'] >= 2].sort_values(by='Occurrences', ascending=False)
+        if coach:
+            if coach['has_outflows']:
+                df_rec_matches = coach['recurring']
                 
                 if not df_rec_matches.empty:
-                    rec_cols = st.columns(3)
-                    for idx, row in df_rec_matches.iterrows():
-                        col_idx = idx % 3
-                        with rec_cols[col_idx]:
-                            with st.container(border=True):
-                                st.markdown(f"**🔄 {row['SBName']}**")
-                                st.write(f"Amt: **{format_inr(row['AmtOut'])}** | Occurrences: **{row['Occurrences']}**")
-                                st.caption(f"Category: {row['CategoryName']}")
+                    st.caption(f"{len(df_rec_matches)} recurring series detected, showing the top {min(len(df_rec_matches), RECURRING_DISPLAY_LIMIT)} by occurrences.")
+                    rec_display = df_rec_matches.head(RECURRING_DISPLAY_LIMIT).copy()
+                    for col in ['FirstDate', 'LastDate', 'NextExpected']:
+                        rec_display[col] = rec_display[col].dt.strftime('%Y-%m-%d')
+                    st.dataframe(
+                        rec_display.style.format({
+                            'AvgAmount': lambda x: format_inr(x),
+                            'MinAmount': lambda x: format_inr(x),
+                            'MaxAmount': lambda x: format_inr(x),
+                            'MedianGapDays': '{:.0f}',
+                            'Regularity': '{:.0%}'
+                        }),
+                        use_container_width=True,
+                        hide_index=True
+                    )
                 else:
                     st.info("No clear repeating subscription behavior detected. (Uniform naming matches not found)")
             else:
                 st.info("No outflows found.")
     else:
         st.info("No transactions found in filtered timeline.")
+
+perf.stop(tab_span)
+
+# ==========================================
+# ⏱️ PERFORMANCE PANEL (JELLYFIN_PERF=1)
+# ==========================================
+if perf.ENABLED:
+    spans = perf.run_spans()
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        st.caption(f"This rerun: {perf.run_elapsed_ms():,.1f} ms, {len(spans)} spans (cached loaders only appear on a cache miss)")
+        if spans:
+            df_spans = pd.DataFrame(spans, columns=perf.SPAN_COLUMNS)
+            # Per-kind totals skip spans nested in one of the same kind, so no call is counted twice
+            df_kind = df_spans[~df_spans['Nested']].groupby('Kind')['Ms'].agg(['count', 'sum'])
+            st.dataframe(df_kind.sort_values('sum', ascending=False), use_container_width=True)
+            st.dataframe(
+                df_spans.assign(Name=df_spans['Depth'].map(lambda d: '· ' * d) + df_spans['Name'].astype(str))[['Kind', 'Name', 'StartMs', 'Ms']],
+                use_container_width=True,
+                hide_index=True
+            )
+        if perf.TRACE_PATH:
+            written = perf.write_trace()
+            st.caption(f"Appended {written} spans to `{perf.TRACE_PATH}`")
@@ -0,0 +1 @@
+"""Synthetic JellyFin databases and timing harness (python -m benchmarks.run)."""
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+# Keep bare-mode and AppTest runs quiet (AppTest re-applies the configured level on every run)
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+import streamlit as st
+import streamlit.logger
+import db_manager as db
+import sb_classifier
+from benchmarks.synthetic import generate_database, parse_size
+
+# Times the data paths of the dashboard and the import/classifier scripts against synthetic
+# databases and writes the results as JSON so runs can be compared across commits, e.g.
+# python -m benchmarks.run --sizes 10k 100k --repeat 5 --output bench.json
+
+# --- Configuration ---
+APP_PATH = os.path.join(REPO_DIR, "app.py")
+# app.py defines its loaders above this line; everything after it renders the page
+APP_DEFINITIONS_END = "# Check DB Setup Status"
+BALANCE_LOOKUPS = 200
+IMPORT_ROWS = 500
+# Full-ledger filters, as the sidebar produces with no bank/category selected
+ALL_FILTERS = (None, (), ())
+
+def time_call(fn, repeat, setup=None):
+    """Runs setup() (untimed) then fn() repeat times; returns the wall-clock seconds of each fn() call."""
+    seconds = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+def record(results, name, size, rows, seconds):
+    results.append({
+        'name': name,
+        'size': size,
+        'rows': rows,
+        'seconds': [round(s, 6) for s in seconds],
+        'best': round(min(seconds), 6),
+        'median': round(statistics.median(seconds), 6),
+    })
+    print(f"  {name:<32} best {min(seconds):9.4f}s  median {statistics.median(seconds):9.4f}s  ({rows} rows)")
+
+def capped_copy(src, dst, max_sb_rows):
+    """Copies the database and keeps only the first max_sb_rows SB rows (for the per-row classifier paths)."""
+    shutil.copyfile(src, dst)
+    conn = sqlite3.connect(dst)
+    try:
+        conn.execute("DELETE FROM SB WHERE SBId > (SELECT SBId FROM SB ORDER BY SBId LIMIT 1 OFFSET ?)", (max_sb_rows - 1,))
+        conn.commit()
+        return conn.execute("SELECT COUNT(*) FROM SB").fetchone()[0]
+    finally:
+        conn.close()
+
+def load_app_definitions():
+    """Executes app.py up to APP_DEFINITIONS_END and returns its namespace (loaders and preparers)."""
+    with open(APP_PATH) as f:
+        src = f.read()
+    namespace = {'__file__': APP_PATH}
+    exec(compile(src[:src.index(APP_DEFINITIONS_END)], APP_PATH, 'exec'), namespace)
+    return namespace
+
+def statement_frame(conn, n_rows):
+    """An HDFC statement body (Date, Narration, Chq./Ref.No., Value Dt, Withdrawal, Deposit, Closing) dated after the ledger."""
+    last = conn.execute("SELECT MAX(DateT) FROM SB").fetchone()[0]
+    first_day = datetime.strptime(last, '%Y-%m-%d') + timedelta(days=1)
+    rng = np.random.default_rng(7)
+    dates = [(first_day + timedelta(days=int(d))).strftime('%d/%m/%y') for d in np.sort(rng.integers(0, 90, n_rows))]
+    amounts = np.round(rng.lognormal(6.5, 1.0, n_rows), 2)
+    is_in = rng.random(n_rows) < 0.2
+    return pd.DataFrame({
+        'Date': dates,
+        'Narration': [f"UPI-SYNTHETIC MERCHANT-{i:06d}@okaxis-PAYMENT" for i in range(n_rows)],
+        'Chq./Ref.No.': [f"{i:016d}" for i in range(n_rows)],
+        'Value Dt': dates,
+        'Withdrawal Amt.': np.where(is_in, np.nan, amounts),
+        'Deposit Amt.': np.where(is_in, amounts, np.nan),
+        'Closing Balance': np.nan,
+    }), last
+
+def bench_db_manager(results, size, rows, repeat):
+    # The first call runs the lazy migrations (paise/date-key columns, balance series); not timed
+    db.get_all_transactions()
+    record(results, 'db.get_all_transactions', size, rows, time_call(db.get_all_transactions, repeat))
+
+    banks = db.get_banks()['BankId'].tolist() + [db.OVERALL_BANK_ID]
+    rng = np.random.default_rng(1)
+    days = rng.integers(0, 365 * 10, BALANCE_LOOKUPS)
+    lookups = [(banks[i % len(banks)], (datetime(2015, 4, 1) + timedelta(days=int(d))).strftime('%Y-%m-%d'))
+               for i, d in enumerate(days)]
+    record(results, f'db.get_closing_balance x{BALANCE_LOOKUPS}', size, rows,
+           time_call(lambda: [db.get_closing_balance(b, d) for b, d in lookups], repeat))
+
+def bench_classifier(results, size, path, scratch_path, classifier_rows, repeat):
+    conn = sqlite3.connect(path)
+    sample = pd.read_sql_query("SELECT SBName, AmtIn, AmtOut, CategoryId FROM SB WHERE CategoryId IS NOT NULL LIMIT ?",
+                               conn, params=(classifier_rows,))
+    records = list(sample.itertuples(index=False, name=None))
+    record(results, 'sb_classifier.get_proposed_category', size, len(records),
+           time_call(lambda: [sb_classifier.get_proposed_category(conn, n, i, o) for n, i, o, _ in records], repeat))
+    conn.close()
+
+    # update_sb_meta and migrate_and_compress write, so they run on a copy capped at classifier_rows
+    capped_rows = capped_copy(path, scratch_path, classifier_rows)
+    scratch = sqlite3.connect(scratch_path)
+    record(results, 'sb_classifier.update_sb_meta', size, len(records),
+           time_call(lambda: [sb_classifier.update_sb_meta(scratch, n, i, o, c) for n, i, o, c in records], repeat))
+    scratch.close()
+
+    sb_classifier.DB_PATH = scratch_path
+    record(results, 'sb_classifier.migrate_and_compress', size, capped_rows,
+           time_call(sb_classifier.migrate_and_compress, repeat))
+
+def bench_correlations(results, size, rows, path, repeat):
+    import AutoCategoryClasser
+    AutoCategoryClasser.DB_PATH = path
+    df = AutoCategoryClasser.get_data()
+    record(results, 'AutoCategoryClasser.process_correlations', size, len(df),
+           time_call(lambda: AutoCategoryClasser.process_correlations(df.copy()), repeat))
+
+def bench_sbimport(results, size, path, repeat):
+    # SBimport renders its page on import; with nothing uploaded that is a bank selectbox and no writes
+    import SBimport
+    conn = sqlite3.connect(path)
+    frame, last_import_date = statement_frame(conn, IMPORT_ROWS)
+    bank_id = conn.execute("SELECT MIN(BankId) FROM Bank").fetchone()[0]
+    record(results, f'SBimport.import_statement_rows x{IMPORT_ROWS}', size, IMPORT_ROWS,
+           time_call(lambda: SBimport.import_statement_rows(conn, bank_id, frame, last_import_date), repeat,
+                     setup=conn.rollback))
+    conn.rollback()
+    conn.close()
+
+def bench_app_paths(results, size, rows, app, repeat):
+    """Times app.py loaders and per-tab preparers on the full ledger; a fresh data_version per call bypasses the caches."""
+    versions = iter(range(10**9))
+    def fresh():
+        return f"bench-{size}-{next(versions)}"
+
+    record(results, 'app.load_transactions', size, rows, time_call(lambda: app['load_transactions'](fresh()), repeat))
+
+    preparers = [
+        ('app.compute_kpis', lambda v: app['compute_kpis'](v, ALL_FILTERS)),
+        ('app.prepare_overview', lambda v: app['prepare_overview'](v, ALL_FILTERS)),
+        ('app.prepare_income', lambda v: app['prepare_income'](v, ALL_FILTERS)),
+        ('app.prepare_spending', lambda v: app['prepare_spending'](v, ALL_FILTERS)),
+        ('app.prepare_spending_drill', lambda v: app['prepare_spending_drill'](v, ALL_FILTERS)),
+        ('app.prepare_investments', lambda v: app['prepare_investments'](v, ALL_FILTERS)),
+        ('app.prepare_coach', lambda v: app['prepare_coach'](v, ALL_FILTERS)),
+    ]
+    for name, fn in preparers:
+        # The ledger itself is loaded untimed, so only the tab's own aggregation is measured
+        current = {}
+        def setup():
+            current['v'] = fresh()
+            app['load_filtered_transactions'](current['v'], ALL_FILTERS)
+        record(results, name, size, rows, time_call(lambda: fn(current['v']), repeat, setup=setup))
+
+def bench_app_tabs(results, size, rows):
+    """Renders every dashboard tab under AppTest: a cold run with empty caches, then a warm rerun."""
+    from streamlit.testing.v1 import AppTest
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    record(results, 'app.render first', size, rows, time_call(at.run, 1))
+    for label in at.radio(key="active_tab").options:
+        at.radio(key="active_tab").set_value(label)
+        record(results, f'app.render {label} cold', size, rows, time_call(at.run, 1))
+        record(results, f'app.render {label} warm', size, rows, time_call(at.run, 1))
+        if at.exception:
+            print(f"  warning: {label} raised {at.exception[0].message}")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JellyFin data paths against synthetic databases.")
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k"], help="SB row counts: 10k, 100k, 1m or numbers")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions per benchmark")
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--classifier-rows", type=int, default=2000,
+                        help="Row cap for the per-row classifier paths (update_sb_meta, migrate_and_compress, ...)")
+    parser.add_argument("--workdir", help="Directory for the generated databases (default: a temporary directory)")
+    parser.add_argument("--seed", type=int, default=42, help="Generator seed")
+    parser.add_argument("--skip-app", action="store_true", help="Skip the AppTest page renders")
+    args = parser.parse_args()
+
+    streamlit.logger.set_log_level("error")
+    workdir = args.workdir or tempfile.mkdtemp(prefix="jellyfin_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    app = None
+    try:
+        for size in args.sizes:
+            rows = parse_size(size)
+            path = os.path.join(workdir, f"jellyfin_{rows}.db")
+            print(f"[{size}] generating {rows} rows -> {path}")
+            generate_database(path, rows, args.seed)
+            os.environ["JELLYFIN_DB_PATH"] = path
+
+            bench_db_manager(results, size, rows, args.repeat)
+            bench_classifier(results, size, path, os.path.join(workdir, "scratch.db"), args.classifier_rows, args.repeat)
+            bench_correlations(results, size, rows, path, args.repeat)
+            bench_sbimport(results, size, path, args.repeat)
+            if app is None:
+                app = load_app_definitions()
+            bench_app_paths(results, size, rows, app, args.repeat)
+            if not args.skip_app:
+                bench_app_tabs(results, size, rows)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'versions': {'pandas': pd.__version__, 'numpy': np.__version__, 'streamlit': st.__version__,
+                     'sqlite': sqlite3.sqlite_version},
+        'repeat': args.repeat,
+        'classifier_rows': args.classifier_rows,
+        'results': results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+import os
+import sys
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+
+# Run as python -m benchmarks.synthetic from the repo root, or as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_manager as db
+from sb_classifier import clean_sb_name
+
+# Generates realistic synthetic JellyFin databases for benchmarking, e.g.
+# python -m benchmarks.synthetic /tmp/jf_100k.db --rows 100000
+
+# --- Configuration ---
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+START_DATE = '2015-04-01'
+HISTORY_DAYS = 365 * 10
+
+BANKS = [
+    ('HDFC', '50100012345678', 'HDFC0000123'),
+    ('ICICI', '001201509876', 'ICIC0000012'),
+    ('SBI', '30012345678', 'SBIN0001234'),
+]
+
+# (CategoryName, CategoryDesc, BudgetName, direction, relative weight, typical amount)
+CATEGORIES = [
+    ('Salary', 'Monthly pay', 'Earn', 'in', 1, 150000),
+    ('Interest', 'SB interest', 'Earn', 'in', 1, 2500),
+    ('Dividend', None, 'Earn', 'in', 1, 4000),
+    ('Refund', None, None, 'in', 1, 800),
+    ('Groceries', 'Supermarket and kirana', 'Food 15000', 'out', 12, 1200),
+    ('Dining', 'Eating out', 'Food 15000', 'out', 10, 650),
+    ('Swiggy', 'Food delivery', 'Food 15000', 'out', 8, 450),
+    ('Fuel', None, 'Transport 6000', 'out', 5, 2500),
+    ('Cabs', 'Uber / Ola', 'Transport 6000', 'out', 6, 350),
+    ('Rent', None, 'Home 40000', 'out', 1, 35000),
+    ('Electricity', None, 'Utilities 5000', 'out', 1, 2200),
+    ('Mobile', None, 'Utilities 5000', 'out', 1, 599),
+    ('Internet', None, 'Utilities 5000', 'out', 1, 999),
+    ('Shopping', 'Online shopping', 'Shopping 10000', 'out', 8, 1800),
+    ('Medical', None, 'Health 5000', 'out', 2, 1500),
+    ('Insurance', None, 'Health 5000', 'out', 1, 12000),
+    ('Travel', None, 'Travel 20000', 'out', 2, 6000),
+    ('Entertainment', 'OTT and movies', 'Fun 3000', 'out', 3, 499),
+    ('Education', None, 'Education', 'out', 1, 8000),
+    ('Charity', None, None, 'out', 1, 1000),
+    ('SIP', 'Mutual fund SIP', 'Invest', 'out', 3, 10000),
+    ('Stocks', None, 'Invest', 'out', 1, 25000),
+    ('PPF', None, 'Invest', 'out', 1, 12500),
+    ('Misc', None, None, 'out', 4, 300),
+]
+
+# Merchants per category, used to build UPI-like narrations
+MERCHANTS = {
+    'Salary': ['ACME TECHNOLOGIES PVT LTD', 'GLOBEX INDIA PVT LTD'],
+    'Interest': ['INT PD'],
+    'Dividend': ['ITC LTD DIV', 'INFOSYS LTD DIV', 'HDFCBANK DIV'],
+    'Refund': ['AMAZON REFUND', 'FLIPKART REFUND', 'IRCTC REFUND'],
+    'Groceries': ['BIGBASKET', 'DMART', 'BLINKIT', 'ZEPTO', 'RELIANCE FRESH', 'NATURES BASKET'],
+    'Dining': ['CAFE COFFEE DAY', 'STARBUCKS', 'HALDIRAMS', 'BARBEQUE NATION', 'CHAAYOS'],
+    'Swiggy': ['SWIGGY', 'ZOMATO'],
+    'Fuel': ['INDIAN OIL', 'HP PETROL PUMP', 'BHARAT PETROLEUM'],
+    'Cabs': ['UBER INDIA', 'OLA CABS', 'RAPIDO'],
+    'Rent': ['RAJESH SHARMA RENT'],
+    'Electricity': ['BESCOM', 'TATA POWER'],
+    'Mobile': ['AIRTEL', 'JIO PREPAID'],
+    'Internet': ['ACT FIBERNET', 'AIRTEL XSTREAM'],
+    'Shopping': ['AMAZON', 'FLIPKART', 'MYNTRA', 'AJIO', 'NYKAA'],
+    'Medical': ['APOLLO PHARMACY', 'MEDPLUS', 'PRACTO'],
+    'Insurance': ['HDFC ERGO', 'LIC OF INDIA'],
+    'Travel': ['MAKEMYTRIP', 'IRCTC', 'INDIGO AIRLINES'],
+    'Entertainment': ['NETFLIX', 'BOOKMYSHOW', 'SPOTIFY', 'HOTSTAR'],
+    'Education': ['COURSERA', 'UDEMY', 'BYJUS'],
+    'Charity': ['GIVEINDIA', 'AKSHAYA PATRA'],
+    'SIP': ['BSE STAR MF', 'ZERODHA COIN', 'CAMS SIP'],
+    'Stocks': ['ZERODHA BROKING', 'GROWW INVEST'],
+    'PPF': ['PPF DEPOSIT'],
+    'Misc': ['PAYTM', 'PHONEPE WALLET', 'LOCAL STORE'],
+}
+
+NARRATION_TEMPLATES = {
+    'in': ['NEFT CR-{ref}-{merchant}', 'IMPS-{ref}-{merchant}', '{merchant} {ref}'],
+    'out': ['UPI-{merchant}-{vpa}@ok{bank}-{ref}-PAYMENT', 'UPI/{ref}/{merchant}/{vpa}@ybl', 'POS {ref} {merchant}',
+            'ACH D- {merchant}-{ref}'],
+}
+
+OWNERS = ['Self', 'Spouse', 'Parent']
+SCHEMES_PER_OWNER = 12
+
+# Extra tables the dashboard and the MF import script read
+EXTRA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS SBClassMeta (
+    Pattern TEXT,
+    TxType TEXT,
+    CategoryId INTEGER,
+    Frequency INTEGER DEFAULT 1,
+    PRIMARY KEY (Pattern, TxType, CategoryId)
+);
+CREATE TABLE IF NOT EXISTS Owner (
+    OwnerId INTEGER PRIMARY KEY,
+    OwnerName TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS MFTrans (
+    MFTransId INTEGER PRIMARY KEY,
+    OwnerId INTEGER NOT NULL,
+    ISIN TEXT NOT NULL,
+    Folio TEXT NOT NULL,
+    StartDate TEXT,
+    ClosedDate TEXT,
+    FOREIGN KEY (OwnerId) REFERENCES Owner (OwnerId)
+);
+CREATE TABLE IF NOT EXISTS MFQuarterly (
+    MFQuarterlyId INTEGER PRIMARY KEY,
+    MFTransId INTEGER NOT NULL,
+    TMonth INTEGER NOT NULL,
+    TYear INTEGER NOT NULL,
+    Units REAL,
+    TotCost REAL,
+    Nav REAL,
+    Value REAL,
+    XIRR REAL,
+    FOREIGN KEY (MFTransId) REFERENCES MFTrans (MFTransId)
+);
+CREATE VIEW IF NOT EXISTS vwSBRunningTotal AS
+SELECT SBId, DateT, SBName, AmtIn, AmtOut, BankId,
+       SUM(IFNULL(AmtIn, 0) - IFNULL(AmtOut, 0)) OVER (PARTITION BY BankId ORDER BY DateT, SBId) AS RunningTotal
+FROM SB;
+"""
+
+def parse_size(size):
+    """'10k' / '100k' / '1m' or a plain row count -> number of SB rows."""
+    key = str(size).strip().lower()
+    if key in SIZES:
+        return SIZES[key]
+    return int(key.replace('_', ''))
+
+def build_narrations(rng, cat_names, directions, refs):
+    """UPI/NEFT/POS style narrations: merchant + varying reference numbers and VPAs, one template per row."""
+    n = len(cat_names)
+    narrations = np.empty(n, dtype=object)
+    merchant_pick = rng.random(n)
+    template_pick = rng.random(n)
+    vpa_pick = rng.integers(1000, 99999, n)
+    banks = np.array(['axis', 'hdfcbank', 'icici', 'sbi'])[rng.integers(0, 4, n)]
+    for cat in np.unique(cat_names):
+        rows = np.flatnonzero(cat_names == cat)
+        merchants = np.array(MERCHANTS[cat], dtype=object)
+        templates = NARRATION_TEMPLATES[directions[rows[0]]]
+        m = merchants[(merchant_pick[rows] * len(merchants)).astype(int)]
+        t = (template_pick[rows] * len(templates)).astype(int)
+        narrations[rows] = [
+            templates[ti].format(merchant=mi, ref=ri, vpa=f"{mi.split()[0].lower()}{vi}", bank=bi)
+            for ti, mi, ri, vi, bi in zip(t, m, refs[rows], vpa_pick[rows], banks[rows])
+        ]
+    return narrations
+
+def generate_sb_rows(rng, n_rows, category_ids):
+    """Returns SB rows (BankId, DateT, SBName, AmtIn, AmtOut, CategoryId, Comment) sorted by date."""
+    weights = np.array([c[4] for c in CATEGORIES], dtype=float)
+    cat_idx = rng.choice(len(CATEGORIES), size=n_rows, p=weights / weights.sum())
+    cat_names = np.array([c[0] for c in CATEGORIES], dtype=object)[cat_idx]
+    directions = np.array([c[3] for c in CATEGORIES], dtype=object)[cat_idx]
+    typical = np.array([c[5] for c in CATEGORIES], dtype=float)[cat_idx]
+
+    # Log-normal spread around each category's typical amount, with a sprinkle of large outliers
+    amounts = np.round(typical * rng.lognormal(0.0, 0.45, n_rows), 2)
+    outliers = rng.random(n_rows) < 0.002
+    amounts[outliers] = np.round(amounts[outliers] * rng.uniform(8, 40, outliers.sum()), 2)
+    is_in = directions == 'in'
+
+    days = np.sort(rng.integers(0, HISTORY_DAYS, n_rows))
+    dates = (pd.Timestamp(START_DATE) + pd.to_timedelta(days, unit='D')).strftime('%Y-%m-%d').to_numpy(dtype=object)
+    bank_ids = rng.choice(np.arange(1, len(BANKS) + 1), size=n_rows, p=[0.6, 0.3, 0.1])
+    refs = rng.integers(10**11, 10**12, n_rows)
+    narrations = build_narrations(rng, cat_names, directions, refs)
+
+    # About 3% of rows are left uncategorised, as after a fresh import
+    cat_id = np.array(category_ids, dtype=object)[cat_idx]
+    cat_id[rng.random(n_rows) < 0.03] = None
+    comments = np.where(rng.random(n_rows) < 0.05, 'synthetic note', None)
+
+    amt_in = np.where(is_in, amounts, None)
+    amt_out = np.where(is_in, None, amounts)
+    return list(zip(bank_ids.tolist(), dates.tolist(), narrations.tolist(), amt_in.tolist(), amt_out.tolist(),
+                    cat_id.tolist(), comments.tolist()))
+
+def seed_class_meta(conn):
+    """Seeds SBClassMeta from the cleaned narration patterns, as migrate_and_compress would end up with."""
+    df = pd.read_sql_query("SELECT SBName, AmtIn, CategoryId FROM SB WHERE CategoryId IS NOT NULL", conn)
+    codes, uniques = pd.factorize(df['SBName'].str.replace(r'\d+', '', regex=True))
+    cleaned = np.array([clean_sb_name(u) for u in uniques], dtype=object)
+    meta = pd.DataFrame({
+        'Pattern': cleaned[codes],
+        'TxType': np.where(df['AmtIn'].fillna(0) > 0, 'Inflow', 'Outflow'),
+        'CategoryId': df['CategoryId'].astype(int),
+    })
+    meta = meta[meta['Pattern'] != ''].groupby(['Pattern', 'TxType', 'CategoryId']).size().reset_index(name='Frequency')
+    conn.executemany("INSERT INTO SBClassMeta (Pattern, TxType, CategoryId, Frequency) VALUES (?, ?, ?, ?)",
+                     meta.itertuples(index=False, name=None))
+    return len(meta)
+
+def seed_mutual_funds(conn, rng):
+    """Owners, their MF holdings (some closed) and one MFQuarterly snapshot per holding per quarter."""
+    conn.executemany("INSERT INTO Owner (OwnerId, OwnerName) VALUES (?, ?)", list(enumerate(OWNERS, start=1)))
+    holdings = []
+    for owner_id in range(1, len(OWNERS) + 1):
+        for s in range(SCHEMES_PER_OWNER):
+            isin = f"INF{rng.integers(100, 999)}K01{s:03d}"
+            folio = f"{rng.integers(10**7, 10**8)}/{owner_id}"
+            start_year = int(rng.integers(2015, 2022))
+            closed = f"{start_year + 3}-03-31" if rng.random() < 0.2 else None
+            holdings.append((owner_id, isin, folio, f"{start_year}-04-01", closed))
+    conn.executemany("INSERT INTO MFTrans (OwnerId, ISIN, Folio, StartDate, ClosedDate) VALUES (?, ?, ?, ?, ?)", holdings)
+
+    rows = []
+    for mf_trans_id, (_, _, _, start, closed) in enumerate(holdings, start=1):
+        start_year = int(start[:4])
+        end_year = int(closed[:4]) if closed else 2025
+        units, cost, nav = 0.0, 0.0, float(rng.uniform(10, 200))
+        for year in range(start_year, end_year + 1):
+            for month in (3, 6, 9, 12):
+                sip = float(rng.choice([5000, 10000, 25000])) * 3
+                units += sip / nav
+                cost += sip
+                nav *= float(rng.lognormal(0.025, 0.06))
+                value = units * nav
+                rows.append((mf_trans_id, month, year, round(units, 3), round(cost, 2), round(nav, 4),
+                             round(value, 2), round((value / cost - 1) * 100, 2)))
+    conn.executemany("""INSERT INTO MFQuarterly (MFTransId, TMonth, TYear, Units, TotCost, Nav, Value, XIRR)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+    return len(rows)
+
+def generate_database(path, n_rows, seed=42):
+    """
+    Writes a fresh synthetic JellyFin database with n_rows SB transactions to path
+    (replacing any existing file) and returns a dict of table row counts.
+    The schema is the production one; derived columns and the balance series are left
+    to the lazy migrations, exactly as for an existing user database.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    db.initialize_empty_db(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(EXTRA_SCHEMA)
+        conn.executemany("INSERT INTO Bank (BankName, AccNo, IFSC) VALUES (?, ?, ?)", BANKS)
+        conn.executemany("INSERT INTO Category (CategoryName, CategoryDesc, BudgetName) VALUES (?, ?, ?)",
+                         [c[:3] for c in CATEGORIES])
+        category_ids = [r[0] for r in conn.execute("SELECT CategoryId FROM Category ORDER BY CategoryId")]
+
+        # Stage in chunks so 1M rows never need the whole row list at once; chunks are date-sorted
+        # individually, so SB is filled from the stage in date order (SBId follows import history)
+        conn.execute("""CREATE TEMP TABLE SB_stage (BankId int, DateT TEXT, SBName TEXT, AmtIn REAL, AmtOut REAL,
+                                                    CategoryId int, Comment TEXT)""")
+        chunk = 200_000
+        for start in range(0, n_rows, chunk):
+            conn.executemany("INSERT INTO SB_stage VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             generate_sb_rows(rng, min(chunk, n_rows - start), category_ids))
+        conn.execute("""INSERT INTO SB (BankId, SBName, AmtIn, AmtOut, CategoryId, Comment, DateT)
+                        SELECT BankId, SBName, AmtIn, AmtOut, CategoryId, Comment, DateT FROM SB_stage
+                        ORDER BY DateT, rowid""")
+        conn.execute("DROP TABLE SB_stage")
+
+        counts = {'SB': n_rows, 'SBClassMeta': seed_class_meta(conn), 'MFQuarterly': seed_mutual_funds(conn, rng)}
+        conn.commit()
+        return counts
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic JellyFin SQLite database.")
+    parser.add_argument("db_path", help="Output database file (overwritten)")
+    parser.add_argument("--rows", default="10k", help="SB row count: 10k, 100k, 1m or a number")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+
+    args = parser.parse_args()
+    print(generate_database(args.db_path, parse_size(args.rows), args.seed))
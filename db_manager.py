@@ -1,13 +1,24 @@
 import os
 import glob
+import json
+import shutil
 import sqlite3
+import numpy as np
 import pandas as pd
+import perf
+from datetime import date, datetime
+
+# Monthly limit used for categories that have no Budget row yet
+DEFAULT_BUDGET = 500.0
 
 def get_db_path():
     """
     Returns path to SQLite database file.
+    JELLYFIN_DB_PATH overrides it (e.g. for a synthetic benchmark database).
     Checks the local workspace directory for 'Jel.db' first, then defaults to the user's Downloads directory.
     """
+    if os.environ.get("JELLYFIN_DB_PATH"):
+        return os.environ["JELLYFIN_DB_PATH"]
     dir_path = os.path.dirname(os.path.abspath(__file__))
     local_path = os.path.join(dir_path, "Jel.db")
     """ if os.path.exists(local_path):
@@ -54,10 +65,244 @@ def initialize_empty_db(db_path):
             CONSTRAINT FK_SB_ToCategory FOREIGN KEY (CategoryId) REFERENCES Category (CategoryId)
         )
         """)
+        create_budget_table(conn)
         conn.commit()
     finally:
         conn.close()
 
+def create_budget_table(conn):
+    """
+    Creates the Budget table if it does not exist yet and seeds a base budget for every
+    existing category. A NULL EffectiveMonth is the base budget; a 'YYYY-MM' value
+    overrides it from that month onwards. Returns True when the table was created by this call.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='Budget';")
+    if cursor.fetchone():
+        return False
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS "Budget" (
+        "BudgetId" INTEGER PRIMARY KEY AUTOINCREMENT,
+        "CategoryId" int NOT NULL,
+        "Amount" decimal(10, 2) NOT NULL,
+        "EffectiveMonth" varchar(7),
+        CONSTRAINT FK_Budget_ToCategory FOREIGN KEY (CategoryId) REFERENCES Category (CategoryId)
+    )
+    """)
+    cursor.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS IX_Budget_Category_Month
+    ON Budget (CategoryId, IFNULL(EffectiveMonth, ''))
+    """)
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='Category';")
+    if cursor.fetchone():
+        cursor.execute("SELECT CategoryId, BudgetName FROM Category")
+        seed = [(cat_id, parse_budget_amount(budget_name)) for cat_id, budget_name in cursor.fetchall()]
+        cursor.executemany("INSERT INTO Budget (CategoryId, Amount, EffectiveMonth) VALUES (?, ?, NULL)", seed)
+    return True
+
+def parse_budget_amount(budget_name):
+    """Extract a number from a BudgetName (e.g. "Rent 2000" -> 2000.0), else DEFAULT_BUDGET."""
+    if budget_name:
+        numbers = ''.join(c for c in str(budget_name) if c.isdigit() or c == '.')
+        try:
+            return float(numbers)
+        except ValueError:
+            pass
+    return DEFAULT_BUDGET
+
+@perf.timed("sqlite")
+def get_data_version():
+    """
+    Returns a token that changes whenever the database file is written to.
+    Used as the cache key for Streamlit cached loaders.
+    """
+    try:
+        st_info = os.stat(get_db_path())
+        return f"{st_info.st_mtime_ns}-{st_info.st_size}"
+    except OSError:
+        return "0"
+
+# --- Integer paise amounts ---
+# SB.AmtIn/AmtOut are decimal(10,2), which SQLite stores as REAL. AmtInPaise/AmtOutPaise hold
+# the same amounts as exact INTEGER paise and are what loaders and balance sums read. The REAL
+# columns stay in SB as the compatibility interface for every script that writes or reads them
+# directly; triggers keep the paise columns in step with any insert or amount update.
+def create_paise_columns(conn):
+    """
+    Adds SB.AmtInPaise/AmtOutPaise and their sync triggers if missing, and backfills the
+    paise columns whenever the triggers were absent (new columns, or SB rebuilt by
+    FixPkAutoIncrement). Returns True when anything was changed by this call.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(SB)")
+    existing = {row[1] for row in cursor.fetchall()}
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name IN ('trg_SB_Paise_Insert', 'trg_SB_Paise_Update')")
+    changed = cursor.fetchone()[0] < 2
+    for col in ['AmtInPaise', 'AmtOutPaise']:
+        if col not in existing:
+            cursor.execute(f'ALTER TABLE SB ADD COLUMN "{col}" INTEGER NOT NULL DEFAULT 0')
+            changed = True
+    if not changed:
+        return False
+    cursor.execute("""
+        UPDATE SB SET AmtInPaise = CAST(ROUND(IFNULL(AmtIn, 0) * 100) AS INTEGER),
+                      AmtOutPaise = CAST(ROUND(IFNULL(AmtOut, 0) * 100) AS INTEGER)
+    """)
+    sync_paise = """
+        UPDATE SB SET AmtInPaise = CAST(ROUND(IFNULL(NEW.AmtIn, 0) * 100) AS INTEGER),
+                      AmtOutPaise = CAST(ROUND(IFNULL(NEW.AmtOut, 0) * 100) AS INTEGER)
+        WHERE SBId = NEW.SBId;
+    """
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_SB_Paise_Insert AFTER INSERT ON SB BEGIN {sync_paise} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_SB_Paise_Update AFTER UPDATE OF AmtIn, AmtOut ON SB BEGIN {sync_paise} END")
+    return True
+
+# --- Normalized dates ---
+# SB.DateT holds ISO 'YYYY-MM-DD' text. DateDay (days since 1970-01-01) and YearMonth (YYYYMM)
+# are indexed integer keys derived from it by triggers, so range filters, month bucketing and
+# balance lookups compare integers and loaders never parse date strings.
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%d/%m/%y', '%d/%m/%Y', '%d-%m-%Y', '%d-%b-%Y', '%d %b %Y']
+EPOCH = date(1970, 1, 1)
+# Lower bound used when a balance recompute has no start day
+MIN_DAY = -(2 ** 31)
+
+def normalize_date(value):
+    """Returns a date/datetime or a date string in one of DATE_FORMATS as 'YYYY-MM-DD', else None."""
+    if isinstance(value, (datetime, date)):
+        return None if pd.isna(value) else value.strftime('%Y-%m-%d')
+    if value is None or pd.isna(value):
+        return None
+    text = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+def date_day(value):
+    """Day number (days since 1970-01-01) of a date value, or None if it is not a date."""
+    iso = normalize_date(value)
+    return (date.fromisoformat(iso) - EPOCH).days if iso else None
+
+def create_date_key_columns(conn):
+    """
+    Normalizes SB.DateT to ISO text and adds the indexed DateDay/YearMonth keys with their sync
+    triggers if missing (also after FixPkAutoIncrement rebuilt SB and dropped the triggers).
+    Rows whose date cannot be recognised keep their text and get NULL keys.
+    Returns True when anything was changed by this call.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(SB)")
+    existing = {row[1] for row in cursor.fetchall()}
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name IN ('trg_SB_DateKey_Insert', 'trg_SB_DateKey_Update')")
+    changed = cursor.fetchone()[0] < 2
+    for col in ['DateDay', 'YearMonth']:
+        if col not in existing:
+            cursor.execute(f'ALTER TABLE SB ADD COLUMN "{col}" INTEGER')
+            changed = True
+    if not changed:
+        return False
+
+    cursor.execute("SELECT SBId, DateT FROM SB WHERE DateT IS NOT NULL AND DateT NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'")
+    fixes = [(normalize_date(date_t), sb_id, date_t) for sb_id, date_t in cursor.fetchall()]
+    cursor.executemany("UPDATE SB SET DateT = ? WHERE SBId = ?", [(iso, sb_id) for iso, sb_id, _ in fixes if iso])
+    invalid = [date_t for iso, _, date_t in fixes if not iso]
+    if invalid:
+        print(f"Warning: {len(invalid)} SB rows have unrecognised dates (e.g. {invalid[0]!r}) and no day key")
+
+    sync_keys = """
+        UPDATE SB SET DateDay = CAST(julianday(NEW.DateT) - 2440587.5 AS INTEGER),
+                      YearMonth = CAST(strftime('%Y%m', NEW.DateT) AS INTEGER)
+        WHERE SBId = NEW.SBId;
+    """
+    cursor.execute("""
+        UPDATE SB SET DateDay = CAST(julianday(DateT) - 2440587.5 AS INTEGER),
+                      YearMonth = CAST(strftime('%Y%m', DateT) AS INTEGER)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS IX_SB_DateDay ON SB (DateDay)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS IX_SB_Bank_Day ON SB (BankId, DateDay)")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_SB_DateKey_Insert AFTER INSERT ON SB BEGIN {sync_keys} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_SB_DateKey_Update AFTER UPDATE OF DateT ON SB BEGIN {sync_keys} END")
+    return True
+
+# --- Daily balance series ---
+# SBDailyBalance keeps one row per (BankId, DateDay) with that day's net change and closing
+# balance; BankId 0 holds the all-banks total. Every SB writer calls refresh_daily_balance()
+# with the earliest date it touched so only the suffix from that day is recomputed.
+OVERALL_BANK_ID = 0
+
+def create_daily_balance_table(conn):
+    """
+    Creates and fully builds SBDailyBalance if it does not exist yet, replacing the earlier
+    layout keyed on DateT text. Returns True when the table was (re)built by this call.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(SBDailyBalance)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if 'DateDay' in columns:
+        return False
+    if columns:
+        cursor.execute("DROP TABLE SBDailyBalance")
+    create_paise_columns(conn)
+    create_date_key_columns(conn)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS "SBDailyBalance" (
+        "BankId" int NOT NULL,
+        "DateDay" int NOT NULL,
+        "NetChange" decimal(12, 2) NOT NULL,
+        "Balance" decimal(12, 2) NOT NULL,
+        PRIMARY KEY (BankId, DateDay)
+    ) WITHOUT ROWID
+    """)
+    # Sums run over integer paise so balances are exact; only the stored result is REAL
+    cursor.execute("""
+        INSERT INTO SBDailyBalance (BankId, DateDay, NetChange, Balance)
+        SELECT BankId, DateDay, NetPaise / 100.0, SUM(NetPaise) OVER (PARTITION BY BankId ORDER BY DateDay) / 100.0
+        FROM (
+            SELECT BankId, DateDay, SUM(AmtInPaise - AmtOutPaise) AS NetPaise
+            FROM SB WHERE DateDay IS NOT NULL GROUP BY BankId, DateDay
+        )
+    """)
+    recompute_balance_suffix(conn, OVERALL_BANK_ID, None)
+    return True
+
+def recompute_balance_suffix(conn, bank_id, from_date):
+    """Rebuilds SBDailyBalance rows for one bank (or OVERALL_BANK_ID) on or after from_date."""
+    from_day = date_day(from_date)
+    from_day = MIN_DAY if from_day is None else from_day
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM SBDailyBalance WHERE BankId = ? AND DateDay >= ?", (bank_id, from_day))
+    cursor.execute(
+        "SELECT Balance FROM SBDailyBalance WHERE BankId = ? AND DateDay < ? ORDER BY DateDay DESC LIMIT 1",
+        (bank_id, from_day)
+    )
+    row = cursor.fetchone()
+    opening_paise = round(float(row[0]) * 100) if row else 0
+
+    bank_filter = "" if bank_id == OVERALL_BANK_ID else "AND BankId = ?"
+    params = (bank_id, opening_paise, from_day) + (() if bank_id == OVERALL_BANK_ID else (bank_id,))
+    cursor.execute(f"""
+        INSERT INTO SBDailyBalance (BankId, DateDay, NetChange, Balance)
+        SELECT ?, DateDay, NetPaise / 100.0, (? + SUM(NetPaise) OVER (ORDER BY DateDay)) / 100.0
+        FROM (
+            SELECT DateDay, SUM(AmtInPaise - AmtOutPaise) AS NetPaise
+            FROM SB WHERE DateDay >= ? {bank_filter} GROUP BY DateDay
+        )
+    """, params)
+
+def refresh_daily_balance(conn, bank_id, from_date):
+    """
+    Brings SBDailyBalance up to date after SB rows for bank_id changed on or after from_date.
+    Runs inside the caller's transaction; the caller commits.
+    """
+    if create_daily_balance_table(conn):
+        return
+    create_paise_columns(conn)
+    create_date_key_columns(conn)
+    recompute_balance_suffix(conn, bank_id, from_date)
+    recompute_balance_suffix(conn, OVERALL_BANK_ID, from_date)
+
 def get_connection():
     db_path = get_db_path()
     # Check if the database needs initialization
@@ -82,6 +327,7 @@ def get_connection():
     conn.execute("PRAGMA foreign_keys = ON;")
     return conn
 
+@perf.timed("sqlite")
 def check_db_setup():
     """
     Checks if the required tables (SB, Category, Bank) exist in the database.
@@ -112,40 +358,70 @@ def check_db_setup():
         
     return status
 
-def get_all_transactions():
+# Low-cardinality columns repeated on every ledger row, held as categoricals in memory
+TRANSACTION_DIMENSIONS = ['BankName', 'AccNo', 'CategoryName', 'CategoryDesc', 'BudgetName']
+
+def compact_transactions(df):
     """
-    Fetch all transactions joined with Category and Bank details.
+    Converts the joined ledger frame to lean dtypes in place: categorical dimension columns,
+    int32 IDs and day keys (nullable when empty), int64 paise amounts with float64 rupee
+    columns derived from them, and a datetime64 DateT derived from DateDay.
     """
-    query = """
+    df['SBId'] = df['SBId'].astype('int32')
+    for col in ['BankId', 'CategoryId', 'DateDay', 'YearMonth']:
+        df[col] = df[col].astype('Int32' if df[col].isna().any() else 'int32')
+    for col in ['AmtIn', 'AmtOut']:
+        df[col + 'Paise'] = df[col + 'Paise'].fillna(0).astype('int64')
+        df[col] = df[col + 'Paise'] / 100.0
+    for col in TRANSACTION_DIMENSIONS:
+        df[col] = df[col].astype('category')
+    # Day numbers convert to datetime64 arithmetically; no date strings are parsed
+    df['DateT'] = pd.to_datetime(df['DateDay'].astype('float64'), unit='D')
+    return df
+
+# SB joined with its Bank and Category; shared by the ledger loader and the snapshot writer
+LEDGER_SELECT = """
         SELECT 
             s.SBId,
             s.BankId,
             b.BankName,
             b.AccNo,
             s.SBName,
-            s.AmtIn,
-            s.AmtOut,
+            s.AmtInPaise,
+            s.AmtOutPaise,
             s.CategoryId,
             c.CategoryName,
             c.CategoryDesc,
             c.BudgetName,
             s.Comment,
-            s.DateT
+            s.DateDay,
+            s.YearMonth
         FROM SB s
         LEFT JOIN Bank b ON s.BankId = b.BankId
         LEFT JOIN Category c ON s.CategoryId = c.CategoryId
-        ORDER BY s.DateT DESC, s.SBId DESC
+"""
+
+@perf.timed("sqlite")
+def get_all_transactions(use_snapshot=False):
+    """
+    Fetch all transactions joined with Category and Bank details as a compact frame
+    (see compact_transactions). With use_snapshot, the columnar ledger snapshot is brought
+    up to date and memory-mapped instead; any snapshot failure falls back to SQLite.
     """
+    if use_snapshot and refresh_ledger_snapshot() is not False:
+        df = load_ledger_snapshot()
+        if df is not None:
+            return df
+    query = LEDGER_SELECT + " ORDER BY s.DateDay DESC, s.SBId DESC"
     conn = get_connection()
     try:
-        df = pd.read_sql_query(query, conn)
-        # Parse dates and handle numeric formatting
-        if not df.empty and 'DateT' in df.columns:
-            df['DateT'] = pd.to_datetime(df['DateT'], errors='coerce')
-        return df
+        if create_paise_columns(conn) | create_date_key_columns(conn):
+            conn.commit()
+        return compact_transactions(pd.read_sql_query(query, conn))
     finally:
         conn.close()
 
+@perf.timed("sqlite")
 def get_categories():
     query = "SELECT CategoryId, CategoryName, CategoryDesc, BudgetName FROM Category ORDER BY CategoryName ASC"
     conn = get_connection()
@@ -154,6 +430,42 @@ def get_categories():
     finally:
         conn.close()
 
+@perf.timed("sqlite")
+def get_budgets(as_of_month=None):
+    """
+    Returns the monthly budget in force for every category as of the given 'YYYY-MM'
+    month (latest month when omitted). Categories without a Budget row get DEFAULT_BUDGET.
+    """
+    query = """
+        SELECT
+            c.CategoryId,
+            c.CategoryName,
+            c.CategoryDesc,
+            c.BudgetName,
+            COALESCE(b.Amount, ?) AS Budget,
+            b.EffectiveMonth
+        FROM Category c
+        LEFT JOIN Budget b ON b.BudgetId = (
+            SELECT b2.BudgetId
+            FROM Budget b2
+            WHERE b2.CategoryId = c.CategoryId
+              AND (b2.EffectiveMonth IS NULL OR b2.EffectiveMonth <= ?)
+            ORDER BY IFNULL(b2.EffectiveMonth, '') DESC
+            LIMIT 1
+        )
+        ORDER BY c.CategoryName ASC
+    """
+    conn = get_connection()
+    try:
+        if create_budget_table(conn):
+            conn.commit()
+        df = pd.read_sql_query(query, conn, params=(DEFAULT_BUDGET, as_of_month or '9999-12'))
+        df['Budget'] = df['Budget'].astype(float)
+        return df
+    finally:
+        conn.close()
+
+@perf.timed("sqlite")
 def get_banks():
     query = "SELECT BankId, BankName, AccNo, IFSC FROM Bank ORDER BY BankName ASC"
     conn = get_connection()
@@ -163,7 +475,12 @@ def get_banks():
         conn.close()
 
 # C.U.D. Operations for Transactions (SB)
+@perf.timed("sqlite")
 def add_transaction(bank_id, sb_name, amt_in, amt_out, category_id, comment, date_t):
+    iso_date = normalize_date(date_t)
+    if iso_date is None:
+        raise ValueError(f"Unrecognised transaction date: {date_t!r}")
+    date_t = iso_date
     conn = get_connection()
     cursor = conn.cursor()
     try:
@@ -174,14 +491,21 @@ def add_transaction(bank_id, sb_name, amt_in, amt_out, category_id, comment, dat
             """,
             (bank_id, sb_name, amt_in, amt_out, category_id, comment, date_t)
         )
+        refresh_daily_balance(conn, bank_id, date_t)
         conn.commit()
         return cursor.lastrowid
     finally:
         conn.close()
 
+@perf.timed("sqlite")
 def update_transaction(sb_id, bank_id, sb_name, amt_in, amt_out, category_id, comment, date_t):
     conn = get_connection()
     try:
+        iso_date = normalize_date(date_t)
+        if iso_date is None:
+            raise ValueError(f"Unrecognised transaction date: {date_t!r}")
+        date_t = iso_date
+        old = conn.execute("SELECT BankId, DateT FROM SB WHERE SBId = ?", (sb_id,)).fetchone()
         conn.execute(
             """
             UPDATE SB 
@@ -190,6 +514,11 @@ def update_transaction(sb_id, bank_id, sb_name, amt_in, amt_out, category_id, co
             """,
             (bank_id, sb_name, amt_in, amt_out, category_id, comment, date_t, sb_id)
         )
+        # A back-dated edit only needs the balance suffix from the earliest touched date
+        touched_dates = [d for d in (date_t, old[1] if old else None) if d]
+        if old and old[0] != bank_id:
+            refresh_daily_balance(conn, old[0], old[1])
+        refresh_daily_balance(conn, bank_id, min(touched_dates) if touched_dates else None)
         conn.commit()
         return True
     except Exception as e:
@@ -198,10 +527,14 @@ def update_transaction(sb_id, bank_id, sb_name, amt_in, amt_out, category_id, co
     finally:
         conn.close()
 
+@perf.timed("sqlite")
 def delete_transaction(sb_id):
     conn = get_connection()
     try:
+        old = conn.execute("SELECT BankId, DateT FROM SB WHERE SBId = ?", (sb_id,)).fetchone()
         conn.execute("DELETE FROM SB WHERE SBId = ?", (sb_id,))
+        if old:
+            refresh_daily_balance(conn, old[0], old[1])
         conn.commit()
         return True
     except Exception as e:
@@ -211,6 +544,7 @@ def delete_transaction(sb_id):
         conn.close()
 
 # C.U.D. Operations for Category
+@perf.timed("sqlite")
 def add_category(category_name, category_desc, budget_name):
     conn = get_connection()
     cursor = conn.cursor()
@@ -222,11 +556,18 @@ def add_category(category_name, category_desc, budget_name):
             """,
             (category_name, category_desc, budget_name)
         )
+        category_id = cursor.lastrowid
+        create_budget_table(conn)
+        cursor.execute(
+            "INSERT OR IGNORE INTO Budget (CategoryId, Amount, EffectiveMonth) VALUES (?, ?, NULL)",
+            (category_id, parse_budget_amount(budget_name))
+        )
         conn.commit()
-        return cursor.lastrowid
+        return category_id
     finally:
         conn.close()
 
+@perf.timed("sqlite")
 def update_category(category_id, category_name, category_desc, budget_name):
     conn = get_connection()
     try:
@@ -246,7 +587,35 @@ def update_category(category_id, category_name, category_desc, budget_name):
     finally:
         conn.close()
 
+# C.U.D. Operations for Budget
+@perf.timed("sqlite")
+def set_budgets(budgets, effective_month=None):
+    """
+    Upserts monthly budgets. `budgets` is an iterable of (category_id, amount) pairs;
+    effective_month is 'YYYY-MM' or None for the base budget.
+    """
+    conn = get_connection()
+    try:
+        create_budget_table(conn)
+        conn.executemany(
+            """
+            INSERT INTO Budget (CategoryId, Amount, EffectiveMonth)
+            VALUES (?, ?, ?)
+            ON CONFLICT (CategoryId, IFNULL(EffectiveMonth, ''))
+            DO UPDATE SET Amount = excluded.Amount
+            """,
+            [(int(cat_id), float(amount), effective_month) for cat_id, amount in budgets]
+        )
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error saving budgets: {e}")
+        return False
+    finally:
+        conn.close()
+
 # C.U.D. Operations for Bank
+@perf.timed("sqlite")
 def add_bank(bank_name, acc_no, ifsc):
     conn = get_connection()
     cursor = conn.cursor()
@@ -263,6 +632,7 @@ def add_bank(bank_name, acc_no, ifsc):
     finally:
         conn.close()
 
+@perf.timed("sqlite")
 def update_bank(bank_id, bank_name, acc_no, ifsc):
     conn = get_connection()
     try:
@@ -282,23 +652,28 @@ def update_bank(bank_id, bank_name, acc_no, ifsc):
     finally:
         conn.close()
 
+@perf.timed("sqlite")
 def get_closing_balance(bank_id, end_date):
     """
-    Retrieve the closing balance for a specific bank account as of the given end_date.
-    The view `vwSBRunningTotal` is expected to have columns: BankId, DateT, RunningTotal.
-    This function returns the RunningTotal of the latest record on or before end_date.
-    If no record is found, returns 0.0.
+    Retrieve the closing balance for a specific bank account (or OVERALL_BANK_ID for all
+    accounts) as of the given end_date, from the SBDailyBalance series.
+    Returns the Balance of the latest day on or before end_date, or 0.0 if there is none.
     """
     conn = get_connection()
     try:
+        if create_daily_balance_table(conn):
+            conn.commit()
+        end_day = date_day(end_date)
+        if end_day is None:
+            return 0.0
         query = """
-            SELECT RunningTotal
-            FROM vwSBRunningTotal
-            WHERE BankId = ? AND DateT <= ?
-            ORDER BY DateT DESC
+            SELECT Balance
+            FROM SBDailyBalance
+            WHERE BankId = ? AND DateDay <= ?
+            ORDER BY DateDay DESC
             LIMIT 1
         """
-        cur = conn.execute(query, (bank_id, end_date))
+        cur = conn.execute(query, (bank_id, end_day))
         row = cur.fetchone()
         if row:
             return float(row[0])
@@ -309,3 +684,379 @@ def get_closing_balance(bank_id, end_date):
         return 0.0
     finally:
         conn.close()
+
+@perf.timed("sqlite")
+def get_daily_balances(bank_id=OVERALL_BANK_ID):
+    """
+    Returns the persisted daily closing-balance series (DateT, NetChange, Balance) for one
+    bank, or for all accounts combined when bank_id is OVERALL_BANK_ID.
+    """
+    conn = get_connection()
+    try:
+        if create_daily_balance_table(conn):
+            conn.commit()
+        df = pd.read_sql_query(
+            "SELECT DateDay AS DateT, NetChange, Balance FROM SBDailyBalance WHERE BankId = ? ORDER BY DateDay",
+            conn, params=(bank_id,)
+        )
+        df['DateT'] = pd.to_datetime(df['DateT'], unit='D')
+        return df
+    finally:
+        conn.close()
+
+# --- Columnar ledger snapshot ---
+# A Parquet copy of LEDGER_SELECT, partitioned by year (Year=YYYY/part-<first SBId>.parquet),
+# so analytics can memory-map the ledger instead of decoding SQLite rows one by one.
+# New SB rows (SBId above the manifest's MaxSBId) are appended as extra part files; any other
+# change to already-exported rows or to Bank/Category triggers a full rebuild. Edits and deletes
+# of SB rows are counted by triggers in SBChangeCount, so the check does not scan SB content.
+SNAPSHOT_FORMAT_VERSION = 4
+# SB columns whose edits change LEDGER_SELECT output (the derived key columns follow them)
+SB_TRACKED_COLUMNS = ['SBId', 'BankId', 'SBName', 'AmtIn', 'AmtOut', 'CategoryId', 'Comment', 'DateT']
+SNAPSHOT_MANIFEST = "_manifest.json"
+
+def get_snapshot_dir():
+    """Snapshot directory, stored next to the database file."""
+    db_path = get_db_path()
+    return os.path.join(os.path.dirname(db_path), os.path.splitext(os.path.basename(db_path))[0] + "_snapshot")
+
+def snapshot_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('SBId', pa.int32()), ('BankId', pa.int32()), ('BankName', pa.string()), ('AccNo', pa.string()),
+        ('SBName', pa.string()), ('AmtInPaise', pa.int64()), ('AmtOutPaise', pa.int64()),
+        ('CategoryId', pa.int32()), ('CategoryName', pa.string()), ('CategoryDesc', pa.string()),
+        ('BudgetName', pa.string()), ('Comment', pa.string()),
+        ('DateDay', pa.int32()), ('YearMonth', pa.int32())
+    ])
+
+def create_sb_change_count(conn):
+    """
+    Creates the single-row SBChangeCount table and the triggers that increment it on every
+    update of SB_TRACKED_COLUMNS and every delete, if missing. When the triggers were absent
+    the count is bumped once, since edits made meanwhile went uncounted.
+    Returns True when anything was changed by this call.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name IN ('trg_SB_Change_Update', 'trg_SB_Change_Delete')")
+    if cursor.fetchone()[0] == 2:
+        return False
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS SBChangeCount (
+            Id INTEGER PRIMARY KEY CHECK (Id = 1),
+            Changes INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO SBChangeCount (Id, Changes) VALUES (1, 0)")
+    cursor.execute("UPDATE SBChangeCount SET Changes = Changes + 1")
+    bump = "UPDATE SBChangeCount SET Changes = Changes + 1;"
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_SB_Change_Update AFTER UPDATE OF {', '.join(SB_TRACKED_COLUMNS)} ON SB BEGIN {bump} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_SB_Change_Delete AFTER DELETE ON SB BEGIN {bump} END")
+    return True
+
+def ledger_fingerprint(conn, max_sb_id):
+    """
+    Content signature of SB rows up to max_sb_id plus the Bank and Category tables: the row
+    count (which catches rows inserted below max_sb_id), the SBChangeCount edit counter and the
+    full Bank/Category rows. An unchanged fingerprint means those rows can be kept as-is.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*), (SELECT Changes FROM SBChangeCount) FROM SB WHERE SBId <= ?", (max_sb_id,))
+    sb_sig = list(cursor.fetchone())
+    cursor.execute("SELECT CategoryId, CategoryName, CategoryDesc, BudgetName FROM Category ORDER BY CategoryId")
+    cat_sig = cursor.fetchall()
+    cursor.execute("SELECT BankId, BankName, AccNo FROM Bank ORDER BY BankId")
+    bank_sig = cursor.fetchall()
+    return json.loads(json.dumps([sb_sig, cat_sig, bank_sig], default=str))
+
+def write_snapshot_parts(conn, snapshot_dir, after_sb_id):
+    """Writes SB rows with SBId > after_sb_id as one Parquet part per year. Returns (rows, max SBId)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    df = pd.read_sql_query(LEDGER_SELECT + " WHERE s.SBId > ? ORDER BY s.SBId", conn, params=(after_sb_id,))
+    if df.empty:
+        return 0, after_sb_id
+    for col in ['BankName', 'AccNo', 'SBName', 'CategoryName', 'CategoryDesc', 'BudgetName', 'Comment']:
+        df[col] = df[col].astype('string')
+    years = (df['YearMonth'] // 100).fillna(0).astype(int)
+    schema = snapshot_schema()
+    for year, part in df.groupby(years):
+        part_dir = os.path.join(snapshot_dir, f"Year={year}")
+        os.makedirs(part_dir, exist_ok=True)
+        table = pa.Table.from_pandas(part, schema=schema, preserve_index=False)
+        pq.write_table(table, os.path.join(part_dir, f"part-{int(part['SBId'].iloc[0]):010d}.parquet"))
+    return len(df), int(df['SBId'].max())
+
+def read_snapshot_manifest(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST)) as f:
+            manifest = json.load(f)
+        return manifest if manifest.get("FormatVersion") == SNAPSHOT_FORMAT_VERSION else None
+    except (OSError, ValueError):
+        return None
+
+@perf.timed("snapshot")
+def refresh_ledger_snapshot(snapshot_dir=None, full=False):
+    """
+    Brings the Parquet ledger snapshot up to date with the database. Appends only new SB rows
+    when everything already exported is unchanged, otherwise (or with full=True) rebuilds it
+    in a temporary directory and swaps it in. Returns the number of rows written, or False on error.
+    """
+    snapshot_dir = snapshot_dir or get_snapshot_dir()
+    conn = get_connection()
+    try:
+        if create_paise_columns(conn) | create_date_key_columns(conn) | create_sb_change_count(conn):
+            conn.commit()
+        manifest = None if full else read_snapshot_manifest(snapshot_dir)
+        if manifest is not None and ledger_fingerprint(conn, manifest["MaxSBId"]) == manifest["Fingerprint"]:
+            rows, max_sb_id = write_snapshot_parts(conn, snapshot_dir, manifest["MaxSBId"])
+            if rows == 0:
+                return 0
+            target_dir = snapshot_dir
+        else:
+            target_dir = snapshot_dir + ".tmp"
+            shutil.rmtree(target_dir, ignore_errors=True)
+            os.makedirs(target_dir)
+            rows, max_sb_id = write_snapshot_parts(conn, target_dir, 0)
+
+        manifest = {
+            "FormatVersion": SNAPSHOT_FORMAT_VERSION,
+            "MaxSBId": max_sb_id,
+            "Fingerprint": ledger_fingerprint(conn, max_sb_id),
+        }
+        with open(os.path.join(target_dir, SNAPSHOT_MANIFEST), "w") as f:
+            json.dump(manifest, f)
+        if target_dir != snapshot_dir:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            os.replace(target_dir, snapshot_dir)
+        return rows
+    except Exception as e:
+        print(f"Error refreshing ledger snapshot: {e}")
+        return False
+    finally:
+        conn.close()
+
+@perf.timed("snapshot")
+def load_ledger_snapshot(snapshot_dir=None, years=None):
+    """
+    Memory-maps the Parquet ledger snapshot (optionally only the given years) and returns it in
+    get_all_transactions order and dtypes. Returns None if there is no readable snapshot.
+    """
+    snapshot_dir = snapshot_dir or get_snapshot_dir()
+    if read_snapshot_manifest(snapshot_dir) is None:
+        return None
+    try:
+        import pyarrow.parquet as pq
+        filters = [('Year', 'in', list(years))] if years else None
+        table = pq.read_table(snapshot_dir, filters=filters, memory_map=True, partitioning='hive')
+        df = table.drop_columns(['Year']).to_pandas()
+    except Exception as e:
+        print(f"Error loading ledger snapshot: {e}")
+        return None
+    df = df.sort_values(['DateDay', 'SBId'], ascending=False, na_position='last', ignore_index=True)
+    return compact_transactions(df)
+
+# --- Mutual fund quarterly snapshots ---
+# MFQuarterly holds one row per holding (MFTransId) per period (TYear, TMonth). The unique
+# index makes re-importing a period an update instead of a duplicate, and the (TYear, TMonth)
+# index answers the period listing from the index alone.
+MF_QUARTERLY_VALUE_COLUMNS = ['Units', 'TotCost', 'Nav', 'Value', 'XIRR']
+MF_QUARTERLY_COLUMNS = ['MFTransId', 'TMonth', 'TYear'] + MF_QUARTERLY_VALUE_COLUMNS
+
+def get_mf_quarterly_duplicates(conn):
+    """(MFTransId, TYear, TMonth) keys stored more than once in MFQuarterly, with their row count."""
+    return pd.read_sql_query("""
+        SELECT MFTransId, TYear, TMonth, COUNT(*) AS Rows
+        FROM MFQuarterly
+        GROUP BY MFTransId, TYear, TMonth
+        HAVING COUNT(*) > 1
+        ORDER BY TYear, TMonth, MFTransId
+    """, conn)
+
+def has_mf_quarterly_unique_index(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name = 'UX_MFQuarterly_Trans_Period'").fetchone() is not None
+
+def create_mf_quarterly_indexes(conn):
+    """
+    Creates UX_MFQuarterly_Trans_Period (unique) and IX_MFQuarterly_Period if missing. Rows are
+    never deleted here: while a (MFTransId, TYear, TMonth) key is duplicated the unique index is
+    left out (see get_mf_quarterly_duplicates; migrate.py removes them after a backup).
+    Returns True when anything was changed by this call.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name IN ('UX_MFQuarterly_Trans_Period', 'IX_MFQuarterly_Period')")
+    existing = {row[0] for row in cursor.fetchall()}
+    changed = False
+    if 'IX_MFQuarterly_Period' not in existing:
+        cursor.execute("CREATE INDEX IX_MFQuarterly_Period ON MFQuarterly (TYear, TMonth)")
+        changed = True
+    if 'UX_MFQuarterly_Trans_Period' not in existing and get_mf_quarterly_duplicates(conn).empty:
+        cursor.execute("CREATE UNIQUE INDEX UX_MFQuarterly_Trans_Period ON MFQuarterly (MFTransId, TYear, TMonth)")
+        changed = True
+    return changed
+
+def create_active_holdings_index(conn):
+    """
+    Creates IX_MFTrans_Active, a partial index over the active holdings (ClosedDate IS NULL) by
+    (OwnerId, ISIN, Folio), if missing. MFTransId is the rowid, so the index alone answers the
+    per-owner holdings lookup. Returns True when the index was created by this call.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name = 'IX_MFTrans_Active'")
+    if cursor.fetchone():
+        return False
+    cursor.execute("CREATE INDEX IX_MFTrans_Active ON MFTrans (OwnerId, ISIN, Folio) WHERE ClosedDate IS NULL")
+    return True
+
+def get_latest_mf_periods(conn, limit=3):
+    """Most recent imported (TMonth, TYear) periods, newest first; walks IX_MFQuarterly_Period backwards."""
+    query = """
+        SELECT DISTINCT TMonth, TYear
+        FROM MFQuarterly
+        ORDER BY TYear DESC, TMonth DESC
+        LIMIT ?
+    """
+    return pd.read_sql_query(query, conn, params=(limit,))
+
+def stage_mf_quarterly(conn, rows):
+    """Loads rows (MF_QUARTERLY_COLUMNS order) into the connection's temp MFQuarterlyImport table."""
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS temp.MFQuarterlyImport")
+    cursor.execute("""
+        CREATE TEMP TABLE MFQuarterlyImport (
+            MFTransId INTEGER, TMonth INTEGER, TYear INTEGER,
+            Units REAL, TotCost REAL, Nav REAL, Value REAL, XIRR REAL
+        )
+    """)
+    cursor.executemany(
+        f"INSERT INTO temp.MFQuarterlyImport VALUES ({', '.join('?' * len(MF_QUARTERLY_COLUMNS))})", rows
+    )
+
+@perf.timed("sqlite")
+def diff_mf_quarterly(conn, rows):
+    """
+    Compares rows to import with what MFQuarterly already holds for the same holding and period,
+    in one join. Returns the rows with their stored values (Old<Col>) and a Status of
+    'New', 'Changed' or 'Unchanged'.
+    """
+    create_mf_quarterly_indexes(conn)
+    stage_mf_quarterly(conn, rows)
+    same = " AND ".join(f"q.{c} IS i.{c}" for c in MF_QUARTERLY_VALUE_COLUMNS)
+    query = f"""
+        SELECT {', '.join('i.' + c for c in MF_QUARTERLY_COLUMNS)},
+               {', '.join(f'q.{c} AS Old{c}' for c in MF_QUARTERLY_VALUE_COLUMNS)},
+               CASE WHEN q.MFTransId IS NULL THEN 'New'
+                    WHEN {same} THEN 'Unchanged'
+                    ELSE 'Changed' END AS Status
+        FROM temp.MFQuarterlyImport i
+        LEFT JOIN MFQuarterly q
+          ON q.MFTransId = i.MFTransId AND q.TYear = i.TYear AND q.TMonth = i.TMonth
+    """
+    return pd.read_sql_query(query, conn)
+
+@perf.timed("sqlite")
+def upsert_mf_quarterly(conn, rows):
+    """
+    Inserts rows into MFQuarterly, updating the stored values of a holding's period when it is
+    already there; rows whose values are unchanged are not rewritten. Runs inside the caller's
+    transaction; the caller commits. Returns the number of rows inserted or updated.
+    """
+    create_mf_quarterly_indexes(conn)
+    if not has_mf_quarterly_unique_index(conn):
+        raise ValueError("MFQuarterly has duplicate (MFTransId, TYear, TMonth) rows; run migrate.py to remove them")
+    stage_mf_quarterly(conn, rows)
+    changes_before = conn.total_changes
+    conn.execute(f"""
+        INSERT INTO MFQuarterly ({', '.join(MF_QUARTERLY_COLUMNS)})
+        SELECT {', '.join(MF_QUARTERLY_COLUMNS)} FROM temp.MFQuarterlyImport WHERE true
+        ON CONFLICT (MFTransId, TYear, TMonth) DO UPDATE SET
+            {', '.join(f'{c} = excluded.{c}' for c in MF_QUARTERLY_VALUE_COLUMNS)}
+        WHERE {' OR '.join(f'{c} IS NOT excluded.{c}' for c in MF_QUARTERLY_VALUE_COLUMNS)}
+    """)
+    return conn.total_changes - changes_before
+
+# --- Mutual fund history ---
+# MFQuarterly.PeriodKey (TYear * 12 + TMonth - 1, the month number mf_returns also uses) is a
+# single integer period kept in step by triggers. IX_MFQuarterly_PeriodKey covers the columns
+# the history view reads, so a period range is one index range scan with no table lookups.
+MF_HISTORY_COLUMNS = ['Units', 'Nav', 'Value']
+
+def period_key(year, month):
+    return year * 12 + month - 1
+
+def create_mf_period_key(conn):
+    """
+    Adds MFQuarterly.PeriodKey with its covering index and sync triggers if missing (also after
+    FixPkAutoIncrement rebuilt MFQuarterly and dropped the triggers), backfilling existing rows.
+    Returns True when anything was changed by this call.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(MFQuarterly)")
+    existing = {row[1] for row in cursor.fetchall()}
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name IN ('trg_MFQuarterly_Period_Insert', 'trg_MFQuarterly_Period_Update')")
+    changed = cursor.fetchone()[0] < 2
+    if 'PeriodKey' not in existing:
+        cursor.execute('ALTER TABLE MFQuarterly ADD COLUMN "PeriodKey" INTEGER')
+        changed = True
+    if not changed:
+        return False
+
+    cursor.execute("UPDATE MFQuarterly SET PeriodKey = TYear * 12 + TMonth - 1")
+    sync_key = """
+        UPDATE MFQuarterly SET PeriodKey = NEW.TYear * 12 + NEW.TMonth - 1
+        WHERE rowid = NEW.rowid;
+    """
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS IX_MFQuarterly_PeriodKey ON MFQuarterly (PeriodKey, MFTransId, {', '.join(MF_HISTORY_COLUMNS)})")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_MFQuarterly_Period_Insert AFTER INSERT ON MFQuarterly BEGIN {sync_key} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_MFQuarterly_Period_Update AFTER UPDATE OF TYear, TMonth ON MFQuarterly BEGIN {sync_key} END")
+    return True
+
+@perf.timed("sqlite")
+def get_mf_owners():
+    """Owners (OwnerId, OwnerName) that have at least one MFTrans holding."""
+    conn = get_connection()
+    try:
+        return pd.read_sql_query(
+            "SELECT OwnerId, OwnerName FROM Owner WHERE OwnerId IN (SELECT OwnerId FROM MFTrans) ORDER BY OwnerId",
+            conn
+        )
+    finally:
+        conn.close()
+
+@perf.timed("sqlite")
+def get_mf_history(owner_id, start_period=None, end_period=None):
+    """
+    Returns owner_id's MFQuarterly history between two PeriodKeys (inclusive, open when None) as
+    a wide period x fund matrix: a dict with 'periods' (PeriodKey), 'funds' (MFTransId), 'isin'
+    (per fund) and one float array of shape (periods, funds) per MF_HISTORY_COLUMNS entry, NaN
+    where a fund has no snapshot for a period.
+    """
+    query = f"""
+        SELECT q.PeriodKey, q.MFTransId, t.ISIN, {', '.join('q.' + c for c in MF_HISTORY_COLUMNS)}
+        FROM MFQuarterly q INDEXED BY IX_MFQuarterly_PeriodKey
+        JOIN MFTrans t ON t.MFTransId = q.MFTransId
+        WHERE t.OwnerId = ?
+    """
+    params = [owner_id]
+    if start_period is not None:
+        query += " AND q.PeriodKey >= ?"
+        params.append(start_period)
+    if end_period is not None:
+        query += " AND q.PeriodKey <= ?"
+        params.append(end_period)
+    conn = get_connection()
+    try:
+        if create_mf_period_key(conn):
+            conn.commit()
+        df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+    periods, period_idx = np.unique(df['PeriodKey'].to_numpy(dtype=np.int64), return_inverse=True)
+    funds, fund_first, fund_idx = np.unique(df['MFTransId'].to_numpy(dtype=np.int64), return_index=True, return_inverse=True)
+    history = {'periods': periods, 'funds': funds, 'isin': df['ISIN'].to_numpy(dtype=object)[fund_first]}
+    for col in MF_HISTORY_COLUMNS:
+        matrix = np.full((len(periods), len(funds)), np.nan)
+        matrix[period_idx, fund_idx] = df[col].to_numpy(dtype=float)
+        history[col] = matrix
+    return history
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+from urllib.parse import quote
+import pandas as pd
+import db_manager as db
+
+# Local columnar store of daily index history (NSE "Historical Data" CSV downloads), so analyses
+# read years of data for several indices from memory-mapped Parquet instead of re-uploading and
+# re-parsing CSVs. One Parquet file per index under Index=<name>/, deduplicated by Date (a later
+# ingest wins). Ingest from the cmd prompt like this:
+# python index_store.py --index "NIFTY 50" nifty50.csv --index "NIFTY 500" nifty500.csv
+
+# --- Configuration ---
+CSV_DATE_FORMAT = '%d-%b-%Y'
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+INDEX_FILE = "history.parquet"
+
+def get_store_dir():
+    """Store directory, next to the database file."""
+    db_path = db.get_db_path()
+    return os.path.join(os.path.dirname(db_path), os.path.splitext(os.path.basename(db_path))[0] + "_indices")
+
+def store_schema():
+    import pyarrow as pa
+    return pa.schema([('Date', pa.date32())] + [(col, pa.float64()) for col in PRICE_COLUMNS])
+
+def store_partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    # Index names are always strings, even one that looks like a number
+    return ds.partitioning(pa.schema([('Index', pa.string())]), flavor='hive')
+
+def index_path(index_name, store_dir=None):
+    # Hive partition values are URI-decoded on read, so names like "NIFTY 50" round-trip
+    return os.path.join(store_dir or get_store_dir(), f"Index={quote(index_name, safe='')}", INDEX_FILE)
+
+def parse_index_csv(csv_file):
+    """Date and PRICE_COLUMNS of an NSE index CSV (missing price columns are NaN), one row per date."""
+    df = pd.read_csv(csv_file, thousands=',')
+    df.columns = df.columns.str.strip()
+    df['Date'] = pd.to_datetime(df['Date'].str.strip(), format=CSV_DATE_FORMAT).dt.date
+    for col in PRICE_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce') if col in df.columns else float('nan')
+    return df[['Date'] + PRICE_COLUMNS].drop_duplicates('Date', keep='last')
+
+def ingest_index(df, index_name, store_dir=None):
+    """
+    Merges parsed history (parse_index_csv) into the index's Parquet file, replacing rows with
+    the same Date, and rewrites it atomically. Returns (dates added, total dates stored).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    path = index_path(index_name, store_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    existing = pq.read_table(path).to_pandas() if os.path.exists(path) else df.iloc[:0]
+    merged = pd.concat([existing, df], ignore_index=True).drop_duplicates('Date', keep='last')
+    merged = merged.sort_values('Date', ignore_index=True)
+    pq.write_table(pa.Table.from_pandas(merged, schema=store_schema(), preserve_index=False), path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return len(merged) - len(existing), len(merged)
+
+def ingest_index_csv(csv_file, index_name, store_dir=None):
+    return ingest_index(parse_index_csv(csv_file), index_name, store_dir)
+
+def list_indices(store_dir=None):
+    """Names of the indices in the store."""
+    import pyarrow.dataset as ds
+    store_dir = store_dir or get_store_dir()
+    if not os.path.isdir(store_dir):
+        return []
+    dataset = ds.dataset(store_dir, format="parquet", partitioning=store_partitioning())
+    return sorted(set(ds.get_partition_keys(f.partition_expression)['Index'] for f in dataset.get_fragments()))
+
+def get_store_version(store_dir=None):
+    """Token that changes whenever an index file is written; the cache key for loaders."""
+    store_dir = store_dir or get_store_dir()
+    if not os.path.isdir(store_dir):
+        return "0"
+    paths = sorted(os.path.join(root, f) for root, _, files in os.walk(store_dir) for f in files if f == INDEX_FILE)
+    return "-".join(f"{os.stat(p).st_mtime_ns}:{os.stat(p).st_size}" for p in paths)
+
+def load_index_history(index_names=None, start=None, end=None, store_dir=None):
+    """
+    Memory-maps the stored history of the given indices (all when None), optionally limited to
+    start <= Date <= end. Returns a frame with Index, Date (datetime64) and PRICE_COLUMNS sorted
+    by Index and Date; empty when nothing is stored.
+    """
+    import pyarrow.parquet as pq
+    store_dir = store_dir or get_store_dir()
+    if not os.path.isdir(store_dir):
+        return pd.DataFrame(columns=['Index', 'Date'] + PRICE_COLUMNS)
+    filters = []
+    if index_names:
+        filters.append(('Index', 'in', list(index_names)))
+    if start is not None:
+        filters.append(('Date', '>=', pd.Timestamp(start).date()))
+    if end is not None:
+        filters.append(('Date', '<=', pd.Timestamp(end).date()))
+    table = pq.read_table(store_dir, filters=filters or None, memory_map=True, partitioning=store_partitioning())
+    df = table.to_pandas(date_as_object=False)
+    df['Index'] = df['Index'].astype(str)
+    return df[['Index', 'Date'] + PRICE_COLUMNS].sort_values(['Index', 'Date'], ignore_index=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append NSE index history CSVs to the local Parquet index store.")
+    parser.add_argument("--index", nargs=2, action="append", required=True, metavar=("NAME", "CSV"),
+                        help="Index name and CSV file; repeat for each file")
+    parser.add_argument("--store", help="Store directory (default: next to the JellyFin database)")
+
+    args = parser.parse_args()
+    for name, path in args.index:
+        if not os.path.exists(path):
+            print(f"Error: CSV file '{path}' not found.", file=sys.stderr)
+            sys.exit(1)
+    for name, path in args.index:
+        try:
+            added, total = ingest_index_csv(path, name, args.store)
+        except (ValueError, KeyError) as e:
+            print(f"Error: could not read '{path}': {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"{name}: {added} new dates from {os.path.basename(path)}, {total} stored")
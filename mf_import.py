@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+import os
+import sys
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+import db_manager as db
+from mf_parser import parse_portfolio
+from mf_returns import invalidate_returns
+
+# Parse -> match -> upsert pipeline behind MFImp, usable without Streamlit. Each job is an owner
+# (OwnerId or OwnerName), a period and a text file of pasted NSDL portfolio data; all jobs run
+# in one transaction. At the cmd prompt use it like this:
+# ./mf_import.py --job Self 2025-12 self.txt --job Spouse 2025-12 spouse.txt
+# Add --dry-run to see the matched/unmapped counts and the diff without writing anything.
+
+DB_PATH = os.environ.get("JELLYFIN_DB_PATH", "/home/ea/TTMbak/JellyFin/JellyFin.db")
+
+# (database file, OwnerId) -> (file token, {(ISIN, Folio): MFTransId}); holdings change rarely,
+# so the map is reused across imports and reruns until the database file is written to
+_holdings_cache = {}
+
+def _file_token(conn):
+    """(path, mtime/size token) of the connection's main database file; path is '' in memory."""
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not path:
+        return "", None
+    try:
+        st_info = os.stat(path)
+    except OSError:
+        return path, None
+    return path, f"{st_info.st_mtime_ns}-{st_info.st_size}"
+
+def get_active_holdings(conn, owner_id):
+    """
+    {(ISIN, Folio): MFTransId} of owner_id's active MFTrans records (ClosedDate IS NULL), read
+    from IX_MFTrans_Active. Cached per database file and owner until the file changes.
+    """
+    path, token = _file_token(conn)
+    cached = _holdings_cache.get((path, owner_id))
+    if token is not None and cached and cached[0] == token:
+        return cached[1]
+    query = """
+    SELECT ISIN, Folio, MFTransId
+    FROM MFTrans
+    WHERE OwnerId = ?
+    AND ClosedDate IS NULL
+    """
+    holdings = {(isin, folio): mf_id for isin, folio, mf_id in conn.execute(query, (owner_id,))}
+    if token is not None:
+        _holdings_cache[(path, owner_id)] = (token, holdings)
+    return holdings
+
+def match_holdings(df, holdings):
+    """
+    Reconciles parsed holdings with an owner's {(ISIN, Folio): MFTransId} map in one pass over df.
+    Returns (matched, raw_unmapped, mf_unmapped): parsed rows with their MFTransId, parsed rows
+    with no active holding, and active holdings (ISIN, Folio, MFTransId) missing from df.
+    """
+    mf_ids = np.zeros(len(df), dtype=np.int64)
+    found = np.zeros(len(df), dtype=bool)
+    seen = set()
+    for i, key in enumerate(zip(df["ISIN"], df["Folio"])):
+        mf_id = holdings.get(key)
+        if mf_id is not None:
+            mf_ids[i] = mf_id
+            found[i] = True
+            seen.add(key)
+    matched = df[found].assign(MFTransId=mf_ids[found])
+    raw_unmapped = df[~found]
+    missing = sorted(holdings.keys() - seen, key=holdings.get)
+    mf_unmapped = pd.DataFrame([(isin, folio, holdings[(isin, folio)]) for isin, folio in missing],
+                               columns=["ISIN", "Folio", "MFTransId"])
+    return matched, raw_unmapped, mf_unmapped
+
+def quarterly_rows(matched, year, month):
+    """MFQuarterly rows (db.MF_QUARTERLY_COLUMNS order) for the matched holdings of one period."""
+    return matched.assign(TMonth=month, TYear=year)[db.MF_QUARTERLY_COLUMNS].values.tolist()
+
+def import_portfolio(conn, owner_id, year, month, text, dry_run=False):
+    """
+    Parses text, matches it with owner_id's active holdings and upserts the period into
+    MFQuarterly (only diffing when dry_run). Runs inside the caller's transaction; the caller
+    commits. Returns a dict with the frames and counts of each step.
+    """
+    df, diagnostics = parse_portfolio(text)
+    matched, raw_unmapped, mf_unmapped = match_holdings(df, get_active_holdings(conn, owner_id))
+    rows = quarterly_rows(matched, year, month)
+    diff = db.diff_mf_quarterly(conn, rows)
+    written = 0
+    if not dry_run and rows:
+        written = db.upsert_mf_quarterly(conn, rows)
+        if written:
+            invalidate_returns(conn, owner_id, year, month)
+    status = diff["Status"].value_counts()
+    return {
+        "parsed": df, "diagnostics": diagnostics, "matched": matched,
+        "raw_unmapped": raw_unmapped, "mf_unmapped": mf_unmapped, "diff": diff,
+        "counts": {
+            "parsed": len(df), "matched": len(matched),
+            "raw_unmapped": len(raw_unmapped), "mf_unmapped": len(mf_unmapped),
+            "new": int(status.get("New", 0)), "changed": int(status.get("Changed", 0)),
+            "unchanged": int(status.get("Unchanged", 0)), "written": written,
+        },
+    }
+
+def resolve_owner(conn, owner):
+    """OwnerId for an OwnerId or OwnerName string, or None if there is no such owner."""
+    row = conn.execute("SELECT OwnerId FROM Owner WHERE CAST(OwnerId AS TEXT) = ? OR OwnerName = ?", (owner, owner)).fetchone()
+    return row[0] if row else None
+
+def parse_period(period):
+    """'YYYY-MM' (or 'YYYY-M') -> (year, month)."""
+    year, month = (int(p) for p in period.split("-"))
+    if not 1 <= month <= 12:
+        raise ValueError(f"month out of range in '{period}'")
+    return year, month
+
+def import_batch(db_path, jobs, dry_run=False):
+    """
+    Runs import_portfolio for every (owner, period, file) job over one connection in a single
+    transaction; any failure rolls every job back. Returns a list of (job, counts).
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        if db.create_mf_quarterly_indexes(conn) | db.create_active_holdings_index(conn):
+            conn.commit()
+        if not db.has_mf_quarterly_unique_index(conn):
+            duplicates = db.get_mf_quarterly_duplicates(conn)
+            for key in duplicates.itertuples(index=False):
+                print(f"Duplicate: MFTransId {key.MFTransId} {key.TYear}-{key.TMonth:02d} stored {key.Rows} times", file=sys.stderr)
+            raise ValueError(f"MFQuarterly has {len(duplicates)} duplicated holding periods; run migrate.py to remove them")
+        results = []
+        for owner, period, path in jobs:
+            owner_id = resolve_owner(conn, owner)
+            if owner_id is None:
+                raise ValueError(f"Owner '{owner}' not found")
+            year, month = parse_period(period)
+            with open(path, encoding="utf-8") as f:
+                result = import_portfolio(conn, owner_id, year, month, f.read(), dry_run)
+            results.append(((owner, period, path), result["counts"]))
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+        return results
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import pasted NSDL portfolio text files into MFQuarterly.")
+    parser.add_argument("--db", default=DB_PATH, help="Path to the JellyFin SQLite database")
+    parser.add_argument("--job", nargs=3, action="append", required=True, metavar=("OWNER", "YYYY-MM", "FILE"),
+                        help="Owner (OwnerId or OwnerName), period and text file; repeat for each owner")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        print(f"Error: Database file '{args.db}' not found.", file=sys.stderr)
+        sys.exit(1)
+    try:
+        results = import_batch(args.db, args.job, args.dry_run)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print(f"Import failed, nothing written: {e}", file=sys.stderr)
+        sys.exit(1)
+    for (owner, period, path), c in results:
+        print(f"{owner} {period} ({os.path.basename(path)}): parsed {c['parsed']}, matched {c['matched']}, "
+              f"unmapped raw {c['raw_unmapped']} / MFTrans {c['mf_unmapped']}; "
+              f"new {c['new']}, changed {c['changed']}, unchanged {c['unchanged']}, written {c['written']}")
+    if args.dry_run:
+        print("Dry run: nothing written.")
@@ -0,0 +1,108 @@
+import io
+import re
+import numpy as np
+import pandas as pd
+
+# Parser for portfolio text pasted from NSDL (via Wondershare) into MFImp.
+# Each holding starts on a line beginning with its ISIN ("INF..."), optionally followed by the
+# UCC on the same line; every following non-empty line is the next field, up to the next ISIN.
+
+# --- Configuration ---
+COLUMNS = ["ISIN", "UCC", "Name", "Folio", "Units", "AvgCost", "TotCost", "Nav", "Value", "PL", "XIRR"]
+TEXT_COLUMNS = COLUMNS[:4]
+NUMERIC_COLUMNS = COLUMNS[4:]
+DIAGNOSTIC_COLUMNS = ["RecordNo", "Line", "ISIN", "Issue"]
+
+ISIN_PREFIX = "INF"
+ISIN_LINE = re.compile(r"^[ \t]*INF", re.M)
+HAS_LETTER = re.compile(r"[A-Za-z]")
+ONE_OR_TWO_DIGITS = re.compile(r"\d{1,2}")
+
+def iter_raw_records(text):
+    """
+    Yields (line_no, tokens) per holding in one pass over the text, without splitting it into
+    a list of lines first. Commas (thousands separators) are dropped as each line is read.
+    Lines before the first ISIN line come out as a record of their own, as they always have.
+    """
+    tokens = []
+    start_line = None
+    for line_no, line in enumerate(io.StringIO(text), start=1):
+        line = line.replace(",", "").strip()
+        if not line:
+            continue
+        if line.startswith(ISIN_PREFIX):
+            if tokens:
+                yield start_line, tokens
+            parts = line.split()
+            # ISIN, then the UCC when it shares the line
+            tokens = parts[:2]
+            start_line = line_no
+        else:
+            if not tokens:
+                start_line = line_no
+            tokens.append(line)
+    if tokens:
+        yield start_line, tokens
+
+def fix_record(tokens):
+    """
+    Repairs the two known wrapping artefacts of the pasted layout and pads/truncates to
+    len(COLUMNS). Returns (fields, issues) where issues describes every change made.
+    """
+    issues = []
+    # Rule 1: Folio (index 3) must not contain letters; otherwise it is the rest of the Name
+    if len(tokens) >= 4 and HAS_LETTER.search(tokens[3]):
+        tokens[2] = tokens[2] + " " + tokens[3]
+        del tokens[3]
+        issues.append("Name wrapped onto the next line; joined")
+    # Rule 2: AvgCost (index 5) is never 1 or 2 digits; that is the tail of a wrapped Units value
+    if len(tokens) >= 6 and ONE_OR_TWO_DIGITS.fullmatch(tokens[5]):
+        tokens[4] = tokens[4] + tokens[5]
+        del tokens[5]
+        issues.append("Units wrapped onto the next line; joined")
+
+    if len(tokens) > len(COLUMNS):
+        issues.append(f"{len(tokens) - len(COLUMNS)} extra field(s) dropped: {' | '.join(tokens[len(COLUMNS):])}")
+        del tokens[len(COLUMNS):]
+    elif len(tokens) < len(COLUMNS):
+        issues.append(f"{len(COLUMNS) - len(tokens)} missing field(s) left blank")
+        tokens.extend([""] * (len(COLUMNS) - len(tokens)))
+    return tokens, issues
+
+def parse_portfolio(text):
+    """
+    Parses pasted portfolio text straight into column arrays sized from a single ISIN-line count.
+    Returns (df, diagnostics): df has COLUMNS with NUMERIC_COLUMNS as float64 (NaN where a
+    value is missing or not a number); diagnostics has one row per issue found in a record.
+    """
+    capacity = len(ISIN_LINE.findall(text)) + 1
+    text_cols = {col: np.empty(capacity, dtype=object) for col in TEXT_COLUMNS}
+    num_cols = {col: np.full(capacity, np.nan) for col in NUMERIC_COLUMNS}
+    diagnostics = []
+
+    n = 0
+    for line_no, tokens in iter_raw_records(text):
+        if n == capacity:
+            # Only reachable for ISIN lines the pre-count cannot see (e.g. a leading comma)
+            for col in TEXT_COLUMNS:
+                text_cols[col] = np.concatenate([text_cols[col], np.empty(capacity, dtype=object)])
+            for col in NUMERIC_COLUMNS:
+                num_cols[col] = np.concatenate([num_cols[col], np.full(capacity, np.nan)])
+            capacity *= 2
+        fields, issues = fix_record(tokens)
+        if not fields[0].startswith(ISIN_PREFIX):
+            issues.append("Record does not start with an ISIN line")
+        for col, value in zip(TEXT_COLUMNS, fields):
+            text_cols[col][n] = value
+        for col, value in zip(NUMERIC_COLUMNS, fields[len(TEXT_COLUMNS):]):
+            if not value:
+                continue
+            try:
+                num_cols[col][n] = float(value)
+            except ValueError:
+                issues.append(f"{col} is not a number: {value!r}")
+        n += 1
+        diagnostics.extend((n, line_no, fields[0], issue) for issue in issues)
+
+    df = pd.DataFrame({col: (text_cols[col][:n] if col in text_cols else num_cols[col][:n]) for col in COLUMNS})
+    return df, pd.DataFrame(diagnostics, columns=DIAGNOSTIC_COLUMNS)
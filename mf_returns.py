@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+
+# Returns engine over MFQuarterly history. A holding's cash flows are the changes in its
+# TotCost between consecutive quarterly snapshots (money in is negative, redemptions positive),
+# dated at the end of each snapshot month; its Value at the as-of period closes the series.
+# Per-fund and per-owner portfolio XIRR are solved for every (owner, period) at once and cached
+# in MFReturns. Recompute everything from the command line with:
+# python mf_returns.py /home/ea/TTMbak/JellyFin/JellyFin.db
+
+# --- Configuration ---
+PORTFOLIO_ID = 0  # MFTransId used in MFReturns for an owner's whole portfolio
+DAYS_PER_YEAR = 365.0
+# Solver bracket for the annual rate (-99% .. +10000%) and stopping rules
+RATE_LOW, RATE_HIGH = -0.99, 100.0
+MAX_ITERATIONS = 100
+RATE_TOLERANCE = 1e-10
+
+RETURN_COLUMNS = ['OwnerId', 'TYear', 'TMonth', 'MFTransId', 'TotCost', 'Value', 'XIRR']
+
+def create_returns_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS MFReturns (
+            OwnerId INTEGER NOT NULL,
+            TYear INTEGER NOT NULL,
+            TMonth INTEGER NOT NULL,
+            MFTransId INTEGER NOT NULL,
+            TotCost REAL,
+            Value REAL,
+            XIRR REAL,
+            PRIMARY KEY (OwnerId, TYear, TMonth, MFTransId)
+        ) WITHOUT ROWID
+    """)
+
+def xirr_batch(system, times, amounts):
+    """
+    Solves sum(amount * (1 + r) ** -time) = 0 for every system at once. system holds 0..n-1
+    codes per flow, times are years from the system's first flow. Uses Newton steps kept inside
+    a shrinking sign-change bracket (bisection when a step leaves it), so each system converges
+    or is bracketed to RATE_TOLERANCE. Returns an array of annual rates, NaN where the flows
+    do not change sign within the bracket.
+    """
+    system = np.asarray(system)
+    n = int(system.max()) + 1 if len(system) else 0
+    if n == 0:
+        return np.empty(0)
+    # Pad the flows into (n, longest series) matrices; padding has amount 0 and adds nothing
+    order = np.argsort(system, kind='stable')
+    counts = np.bincount(system, minlength=n)
+    slot = np.arange(len(system)) - np.repeat(np.cumsum(counts) - counts, counts)
+    A = np.zeros((n, counts.max()))
+    T = np.zeros((n, counts.max()))
+    A[system[order], slot] = np.asarray(amounts, dtype=float)[order]
+    T[system[order], slot] = np.asarray(times, dtype=float)[order]
+
+    def npv(rate):
+        discount = (1.0 + rate)[:, None] ** -T
+        value = (A * discount).sum(axis=1)
+        slope = (-T * A * discount).sum(axis=1) / (1.0 + rate)
+        return value, slope
+
+    lo = np.full(n, RATE_LOW)
+    hi = np.full(n, RATE_HIGH)
+    f_lo, _ = npv(lo)
+    f_hi, _ = npv(hi)
+    solvable = np.sign(f_lo) * np.sign(f_hi) < 0
+    rate = np.full(n, 0.1)
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        for _ in range(MAX_ITERATIONS):
+            f, slope = npv(rate)
+            # Keep the root bracketed: replace whichever end has the same sign as f(rate)
+            same_as_lo = np.sign(f) == np.sign(f_lo)
+            lo = np.where(same_as_lo, rate, lo)
+            hi = np.where(same_as_lo, hi, rate)
+            step = rate - f / slope
+            bisect = ~np.isfinite(step) | (step <= lo) | (step >= hi)
+            new_rate = np.where(bisect, (lo + hi) / 2, step)
+            done = (np.abs(new_rate - rate) < RATE_TOLERANCE) | (f == 0)
+            rate = new_rate
+            if np.all(done | ~solvable):
+                break
+    return np.where(solvable, rate, np.nan)
+
+def period_end_years(year, month):
+    """Years since 1970-01-01 of the last day of each (year, month)."""
+    first = pd.to_datetime(pd.DataFrame({'year': year, 'month': month, 'day': 1}))
+    return ((first + pd.offsets.MonthEnd(0)) - pd.Timestamp('1970-01-01')).dt.days.to_numpy() / DAYS_PER_YEAR
+
+def load_history(conn, owner_id=None):
+    """MFQuarterly snapshots joined to their holding's OwnerId, in holding and period order."""
+    query = """
+        SELECT t.OwnerId, q.MFTransId, q.TYear, q.TMonth, q.TotCost, q.Value
+        FROM MFQuarterly q
+        JOIN MFTrans t ON t.MFTransId = q.MFTransId
+    """
+    params = ()
+    if owner_id is not None:
+        query += " WHERE t.OwnerId = ?"
+        params = (owner_id,)
+    df = pd.read_sql_query(query, conn, params=params)
+    return df.sort_values(['MFTransId', 'TYear', 'TMonth'], ignore_index=True)
+
+def compute_returns(history):
+    """
+    Per-fund and portfolio (MFTransId = PORTFOLIO_ID) XIRR, in percent, for every owner and every
+    period a holding was valued in. The portfolio of a period covers the holdings valued in it.
+    Returns a frame with RETURN_COLUMNS.
+    """
+    if history.empty:
+        return pd.DataFrame(columns=RETURN_COLUMNS)
+    h = history.assign(
+        Period=history['TYear'] * 12 + history['TMonth'] - 1,
+        Years=period_end_years(history['TYear'], history['TMonth']),
+        TotCost=history['TotCost'].fillna(0.0),
+        Value=history['Value'].fillna(0.0),
+    )
+    # Money put in (or taken out) since the previous snapshot of the same holding
+    h['Flow'] = -h.groupby('MFTransId')['TotCost'].diff().fillna(h['TotCost'])
+
+    # Every (holding, as-of period) pairs with that holding's flows up to the period, plus its value then
+    as_of = h[['OwnerId', 'MFTransId', 'TYear', 'TMonth', 'Period', 'Years', 'TotCost', 'Value']]
+    flows = as_of.merge(h[['MFTransId', 'Period', 'Years', 'Flow']], on='MFTransId', suffixes=('', 'Flow'))
+    flows = flows.loc[flows['PeriodFlow'] <= flows['Period'], ['OwnerId', 'MFTransId', 'Period', 'YearsFlow', 'Flow']]
+    terminal = as_of[['OwnerId', 'MFTransId', 'Period', 'Years', 'Value']].set_axis(flows.columns, axis=1)
+    flows = pd.concat([flows, terminal], ignore_index=True)
+
+    # Portfolio series: all of an owner's flows for the period, netted per date
+    portfolio_flows = (
+        flows.groupby(['OwnerId', 'Period', 'YearsFlow'], sort=False)['Flow'].sum().reset_index()
+        .assign(MFTransId=PORTFOLIO_ID)
+    )
+    all_flows = pd.concat([flows, portfolio_flows], ignore_index=True)
+    key_cols = ['OwnerId', 'MFTransId', 'Period']
+    # Systems are numbered in order of first appearance, the same order drop_duplicates keeps
+    system = all_flows.groupby(key_cols, sort=False).ngroup().to_numpy()
+    start = all_flows.groupby(key_cols, sort=False)['YearsFlow'].transform('min').to_numpy()
+    rates = xirr_batch(system, all_flows['YearsFlow'].to_numpy() - start, all_flows['Flow'].to_numpy())
+
+    result = all_flows[key_cols].drop_duplicates(ignore_index=True).assign(XIRR=np.round(rates * 100, 2))
+    totals = as_of.groupby(['OwnerId', 'Period'])[['TotCost', 'Value']].sum().reset_index().assign(MFTransId=PORTFOLIO_ID)
+    totals = pd.concat([as_of[['OwnerId', 'MFTransId', 'Period', 'TotCost', 'Value']], totals], ignore_index=True)
+    result = result.merge(totals, on=['OwnerId', 'MFTransId', 'Period'])
+    result['TYear'] = result['Period'] // 12
+    result['TMonth'] = result['Period'] % 12 + 1
+    return result[RETURN_COLUMNS].sort_values(['OwnerId', 'TYear', 'TMonth', 'MFTransId'], ignore_index=True)
+
+def store_returns(conn, returns, owner_id=None):
+    """Replaces the cached MFReturns rows (of one owner, or all). Runs inside the caller's transaction."""
+    create_returns_table(conn)
+    if owner_id is None:
+        conn.execute("DELETE FROM MFReturns")
+    else:
+        conn.execute("DELETE FROM MFReturns WHERE OwnerId = ?", (owner_id,))
+    rows = returns[RETURN_COLUMNS].astype(object).where(returns[RETURN_COLUMNS].notna(), None)
+    conn.executemany(f"INSERT INTO MFReturns ({', '.join(RETURN_COLUMNS)}) VALUES ({', '.join('?' * len(RETURN_COLUMNS))})",
+                     rows.itertuples(index=False, name=None))
+
+def invalidate_returns(conn, owner_id, year, month):
+    """Drops cached returns of owner_id from (year, month) on, which a change to that period affects."""
+    create_returns_table(conn)
+    conn.execute("DELETE FROM MFReturns WHERE OwnerId = ? AND TYear * 12 + TMonth >= ? * 12 + ?", (owner_id, year, month))
+
+def returns_are_current(conn, owner_id):
+    """
+    True when MFReturns holds owner_id's whole history: the cached periods and the owner's
+    MFQuarterly periods match in number and latest period (invalidate_returns drops later
+    periods, and a new snapshot adds one, so either makes them differ).
+    """
+    cached = conn.execute("SELECT COUNT(DISTINCT TYear * 12 + TMonth), MAX(TYear * 12 + TMonth) FROM MFReturns WHERE OwnerId = ?",
+                          (owner_id,)).fetchone()
+    stored = conn.execute("""
+        SELECT COUNT(DISTINCT q.TYear * 12 + q.TMonth), MAX(q.TYear * 12 + q.TMonth)
+        FROM MFQuarterly q
+        JOIN MFTrans t ON t.MFTransId = q.MFTransId
+        WHERE t.OwnerId = ?
+    """, (owner_id,)).fetchone()
+    return cached == stored
+
+def get_returns(conn, owner_id, year, month):
+    """
+    Cached per-fund and portfolio returns of owner_id as of (year, month). Empty, without touching
+    the cache, when the owner has no snapshot at or before that period; the owner's whole history
+    is recomputed and cached only when MFReturns is behind MFQuarterly. Runs inside the caller's
+    transaction; the caller commits when conn.in_transaction.
+    """
+    create_returns_table(conn)
+    query = f"SELECT {', '.join(RETURN_COLUMNS)} FROM MFReturns WHERE OwnerId = ? AND TYear = ? AND TMonth = ?"
+    has_snapshot = conn.execute("""
+        SELECT 1 FROM MFQuarterly q
+        JOIN MFTrans t ON t.MFTransId = q.MFTransId
+        WHERE t.OwnerId = ? AND q.TYear * 12 + q.TMonth <= ? * 12 + ?
+        LIMIT 1
+    """, (owner_id, year, month)).fetchone()
+    if not has_snapshot:
+        return pd.DataFrame(columns=RETURN_COLUMNS)
+    if not returns_are_current(conn, owner_id):
+        store_returns(conn, compute_returns(load_history(conn, owner_id)), owner_id)
+    return pd.read_sql_query(query, conn, params=(owner_id, year, month))
+
+def recompute_all(db_path):
+    """Rebuilds MFReturns for every owner and period. Returns (rows written, seconds taken)."""
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    try:
+        returns = compute_returns(load_history(conn))
+        store_returns(conn, returns)
+        conn.commit()
+        return len(returns), time.perf_counter() - start
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute per-fund and portfolio XIRR for every owner and quarter.")
+    parser.add_argument("db_path", nargs="?", default=os.environ.get("JELLYFIN_DB_PATH", "/home/ea/TTMbak/JellyFin/JellyFin.db"),
+                        help="Path to the JellyFin SQLite database")
+
+    args = parser.parse_args()
+    if not os.path.exists(args.db_path):
+        print(f"Error: Database file '{args.db_path}' not found.", file=sys.stderr)
+        sys.exit(1)
+    rows, seconds = recompute_all(args.db_path)
+    print(f"Stored {rows} returns in MFReturns in {seconds:.3f}s")
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import os
+import sys
+import sqlite3
+import argparse
+from datetime import datetime
+import db_manager as db
+import mf_returns
+import FixPkAutoIncrement as fixpk
+
+# Versioned schema upgrades for the performance features (integer keys, derived columns,
+# materialized tables, indexes). Pending migrations run in version order in one transaction
+# with foreign keys checked before the commit, after an online backup of the database, and the
+# query planner statistics are refreshed afterwards. Applied versions are kept in SchemaVersion.
+# At the cmd prompt use it like this:
+# ./migrate.py /home/ea/TTMbak/JellyFin/JellyFin.db
+# Add --status to list applied and pending migrations without changing anything.
+
+# --- Configuration ---
+DB_PATH = os.environ.get("JELLYFIN_DB_PATH", "/home/ea/TTMbak/JellyFin/JellyFin.db")
+# Tables whose primary key must be an INTEGER PRIMARY KEY (rowid alias), parents first
+PK_TABLES = ['Bank', 'Category', 'SB', 'Owner', 'MFTrans', 'MFQuarterly']
+
+def table_exists(conn, table_name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name,)).fetchone() is not None
+
+def tables_without_integer_pk(conn):
+    cursor = conn.cursor()
+    return [t for t in PK_TABLES if table_exists(conn, t) and not fixpk.has_integer_pk(cursor, t)]
+
+def fix_primary_keys(conn):
+    cursor = conn.cursor()
+    for table_name in tables_without_integer_pk(conn):
+        fixpk.rebuild_table(cursor, table_name)
+        print(f"  rebuilt {table_name} with an INTEGER PRIMARY KEY")
+
+def add_ledger_keys(conn):
+    db.create_paise_columns(conn)
+    db.create_date_key_columns(conn)
+
+def remove_mf_quarterly_duplicates(conn):
+    """Keeps the most recently inserted row of each duplicated (MFTransId, TYear, TMonth) key."""
+    removed = conn.execute("""
+        DELETE FROM MFQuarterly
+        WHERE rowid NOT IN (SELECT MAX(rowid) FROM MFQuarterly GROUP BY MFTransId, TYear, TMonth)
+    """).rowcount
+    if removed:
+        print(f"  removed {removed} duplicate MFQuarterly rows")
+
+def add_mf_indexes(conn):
+    # The unique index needs every (MFTransId, TYear, TMonth) key once
+    remove_mf_quarterly_duplicates(conn)
+    db.create_mf_quarterly_indexes(conn)
+    db.create_active_holdings_index(conn)
+    db.create_mf_period_key(conn)
+
+# (version, description, tables it needs, function). A migration whose tables do not exist yet
+# is left pending and runs on a later invocation once they do.
+MIGRATIONS = [
+    (1, "Integer primary keys", [], fix_primary_keys),
+    (2, "Budget table", ['Category'], db.create_budget_table),
+    (3, "SB paise amounts and date keys", ['SB'], add_ledger_keys),
+    (4, "SBDailyBalance series", ['SB'], db.create_daily_balance_table),
+    (5, "MFQuarterly/MFTrans indexes and period key", ['MFTrans', 'MFQuarterly'], add_mf_indexes),
+    (6, "MFReturns table", ['MFTrans', 'MFQuarterly'], mf_returns.create_returns_table),
+]
+# Migrations checked again on every run even once applied, by a function that returns True when
+# the migration has work to do: PK_TABLES created after migration 1 still need their keys fixed
+REPEATABLE = {1: lambda conn: bool(tables_without_integer_pk(conn))}
+
+def create_schema_version_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS SchemaVersion (
+            Version INTEGER PRIMARY KEY,
+            Description TEXT NOT NULL,
+            AppliedAt TEXT NOT NULL
+        )
+    """)
+
+def get_applied_versions(conn):
+    create_schema_version_table(conn)
+    return {row[0] for row in conn.execute("SELECT Version FROM SchemaVersion")}
+
+def get_pending(conn):
+    """Returns (runnable, waiting): pending migrations whose tables exist, and those still missing some."""
+    applied = get_applied_versions(conn)
+    runnable, waiting = [], []
+    for migration in MIGRATIONS:
+        if migration[0] in applied and not (migration[0] in REPEATABLE and REPEATABLE[migration[0]](conn)):
+            continue
+        if all(table_exists(conn, t) for t in migration[2]):
+            runnable.append(migration)
+        else:
+            waiting.append(migration)
+    return runnable, waiting
+
+def backup_database(conn, backup_path):
+    """Copies the live database to backup_path with the sqlite3 online backup API."""
+    dest = sqlite3.connect(backup_path)
+    try:
+        conn.backup(dest)
+    finally:
+        dest.close()
+
+def run_migrations(db_path, backup_path=None):
+    """
+    Applies every runnable pending migration in version order inside one transaction, after a
+    backup (skipped when backup_path is False), and commits only if PRAGMA foreign_key_check is
+    clean. Then runs ANALYZE and PRAGMA optimize. Returns the list of applied (version, description).
+    """
+    # Autocommit mode: the migration transaction below is explicit
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        runnable, waiting = get_pending(conn)
+        for version, description, tables, _ in waiting:
+            print(f"Waiting: {version} {description} (needs {', '.join(t for t in tables if not table_exists(conn, t))})")
+        if not runnable:
+            return []
+
+        if backup_path is not False:
+            backup_path = backup_path or f"{db_path}.{datetime.now():%Y%m%d-%H%M%S}.bak"
+            backup_database(conn, backup_path)
+            print(f"Backed up '{db_path}' to '{backup_path}'")
+
+        # Table rebuilds need foreign key enforcement off; it cannot be changed inside a transaction
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for version, description, _, migrate in runnable:
+                print(f"Applying {version}: {description}")
+                migrate(conn)
+                conn.execute("INSERT OR REPLACE INTO SchemaVersion (Version, Description, AppliedAt) VALUES (?, ?, ?)",
+                             (version, description, datetime.now().isoformat(timespec='seconds')))
+            if not fixpk.check_foreign_keys(conn.cursor()):
+                raise ValueError("foreign key check failed")
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.execute("PRAGMA foreign_keys = ON")
+
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        return [(version, description) for version, description, _, _ in runnable]
+    finally:
+        conn.close()
+
+def print_status(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        create_schema_version_table(conn)
+        applied = dict(conn.execute("SELECT Version, AppliedAt FROM SchemaVersion").fetchall())
+        runnable, waiting = get_pending(conn)
+        runnable = {m[0] for m in runnable}
+        for version, description, _, _ in MIGRATIONS:
+            if version in runnable:
+                state = "pending" if version not in applied else f"pending again (applied {applied[version]})"
+            else:
+                state = f"applied {applied[version]}" if version in applied else "waiting for tables"
+            print(f"{version:>3}  {description:<45} {state}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending JellyFin schema migrations in one checked transaction.")
+    parser.add_argument("db_path", nargs="?", default=DB_PATH, help="Path to the JellyFin SQLite database")
+    parser.add_argument("--status", action="store_true", help="List applied and pending migrations and exit")
+    parser.add_argument("--backup", help="Backup file (default: <db_path>.<timestamp>.bak)")
+    parser.add_argument("--no-backup", action="store_true", help="Skip the backup")
+
+    args = parser.parse_args()
+    if not os.path.exists(args.db_path):
+        print(f"Error: Database file '{args.db_path}' not found.", file=sys.stderr)
+        sys.exit(1)
+    if args.status:
+        print_status(args.db_path)
+        sys.exit(0)
+    try:
+        applied = run_migrations(args.db_path, False if args.no_backup else args.backup)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Migration failed, nothing changed: {e}", file=sys.stderr)
+        sys.exit(1)
+    if applied:
+        print(f"Applied {len(applied)} migration(s); statistics refreshed.")
+    else:
+        print("Schema is up to date.")
@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from functools import wraps
+from contextlib import nullcontext
+
+# --- Configuration ---
+# JELLYFIN_PERF=1 turns instrumentation on. When it is off, timed() hands functions back
+# undecorated and span() returns a shared no-op context, so production pays nothing.
+ENABLED = os.environ.get("JELLYFIN_PERF", "0") == "1"
+# Optional JSONL file each rerun's spans are appended to (one line per span)
+TRACE_PATH = os.environ.get("JELLYFIN_PERF_TRACE")
+
+SPAN_COLUMNS = ['Kind', 'Name', 'Depth', 'Nested', 'StartMs', 'Ms']
+
+# Streamlit runs each session's script in its own thread, so spans are collected per thread
+_local = threading.local()
+_NOOP = nullcontext()
+
+def _current_run():
+    run = getattr(_local, 'run', None)
+    if run is None:
+        run = begin_run()
+    return run
+
+def begin_run(label=None):
+    """Starts a fresh span list for the script run on this thread and returns it."""
+    _local.run = {
+        'id': f"{datetime.now():%Y%m%dT%H%M%S.%f}-{threading.get_ident()}",
+        'label': label,
+        'started': time.perf_counter(),
+        'depth': 0,
+        'open_kinds': {},
+        'spans': [],
+    }
+    return _local.run
+
+class Span:
+    """
+    Times one block. Nested spans record their depth so the panel can indent them, and
+    whether a span of the same kind was already open, so per-kind totals count each call once.
+    """
+    __slots__ = ('kind', 'name', 'depth', 'nested', 'start')
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        run = _current_run()
+        self.depth = run['depth']
+        run['depth'] += 1
+        self.nested = run['open_kinds'].get(self.kind, 0) > 0
+        run['open_kinds'][self.kind] = run['open_kinds'].get(self.kind, 0) + 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        run = _current_run()
+        run['depth'] = self.depth
+        run['open_kinds'][self.kind] -= 1
+        run['spans'].append({
+            'Kind': self.kind,
+            'Name': self.name,
+            'Depth': self.depth,
+            'Nested': self.nested,
+            'StartMs': round((self.start - run['started']) * 1000, 3),
+            'Ms': round((end - self.start) * 1000, 3),
+        })
+        return False
+
+def span(kind, name):
+    """Context manager timing a block as (kind, name); a no-op when instrumentation is off."""
+    if not ENABLED:
+        return _NOOP
+    return Span(kind, name)
+
+def start(kind, name):
+    """Opens a span that cannot be written as a with-block (e.g. a whole tab); pass the result to stop()."""
+    if not ENABLED:
+        return None
+    return Span(kind, name).__enter__()
+
+def stop(open_span):
+    if open_span is not None:
+        open_span.__exit__(None, None, None)
+
+def timed(kind, name=None):
+    """Decorator timing every call of the function; returns the function unchanged when instrumentation is off."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(kind, label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def run_spans():
+    """Spans recorded so far in the current run, in start order."""
+    run = getattr(_local, 'run', None)
+    if run is None:
+        return []
+    return sorted(run['spans'], key=lambda s: s['StartMs'])
+
+def run_elapsed_ms():
+    run = getattr(_local, 'run', None)
+    if run is None:
+        return 0.0
+    return round((time.perf_counter() - run['started']) * 1000, 3)
+
+def write_trace(path=TRACE_PATH):
+    """Appends the current run's spans to a JSONL trace file. Returns the number of lines written."""
+    run = getattr(_local, 'run', None)
+    if not path or run is None or not run['spans']:
+        return 0
+    stamp = datetime.now().isoformat(timespec='milliseconds')
+    with open(path, "a") as f:
+        for s in run_spans():
+            f.write(json.dumps({'run': run['id'], 'label': run['label'], 'time': stamp, **s}) + "\n")
+    return len(run['spans'])
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from sb_classifier import clean_sb_name
+
+# --- Configuration ---
+# Accepted median gap (in days) between payments for each recurrence period
+PERIODS = {
+    'Weekly': (5, 9),
+    'Monthly': (26, 35),
+    'Quarterly': (84, 98),
+    'Yearly': (350, 380),
+}
+
+RECURRING_COLUMNS = [
+    'Merchant', 'CategoryName', 'Period', 'Occurrences', 'AvgAmount', 'MinAmount', 'MaxAmount',
+    'MedianGapDays', 'Regularity', 'FirstDate', 'LastDate', 'NextExpected'
+]
+
+def merchant_keys(names):
+    """
+    Normalizes SBName narrations to merchant keys with the sb_classifier normalizer
+    (digits/reference numbers and punctuation stripped). Digits are stripped in one
+    vectorized pass first so narrations differing only by reference number collapse,
+    then each distinct remainder is cleaned once.
+    """
+    stripped = names.fillna('').astype(str).str.replace(r'\d+', '', regex=True)
+    codes, uniques = pd.factorize(stripped)
+    cleaned = np.array([clean_sb_name(u) for u in uniques] + [''], dtype=object)
+    return pd.Series(cleaned[codes], index=names.index)
+
+def amount_bands(merchants, amounts, tolerance):
+    """
+    Band numbers for amounts sorted by (merchant, amount): a band starts at its smallest amount
+    and takes every later amount of the same merchant up to tolerance above it, so no band
+    spreads wider than tolerance. Each band is found with one searchsorted, so the loop runs
+    once per band rather than once per row.
+    """
+    merchants = np.asarray(merchants)
+    amounts = np.asarray(amounts, dtype=float)
+    n = len(amounts)
+    # Index one past the last row of each row's merchant
+    new_merchant = np.r_[True, merchants[1:] != merchants[:-1]]
+    merchant_start = np.flatnonzero(new_merchant)
+    merchant_end = np.append(merchant_start[1:], n)[np.cumsum(new_merchant) - 1]
+
+    band_starts = []
+    start = 0
+    while start < n:
+        band_starts.append(start)
+        end = merchant_end[start]
+        start += int(np.searchsorted(amounts[start:end], amounts[start] * (1 + tolerance), side='right'))
+    is_start = np.zeros(n, dtype=bool)
+    is_start[band_starts] = True
+    return np.cumsum(is_start)
+
+def detect_recurring(df, amount_tolerance=0.05, min_occurrences=2, min_regularity=0.6):
+    """
+    Finds recurring outflows in a transaction frame (SBName, CategoryName, AmtOut, DateT).
+
+    Rows are grouped by merchant key and an amount band: sorted by amount within a merchant,
+    a new band starts at the first amount more than amount_tolerance above the band's
+    smallest (see amount_bands). Each group's date gaps are then compared against PERIODS; a group is
+    recurring when its median gap falls in a period's range and at least min_regularity of
+    its gaps do too. Everything is sorts plus vectorized diffs, so the cost is O(n log n).
+    """
+    out = df.loc[(df['AmtOut'] > 0) & df['DateT'].notna(), ['SBName', 'CategoryName', 'AmtOut', 'DateT']]
+    if out.empty:
+        return pd.DataFrame(columns=RECURRING_COLUMNS)
+
+    out = out.assign(MerchantKey=merchant_keys(out['SBName']))
+    out = out[out['MerchantKey'] != '']
+
+    # Amount bands within each merchant
+    out = out.sort_values(['MerchantKey', 'AmtOut'], kind='mergesort')
+    out['GroupId'] = amount_bands(out['MerchantKey'].to_numpy(), out['AmtOut'].to_numpy(), amount_tolerance)
+
+    # Date gaps within each (merchant, band) group
+    out = out.sort_values(['GroupId', 'DateT'], kind='mergesort')
+    gaps = out['DateT'].diff().dt.days.astype(float)
+    gaps[out['GroupId'].ne(out['GroupId'].shift())] = np.nan
+    out['GapDays'] = gaps
+
+    summary = out.groupby('GroupId').agg(
+        Merchant=('MerchantKey', 'first'),
+        CategoryName=('CategoryName', 'first'),
+        Occurrences=('AmtOut', 'size'),
+        AvgAmount=('AmtOut', 'mean'),
+        MinAmount=('AmtOut', 'min'),
+        MaxAmount=('AmtOut', 'max'),
+        MedianGapDays=('GapDays', 'median'),
+        FirstDate=('DateT', 'min'),
+        LastDate=('DateT', 'max'),
+    )
+    summary = summary[summary['Occurrences'] >= min_occurrences].copy()
+    if summary.empty:
+        return pd.DataFrame(columns=RECURRING_COLUMNS)
+
+    summary['Period'] = None
+    gap_lo = pd.Series(np.nan, index=summary.index)
+    gap_hi = pd.Series(np.nan, index=summary.index)
+    for period, (lo, hi) in PERIODS.items():
+        in_range = summary['MedianGapDays'].between(lo, hi)
+        summary.loc[in_range, 'Period'] = period
+        gap_lo[in_range] = lo
+        gap_hi[in_range] = hi
+    summary = summary[summary['Period'].notna()].copy()
+    if summary.empty:
+        return pd.DataFrame(columns=RECURRING_COLUMNS)
+
+    # Share of a group's gaps that fall inside its period's range
+    row_lo = out['GroupId'].map(gap_lo)
+    row_hi = out['GroupId'].map(gap_hi)
+    in_period = (out['GapDays'] >= row_lo) & (out['GapDays'] <= row_hi)
+    summary['Regularity'] = in_period.groupby(out['GroupId']).sum().reindex(summary.index) / (summary['Occurrences'] - 1)
+    summary = summary[summary['Regularity'] >= min_regularity].copy()
+
+    summary['NextExpected'] = summary['LastDate'] + pd.to_timedelta(summary['MedianGapDays'], unit='D')
+    summary = summary.sort_values(['Occurrences', 'AvgAmount'], ascending=False)
+    return summary[RECURRING_COLUMNS].reset_index(drop=True)
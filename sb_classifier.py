@@ -5,7 +5,7 @@ import re
 import os
 
 # --- Configuration ---
-DB_PATH = "/home/ea/JellyFin.db"
+DB_PATH = os.environ.get("JELLYFIN_DB_PATH", "/home/ea/JellyFin.db")
 
 def initialize_db():
     conn = sqlite3.connect(DB_PATH)
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+# Lookback windows in years, counted back from each index's latest date; None is all history
+WINDOWS = {'1Y': 1, '3Y': 3, '5Y': 5, '10Y': 10, 'All': None}
+DAYS_PER_YEAR = 365.25
+# Calendar buckets: the return series each is measured on and the label of each bucket value
+BUCKET_LABELS = {
+    'Weekday': dict(enumerate(['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'])),
+    'Month': dict(enumerate(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], start=1)),
+    'WeekOfMonth': {w: f"Week {w}" for w in range(1, 6)},
+}
+
+SEASONALITY_COLUMNS = ['Index', 'Kind', 'Window', 'Bucket', 'Label', 'N', 'Mean', 'Median', 'HitRate', 'TStat']
+
+def daily_returns(history):
+    """Close-to-close returns (Index, Date, Return) of every trading day after each index's first."""
+    h = history.sort_values(['Index', 'Date'])
+    close = h['Close'].to_numpy(dtype=float)
+    prev = h.groupby('Index', sort=False)['Close'].shift(1).to_numpy(dtype=float)
+    return pd.DataFrame({'Index': h['Index'].to_numpy(), 'Date': h['Date'].to_numpy(), 'Return': close / prev - 1}).dropna(subset=['Return'])
+
+def monthly_returns(history):
+    """Month-end to month-end returns, dated at each month's last trading day."""
+    h = history.sort_values(['Index', 'Date'])
+    month = h['Date'].dt.year * 12 + h['Date'].dt.month
+    month_end = h[~(month.eq(month.shift(-1)) & h['Index'].eq(h['Index'].shift(-1)))]
+    return daily_returns(month_end)
+
+def calendar_observations(history):
+    """
+    Every (Index, Kind, Bucket, Date, Return) observation the seasonality table is built from:
+    daily returns by weekday and by week of the month, monthly returns by calendar month.
+    """
+    daily = daily_returns(history)
+    monthly = monthly_returns(history)
+    parts = [
+        daily.assign(Kind='Weekday', Bucket=daily['Date'].dt.weekday),
+        daily.assign(Kind='WeekOfMonth', Bucket=(daily['Date'].dt.day - 1) // 7 + 1),
+        monthly.assign(Kind='Month', Bucket=monthly['Date'].dt.month),
+    ]
+    return pd.concat(parts, ignore_index=True)
+
+def seasonality(history, windows=WINDOWS):
+    """
+    Mean and median return (percent), hit rate (percent of positive returns) and t-statistic of
+    the mean for every index, calendar bucket and lookback window at once. Observations are
+    sorted by (index, kind, bucket, date), so each window of a bucket is a suffix of its run:
+    counts and sums come from differences of one set of cumulative sums, located for every
+    window with a single searchsorted. history is an index_store.load_index_history frame.
+    Returns a frame with SEASONALITY_COLUMNS.
+    """
+    obs = calendar_observations(history)
+    if obs.empty:
+        return pd.DataFrame(columns=SEASONALITY_COLUMNS)
+    key_cols = ['Index', 'Kind', 'Bucket']
+    obs = obs.sort_values(key_cols + ['Date'], ignore_index=True)
+    group = obs.groupby(key_cols, sort=False).ngroup().to_numpy()
+    keys = obs[key_cols].drop_duplicates(ignore_index=True)
+    n_groups = len(keys)
+
+    days = obs['Date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    values = obs['Return'].to_numpy(dtype=float)
+    starts = np.searchsorted(group, np.arange(n_groups))
+    ends = np.append(starts[1:], len(group))
+
+    # First position inside each group's run at or after the window's cutoff date
+    span = int(days.max() - days.min()) + 1
+    sort_key = group * span + (days - days.min())
+    latest = pd.Series(days).groupby(obs['Index']).transform('max').to_numpy()[starts]
+    window_names = list(windows)
+    cutoffs = np.array([latest - (years * DAYS_PER_YEAR if years is not None else span) for years in windows.values()]).T
+    cutoffs = np.clip(np.ceil(cutoffs).astype(np.int64), days.min(), days.max() + 1)
+    first = np.searchsorted(sort_key, np.arange(n_groups)[:, None] * span + (cutoffs - days.min()))
+
+    def window_sum(x):
+        cum = np.concatenate([[0.0], np.cumsum(x)])
+        return cum[ends][:, None] - cum[first]
+
+    n = ends[:, None] - first
+    total = window_sum(values)
+    total_sq = window_sum(values ** 2)
+    hits = window_sum(values > 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / n
+        var = (total_sq - n * mean ** 2) / (n - 1)
+        # A single observation has no spread, so no t-statistic
+        t_stat = np.where(n > 1, mean / np.sqrt(np.maximum(var, 0) / n), np.nan)
+        hit_rate = hits / n
+
+    # Medians need the values themselves: pad each run into a row and mask out-of-window cells
+    slot = np.arange(len(group)) - starts[group]
+    padded = np.full((n_groups, int((ends - starts).max())), np.nan)
+    padded[group, slot] = values
+    medians = np.full(n.shape, np.nan)
+    columns = np.arange(padded.shape[1])
+    for w in range(len(window_names)):
+        in_window = (columns >= (first[:, w] - starts)[:, None]) & (n[:, w] > 0)[:, None]
+        rows = in_window.any(axis=1)
+        medians[rows, w] = np.nanmedian(np.where(in_window, padded, np.nan)[rows], axis=1)
+
+    result = keys.loc[np.repeat(np.arange(n_groups), len(window_names))].reset_index(drop=True)
+    result['Window'] = np.tile(window_names, n_groups)
+    result['Label'] = [BUCKET_LABELS[k][b] for k, b in zip(result['Kind'], result['Bucket'])]
+    result['N'] = n.ravel()
+    result['Mean'] = np.round(mean.ravel() * 100, 4)
+    result['Median'] = np.round(medians.ravel() * 100, 4)
+    result['HitRate'] = np.round(hit_rate.ravel() * 100, 2)
+    result['TStat'] = np.round(t_stat.ravel(), 3)
+    return result[SEASONALITY_COLUMNS]